@@ -0,0 +1,171 @@
+import time
+import logging
+from collections import deque
+import config
+
+logger = logging.getLogger(__name__)
+
+class SlidingWindow:
+    """
+    Samples from the last `seconds` with O(1) amortised updates:
+    a running sum gives the mean, monotonic deques give max and min.
+    """
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self._samples = deque() # (ts, value)
+        self._max = deque()     # values decreasing
+        self._min = deque()     # values increasing
+        self._sum = 0.0
+
+    def push(self, ts, value):
+        self._samples.append((ts, value))
+        self._sum += value
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((ts, value))
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((ts, value))
+        self._expire(ts)
+
+    def _expire(self, now):
+        cutoff = now - self.seconds
+        while self._samples and self._samples[0][0] < cutoff:
+            self._sum -= self._samples.popleft()[1]
+        while self._max and self._max[0][0] < cutoff:
+            self._max.popleft()
+        while self._min and self._min[0][0] < cutoff:
+            self._min.popleft()
+
+    def __len__(self):
+        return len(self._samples)
+
+    @property
+    def avg(self):
+        return self._sum / len(self._samples) if self._samples else None
+
+    @property
+    def max(self):
+        return self._max[0][1] if self._max else None
+
+    @property
+    def min(self):
+        return self._min[0][1] if self._min else None
+
+    @property
+    def last(self):
+        return self._samples[-1][1] if self._samples else None
+
+class AlertRule:
+    """
+    Fires when `stat` of `metric` over the last `window` seconds is at or
+    above `threshold` continuously for `sustain` seconds, and resolves once
+    it drops below `threshold - hysteresis`. Notifications for a rule are at
+    least `cooldown` seconds apart.
+    """
+    def __init__(self, name, metric, threshold, stat='avg', window=60, sustain=0,
+                 hysteresis=0, cooldown=0, unit=''):
+        if stat not in ('avg', 'max', 'min', 'last'):
+            raise ValueError(f"Unknown stat '{stat}'")
+        self.name = name
+        self.metric = metric
+        self.threshold = threshold
+        self.stat = stat
+        self.window = window
+        self.sustain = sustain
+        self.clear_threshold = threshold - hysteresis
+        self.cooldown = cooldown
+        self.unit = unit
+        # State
+        self.firing = False
+        self.notified = False
+        self.breach_since = None
+        self.last_notified = None
+        self.suppressed = 0
+
+class AlertEngine:
+    """
+    Evaluates AlertRules against every sample (a dict such as those from
+    sampler.MetricsSampler) without touching the database. notify(text) is
+    called on firing and on resolution.
+    """
+    def __init__(self, rules, notify=None):
+        self.rules = list(rules)
+        self.notify = notify
+        self._windows = {}
+        for rule in self.rules:
+            self._windows.setdefault((rule.metric, rule.window), SlidingWindow(rule.window))
+
+    def feed(self, sample):
+        now = sample.get('timestamp', time.time())
+        for (metric, _), window in self._windows.items():
+            value = sample.get(metric)
+            if value is not None:
+                window.push(now, float(value))
+        for rule in self.rules:
+            window = self._windows[(rule.metric, rule.window)]
+            value = getattr(window, rule.stat)
+            if value is not None:
+                self._evaluate(rule, value, now)
+
+    def _evaluate(self, rule, value, now):
+        if not rule.firing:
+            if value < rule.threshold:
+                rule.breach_since = None
+                return
+            if rule.breach_since is None:
+                rule.breach_since = now
+            if now - rule.breach_since < rule.sustain:
+                return
+            rule.firing = True
+            if self._in_cooldown(rule, now):
+                rule.suppressed += 1
+                rule.notified = False
+                logger.info(f"ALERT: {rule.name} firing again within cooldown, not notifying yet")
+                return
+            self._fire(rule, value, now)
+        elif value < rule.clear_threshold:
+            rule.firing = False
+            rule.breach_since = None
+            if rule.notified:
+                self._send(f"✅ <b>{rule.name}</b> resolved: {rule.stat} {rule.metric} {value:.1f}{rule.unit}")
+            rule.notified = False
+        elif not rule.notified and not self._in_cooldown(rule, now):
+            # Still firing once a suppressed repeat's cooldown is over: admins last saw "resolved"
+            self._fire(rule, value, now)
+
+    @staticmethod
+    def _in_cooldown(rule, now):
+        return rule.last_notified is not None and now - rule.last_notified < rule.cooldown
+
+    def _fire(self, rule, value, now):
+        rule.notified = True
+        rule.last_notified = now
+        self._send(f"🚨 <b>{rule.name}</b>: {rule.stat} {rule.metric} {value:.1f}{rule.unit} "
+                   f"≥ {rule.threshold}{rule.unit} for {now - rule.breach_since:.0f}s")
+
+    def _send(self, text):
+        logger.warning(f"ALERT: {text}")
+        if self.notify is None:
+            return
+        try:
+            self.notify(text)
+        except Exception as e:
+            logger.error(f"ALERT: Notification failed: {e}")
+
+    def active(self):
+        return [rule for rule in self.rules if rule.firing]
+
+def default_rules():
+    """Rules built from the ALERT_* settings"""
+    common = dict(window=config.ALERT_WINDOW, sustain=config.ALERT_SUSTAIN, cooldown=config.ALERT_COOLDOWN)
+    return [
+        AlertRule("High CPU", 'cpu', config.ALERT_CPU_THRESHOLD, stat='avg',
+                  hysteresis=config.ALERT_HYSTERESIS, unit='%', **common),
+        AlertRule("Overheating", 'temp', config.ALERT_TEMP_THRESHOLD, stat='max',
+                  hysteresis=config.ALERT_HYSTERESIS, unit='°C', **common),
+        AlertRule("Disk almost full", 'disk', config.ALERT_DISK_THRESHOLD, stat='last',
+                  hysteresis=1, unit='%', window=config.ALERT_WINDOW, cooldown=config.ALERT_COOLDOWN),
+        # 1.0 while the firmware reports under-voltage / throttling / capping
+        AlertRule("Throttling", 'throttled', 1, stat='last', **common),
+    ]
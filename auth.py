@@ -0,0 +1,90 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from outbox import TokenBucket
+import config
+
+logger = logging.getLogger(__name__)
+
+# Audit statuses
+OK = 'OK'
+DENIED = 'DENIED'
+RATE_LIMITED = 'RATE_LIMITED'
+
+# Permission sets per role. Actions are command names, plus callback
+# actions (kill, reboot, job_cancel, service_restart) that share a command's permission.
+VIEWER_ACTIONS = frozenset({
+    'start', 'help', 'report', 'graph', 'sysinfo', 'health', 'top', 'jobs', 'job', 'fleet', 'net', 'services', 'cancel',
+})
+OPERATOR_ACTIONS = VIEWER_ACTIONS | frozenset({'speedtest', 'wol', 'gpio', 'kill', 'job_cancel', 'service_restart'})
+ROLE_ACTIONS = {
+    'viewer': VIEWER_ACTIONS,
+    'operator': OPERATOR_ACTIONS,
+    'admin': None, # everything
+}
+
+class Authorizer:
+    """
+    Role lookup and per-action permission checks are set/dict lookups.
+    Every user also gets a token bucket, so a flood of commands (or a
+    stranger hammering the bot) is dropped before any handler runs.
+    With no users configured at all, everyone is admin (open mode).
+    """
+    def __init__(self, admins=None, operators=None, viewers=None, rate=None, burst=None, max_tracked=1024):
+        admins = frozenset(admins if admins is not None else config.ADMIN_USER_IDS)
+        operators = frozenset(operators if operators is not None else config.OPERATOR_USER_IDS)
+        viewers = frozenset(viewers if viewers is not None else config.VIEWER_USER_IDS)
+        self.open_mode = not (admins or operators or viewers)
+        self._roles = {}
+        for role, users in (('viewer', viewers), ('operator', operators), ('admin', admins)):
+            self._roles.update(dict.fromkeys(users, role)) # the highest role wins
+        self.rate = rate if rate is not None else config.AUTH_RATE
+        self.burst = burst if burst is not None else config.AUTH_BURST
+        self.max_tracked = max_tracked
+        self._buckets = OrderedDict() # user_id -> TokenBucket, least recently seen first
+        self._dropped = {}            # user_id -> messages dropped in the current flood
+        self._lock = threading.Lock()
+        if self.open_mode:
+            logger.warning("AUTH: No users configured, every Telegram user is admin (open mode)")
+
+    def role(self, user_id):
+        if self.open_mode:
+            return 'admin'
+        return self._roles.get(user_id)
+
+    def allowed(self, user_id, action):
+        role = self.role(user_id)
+        if role is None:
+            return False
+        actions = ROLE_ACTIONS[role]
+        return actions is None or action in actions
+
+    def _take(self, user_id):
+        """0 if user_id is within its rate limit, else how many messages this flood has dropped"""
+        with self._lock:
+            bucket = self._buckets.get(user_id)
+            if bucket is None:
+                bucket = self._buckets[user_id] = TokenBucket(self.rate, self.burst)
+                while len(self._buckets) > self.max_tracked:
+                    old, _ = self._buckets.popitem(last=False)
+                    self._dropped.pop(old, None)
+            else:
+                self._buckets.move_to_end(user_id)
+            if bucket.wait_time(time.monotonic()) > 0:
+                self._dropped[user_id] = self._dropped.get(user_id, 0) + 1
+                return self._dropped[user_id]
+            bucket.take()
+            self._dropped.pop(user_id, None)
+            return 0
+
+    def check(self, user_id, action):
+        """
+        (status, audit): status is OK, DENIED or RATE_LIMITED. audit is False
+        for all but the first dropped message of a flood, so spam doesn't
+        flood the audit log too.
+        """
+        dropped = self._take(user_id)
+        if dropped:
+            return RATE_LIMITED, dropped == 1
+        return (OK if self.allowed(user_id, action) else DENIED), True
@@ -0,0 +1,60 @@
+"""
+Benchmark: v3.0 handle_query (if/elif chain of string compares and splits,
+no auth) vs. callbacks.CallbackRouter (one dict lookup, auth callback, HMAC
+check on signed routes). Handlers are no-ops so only routing is measured.
+
+Usage: python bench_callbacks.py [iterations]
+"""
+import sys
+import time
+from types import SimpleNamespace
+import callbacks
+
+def legacy_dispatch(call):
+    if call.data == "cancel":
+        return 'cancel'
+    elif call.data == "sys_reboot":
+        return 'reboot'
+    elif call.data == "refresh_top":
+        return 'top'
+    elif call.data.startswith("job_cancel_"):
+        return call.data[len("job_cancel_"):]
+    elif call.data.startswith("top_"):
+        return call.data[4:]
+    elif call.data.startswith("kill_"):
+        return int(call.data.split('_')[1])
+
+def make_call(data):
+    return SimpleNamespace(id='q', data=data, from_user=SimpleNamespace(id=1, username='bench'),
+                           message=SimpleNamespace(chat=SimpleNamespace(id=42), message_id=1))
+
+def measure(name, func, calls, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for call in calls:
+            func(call)
+    elapsed = time.perf_counter() - start
+    ops = iterations * len(calls)
+    print(f"{name:36s} {ops / elapsed:12.0f} ops/s  {elapsed / ops * 1e6:8.2f} us/op")
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    router = callbacks.CallbackRouter(lambda user, permission, text: True, lambda call_id, text: None, secret='bench')
+    for action, permission, signed, handler in [
+        ('x', 'cancel', False, lambda call: None),
+        ('rb', 'reboot', True, lambda call: None),
+        ('tp', 'top', False, lambda call, sort, page: None),
+        ('jc', 'job_cancel', True, lambda call, job_id: None),
+        ('k', 'kill', True, lambda call, pid, started: None),
+    ]:
+        router.route(action, permission, signed)(handler)
+
+    # The worst case for the chain: kill_ is tested last
+    measure("legacy chain (kill, last branch)", legacy_dispatch, [make_call("kill_1234")], iterations)
+    measure("legacy chain (mixed)", legacy_dispatch,
+            [make_call(d) for d in ("cancel", "top_mem", "job_cancel_ab12", "kill_1234")], iterations)
+    measure("router (unsigned)", router.dispatch,
+            [make_call(router.data('x')), make_call(router.data('tp', 'mem', 1))], iterations)
+    measure("router (signed kill)", router.dispatch,
+            [make_call(router.data('k', 1234, 1700000000, chat_id=42))], iterations)
+    assert router.rejected == 0
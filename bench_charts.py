@@ -0,0 +1,59 @@
+"""
+Benchmark: /graph rendering with a fresh pyplot figure per request (v3.0
+style) vs. ChartRenderer's reused Agg figure, and a render-cache hit.
+Fills a temporary database with 7 days of one-minute samples.
+
+Usage: python bench_charts.py [range, default 7d]
+"""
+import io
+import sys
+import math
+import time
+import tempfile
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import charts
+import database
+
+def measure(name, func, iterations=5):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = (time.perf_counter() - start) / iterations
+    print(f"{name:36s} {elapsed * 1000:9.1f} ms/chart")
+
+if __name__ == "__main__":
+    seconds = charts.parse_range(sys.argv[1] if len(sys.argv) > 1 else '7d')
+    with tempfile.TemporaryDirectory() as tmp:
+        database.config.DB_FILE = f"{tmp}/bench.db"
+        db = database.DatabaseManager()
+        now = int(time.time())
+        with db._lock:
+            for ts in range(now - 7 * 86400, now, 60):
+                cpu = 50 + 40 * math.sin(ts / 3600)
+                db._metric_buffer.append(database.pack_metric(ts, cpu, 40.0, 60.0, 45.0 + cpu / 10))
+        db.flush()
+
+        def pyplot_per_request():
+            rows = list(db.get_history_buckets(now - seconds, max_points=10 ** 6, aggregates=('avg',)))
+            fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(8, 4.8), sharex=True)
+            xs = [r['timestamp'] for r in rows]
+            for field in ('cpu', 'ram', 'disk'):
+                ax1.plot(xs, [r[f'{field}_avg'] for r in rows])
+            ax2.plot(xs, [r['temp_avg'] for r in rows])
+            fig.tight_layout()
+            fig.savefig(io.BytesIO(), format='png')
+            plt.close(fig)
+
+        renderer = charts.ChartRenderer(db)
+
+        def reused_figure():
+            renderer._cache.clear()
+            renderer.render(seconds)
+
+        print(f"range={charts.format_range(seconds)}")
+        measure("pyplot figure per request, all rows", pyplot_per_request)
+        measure("reused Agg figure + LTTB", reused_figure)
+        measure("render cache hit", lambda: renderer.render(seconds), iterations=50)
+        db.close()
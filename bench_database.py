@@ -0,0 +1,110 @@
+"""
+Benchmark: legacy connect-per-call inserts vs. the pooled WAL DatabaseManager,
+plus bytes-per-sample and insert throughput of the legacy REAL schema vs. the
+compact WITHOUT ROWID schema.
+Reports rows/sec and bytes written to storage (from /proc/self/io, Linux only).
+
+Usage: python bench_database.py [rows]
+"""
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+import config
+import database
+
+def read_io():
+    """Returns (write_bytes, wchar) for this process, or (0, 0) if unavailable"""
+    try:
+        with open('/proc/self/io') as f:
+            stats = dict(line.split(': ') for line in f.read().splitlines())
+        return int(stats['write_bytes']), int(stats['wchar'])
+    except (OSError, KeyError, ValueError):
+        return 0, 0
+
+LEGACY_SCHEMA = (
+    "CREATE TABLE metrics (timestamp INTEGER PRIMARY KEY, cpu_percent REAL, "
+    "ram_percent REAL, disk_percent REAL, temp REAL)"
+)
+
+def legacy_insert(db_file, cpu, ram, disk, temp, ts):
+    # Mirrors the original per-call implementation (new connection + commit per row)
+    with sqlite3.connect(db_file) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT OR REPLACE INTO metrics (timestamp, cpu_percent, ram_percent, disk_percent, temp) VALUES (?, ?, ?, ?, ?)",
+            (ts, cpu, ram, disk, temp)
+        )
+        cursor.execute("DELETE FROM metrics WHERE timestamp < ?", (ts - 172800,))
+        conn.commit()
+
+def bench_legacy(db_file, rows):
+    with sqlite3.connect(db_file) as conn:
+        conn.execute(LEGACY_SCHEMA)
+    base = int(time.time())
+    start = time.perf_counter()
+    for i in range(rows):
+        legacy_insert(db_file, 10.0, 20.0, 30.0, 40.0, base + i)
+    return time.perf_counter() - start
+
+def bench_pooled(db_file, rows):
+    db = database.DatabaseManager()
+    base = int(time.time())
+    start = time.perf_counter()
+    for i in range(rows):
+        # Bypass the wall clock so every row gets a unique key
+        with db._lock:
+            db._metric_buffer.append(database.pack_metric(base + i, 10.0, 20.0, 30.0, 40.0))
+            db._maybe_flush()
+    db.close()
+    return time.perf_counter() - start
+
+def bench_schema(name, rows):
+    """Inserts `rows` realistic samples in batches and reports file bytes per sample"""
+    import random
+    with tempfile.TemporaryDirectory(dir=os.getcwd()) as tmp:
+        db_file = os.path.join(tmp, 'schema.db')
+        base = time.time()
+        samples = [(base + i, random.uniform(0, 100), random.uniform(20, 80), 61.3, random.uniform(40, 70))
+                   for i in range(rows)]
+        if name == 'legacy':
+            with sqlite3.connect(db_file) as conn:
+                conn.execute(LEGACY_SCHEMA)
+            sql = "INSERT INTO metrics VALUES (?, ?, ?, ?, ?)"
+            packed = [(int(sample[0]),) + sample[1:] for sample in samples]
+        else:
+            config.DB_FILE = db_file
+            database.DatabaseManager().close()
+            sql = database.INSERT_METRIC_SQL
+            packed = [database.pack_metric(*sample) for sample in samples]
+
+        conn = sqlite3.connect(db_file)
+        start = time.perf_counter()
+        for i in range(0, rows, config.DB_FLUSH_SIZE):
+            with conn:
+                conn.executemany(sql, packed[i:i + config.DB_FLUSH_SIZE])
+        elapsed = time.perf_counter() - start
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("VACUUM")
+        conn.close()
+        size = os.path.getsize(db_file)
+    print(f"{name:8s} {rows / elapsed:10.0f} rows/s  {size / rows:6.1f} bytes/sample  ({size} bytes)")
+
+def run(name, func, rows):
+    with tempfile.TemporaryDirectory(dir=os.getcwd()) as tmp:
+        config.DB_FILE = os.path.join(tmp, 'bench.db')
+        wb0, wc0 = read_io()
+        elapsed = func(config.DB_FILE, rows)
+        wb1, wc1 = read_io()
+    print(f"{name:8s} {rows / elapsed:10.0f} rows/s  "
+          f"write_bytes={wb1 - wb0:>10d}  wchar={wc1 - wc0:>10d}  ({elapsed:.2f}s)")
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    config.DB_FLUSH_INTERVAL = 0 # size-triggered flushes only, deterministic
+    run("legacy", bench_legacy, rows)
+    run("pooled", bench_pooled, rows)
+    print()
+    bench_schema("legacy", rows * 10)
+    bench_schema("compact", rows * 10)
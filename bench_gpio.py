@@ -0,0 +1,42 @@
+"""
+Benchmark: scheduling jitter of pins.GpioController (mock pins). Runs a
+PWM ramp and a step sequence and reports how late each pin write was
+against its planned time.
+
+Usage: python bench_gpio.py [seconds]
+"""
+import sys
+import time
+from unittest.mock import patch
+import hardware
+import pins
+
+def run(controller, hal, args, duration):
+    writes = []
+    original = hal.set_pin_state
+    def record(name, state):
+        writes.append(time.monotonic())
+        original(name, state)
+    hal.set_pin_state = record
+    start = time.monotonic()
+    steps, _ = pins.parse_command(controller.pins, args, controller.ramp_step)
+    controller.run(args)
+    time.sleep(duration + 0.2)
+    hal.set_pin_state = original
+    return sorted(w - (start + offset) for w, (offset, _) in zip(writes, steps))
+
+def report(name, lateness):
+    ms = [x * 1000 for x in lateness]
+    print(f"{name:28s} {len(ms):5d} writes  median {ms[len(ms) // 2]:6.2f} ms  "
+          f"p99 {ms[int(len(ms) * 0.99)]:6.2f} ms  max {ms[-1]:6.2f} ms")
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    with patch('hardware.GPIO_AVAILABLE', False):
+        hal = hardware.HardwareManager()
+    controller = pins.GpioController(hal, pins.parse_pins("relay=17,fan=18:pwm"), ramp_step=0.02)
+    report("PWM ramp (20 ms steps)", run(controller, hal, ["fan=0", f"fan=1/{seconds}"], seconds))
+    steps = int(seconds / 0.05)
+    args = [token for i in range(steps) for token in (f"relay={'on' if i % 2 else 'off'}", "wait=0.05")]
+    report("on/off sequence (50 ms)", run(controller, hal, args, seconds))
+    controller.close()
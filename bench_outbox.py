@@ -0,0 +1,62 @@
+"""
+Benchmark: delivering a burst of messages to several chats through a local
+Bot API stub that enforces per-chat flood control (429 + retry_after).
+Compares naive direct sends (sleep on 429, then retry) with the outbox
+MessageScheduler pacing sends with per-chat token buckets.
+
+Usage: python bench_outbox.py [messages_per_chat] [chats]
+"""
+import sys
+import time
+import threading
+import telebot
+from telebot.apihelper import ApiTelegramException
+import outbox
+from mock_telegram import FakeTelegramServer
+
+CHAT_INTERVAL = 0.1 # stub allows 10 msg/s per chat
+RETRY_AFTER = 1
+
+def naive(bot, chats, per_chat):
+    def worker(chat):
+        for i in range(per_chat):
+            while True:
+                try:
+                    bot.send_message(chat, f"msg {i}")
+                    break
+                except ApiTelegramException as e:
+                    time.sleep(e.result_json['parameters']['retry_after'])
+    threads = [threading.Thread(target=worker, args=(chat,)) for chat in chats]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+def scheduled(bot, chats, per_chat):
+    futures = [bot.outbox.submit(telebot.TeleBot.send_message, chat, bot, chat, f"msg {i}")
+               for i in range(per_chat) for chat in chats]
+    for f in futures:
+        f.result()
+
+def run(name, func, per_chat, n_chats, use_outbox):
+    server = FakeTelegramServer(chat_interval=CHAT_INTERVAL).start()
+    server.retry_after = RETRY_AFTER
+    telebot.apihelper.API_URL = server.api_url
+    bot = telebot.TeleBot("123:BENCH", threaded=False)
+    if use_outbox:
+        bot.outbox = outbox.MessageScheduler(chat_rate=1 / CHAT_INTERVAL * 0.95, chat_burst=1, global_rate=30)
+    chats = list(range(1, n_chats + 1))
+    start = time.perf_counter()
+    func(bot, chats, per_chat)
+    elapsed = time.perf_counter() - start
+    delivered = per_chat * n_chats
+    print(f"{name:10s} {delivered / elapsed:8.1f} delivered msg/s  429s={server.flood_errors:<4d} ({elapsed:.2f}s)")
+    if use_outbox:
+        bot.outbox.stop()
+    server.stop()
+
+if __name__ == "__main__":
+    per_chat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    n_chats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    run("naive", naive, per_chat, n_chats, False)
+    run("outbox", scheduled, per_chat, n_chats, True)
@@ -0,0 +1,48 @@
+"""
+Benchmark: checking N services with the original one `systemctl is-active`
+per unit vs. services.ServiceMonitor (one `systemctl show` for all units,
+uncached and cached), using the mock_systemctl.py shim so it runs on any
+host. Pass --real to use the system's systemctl instead.
+
+Usage: python bench_services.py [units] [--real]
+"""
+import os
+import sys
+import time
+import tempfile
+import subprocess
+import services
+
+SHIM = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mock_systemctl.py')
+
+def legacy_status(binary, units):
+    # Mirrors the v3.0 system.get_service_status (one spawn per unit)
+    return {unit: subprocess.call([binary, 'is-active', '--quiet', unit]) == 0 for unit in units}
+
+def measure(name, func, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    elapsed = (time.perf_counter() - start) / rounds
+    print(f"{name:28s} {elapsed * 1000:9.3f} ms per dashboard")
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 30
+    with tempfile.TemporaryDirectory() as tmp:
+        if '--real' in sys.argv:
+            binary = 'systemctl'
+            units = ['ssh', 'cron', 'systemd-journald', 'dbus'] * (count // 4 + 1)
+            units = units[:count]
+        else:
+            binary = os.path.join(tmp, 'systemctl')
+            with open(binary, 'w') as f:
+                f.write(f"#!/bin/sh\nexec {sys.executable} {SHIM} \"$@\"\n")
+            os.chmod(binary, 0o755)
+            units = [f"svc{i}" for i in range(count)]
+        monitor = services.ServiceMonitor(units, ttl=60, binary=binary)
+        assert monitor.get(max_age=0) is not None, "systemctl show failed"
+
+        print(f"{count} units, binary={binary}")
+        measure("legacy (spawn per unit)", lambda: legacy_status(binary, units), 3)
+        measure("batched systemctl show", lambda: monitor.get(max_age=0), 10)
+        measure("cached", monitor.get, 1000)
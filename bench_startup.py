@@ -0,0 +1,73 @@
+"""
+Startup benchmark for the bot entry point.
+1. Import cost: runs `python -X importtime` on raspi-botutils.py and lists
+   the slowest top-level imports.
+2. Time to first poll: starts the bot against mock_telegram's local Bot API
+   and measures from process spawn to its first getUpdates request.
+
+Usage: python bench_startup.py [top_n]
+"""
+import os
+import sys
+import time
+import tempfile
+import subprocess
+from mock_telegram import FakeTelegramServer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Loads the entry point without running main(), or runs it when argv[1] is an API URL
+LAUNCHER = (
+    "import sys, runpy, telebot.apihelper as api\n"
+    "if len(sys.argv) > 1: api.API_URL = sys.argv[1]\n"
+    f"runpy.run_path({os.path.join(HERE, 'raspi-botutils.py')!r}, "
+    "run_name='__main__' if len(sys.argv) > 1 else 'raspi_botutils')\n"
+)
+
+def bot_env(tmp):
+    env = dict(os.environ, TELEGRAM_TOKEN='123456:TEST', ADMIN_USER_IDS='',
+               DB_FILE=os.path.join(tmp, 'startup.db'), LOG_FILE=os.path.join(tmp, 'bot.log'),
+               PYTHONPATH=HERE)
+    return env
+
+def import_times(tmp):
+    """[(cumulative_us, module)] for top-level imports of the entry point"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', LAUNCHER], env=bot_env(tmp),
+                            cwd=tmp, capture_output=True, text=True, check=True)
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name[1:].startswith(' '): # nested imports are indented
+            times.append((int(cumulative), name.strip()))
+    return sorted(times, reverse=True)
+
+def time_to_first_poll(tmp, timeout=30):
+    """Seconds from spawning the bot until its first getUpdates call"""
+    server = FakeTelegramServer(poll_wait=0.2).start()
+    start = time.monotonic()
+    proc = subprocess.Popen([sys.executable, '-c', LAUNCHER, server.api_url], env=bot_env(tmp), cwd=tmp,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.monotonic() - start < timeout:
+            polls = [t for m, _, t in list(server.calls) if m == 'getUpdates']
+            if polls:
+                return polls[0] - start
+            if proc.poll() is not None:
+                raise RuntimeError(f"bot exited with {proc.returncode}")
+            time.sleep(0.005)
+        raise TimeoutError("no getUpdates within timeout")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+        server.stop()
+
+if __name__ == "__main__":
+    top_n = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    with tempfile.TemporaryDirectory() as tmp:
+        times = import_times(tmp)
+        print("Slowest top-level imports:")
+        for cumulative, name in times[:top_n]:
+            print(f"  {name:28s} {cumulative / 1000:8.1f} ms")
+        print(f"Time to first poll: {time_to_first_poll(tmp) * 1000:.0f} ms")
@@ -0,0 +1,57 @@
+"""
+Micro-benchmark: reading CPU temperature by constructing a sensor object per
+call (v3.0 behaviour) vs. pread() on a persistent thermal zone descriptor.
+Uses the real /sys/class/thermal when present, otherwise a fake sysfs tree.
+
+Usage: python bench_thermal.py [iterations]
+"""
+import os
+import sys
+import time
+import tempfile
+import thermal
+from mock_hardware import MockCPUTemperature
+
+def measure(name, func, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = time.perf_counter() - start
+    print(f"{name:36s} {iterations / elapsed:12.0f} reads/s  {elapsed / iterations * 1e6:8.2f} us/read")
+
+def fake_sysfs(root):
+    zone = os.path.join(root, 'thermal_zone0')
+    os.makedirs(zone)
+    with open(os.path.join(zone, 'type'), 'w') as f:
+        f.write('cpu-thermal\n')
+    with open(os.path.join(zone, 'temp'), 'w') as f:
+        f.write('47236\n')
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    with tempfile.TemporaryDirectory() as tmp:
+        root = '/sys/class/thermal'
+        if not os.path.exists(os.path.join(root, 'thermal_zone0', 'temp')):
+            fake_sysfs(tmp)
+            root = tmp
+        temp_path = os.path.join(root, 'thermal_zone0', 'temp')
+
+        def open_per_call():
+            # What gpiozero's CPUTemperature does per construction + read
+            with open(temp_path) as f:
+                return int(f.read().strip()) / 1000.0
+
+        try:
+            from gpiozero import CPUTemperature
+            CPUTemperature(sensor_file=temp_path).temperature
+            measure("gpiozero CPUTemperature() per call",
+                    lambda: CPUTemperature(sensor_file=temp_path).temperature, iterations // 10)
+        except Exception as e:
+            print(f"gpiozero CPUTemperature unavailable: {e}")
+        measure("MockCPUTemperature() per call", lambda: MockCPUTemperature().temperature, iterations)
+        measure("open/read/close per call", open_per_call, iterations)
+
+        zones = thermal.ThermalZones(root=root)
+        measure("ThermalZones.read() (persistent fd)", zones.read, iterations)
+        measure("ThermalZones.read_all()", zones.read_all, iterations)
+        zones.close()
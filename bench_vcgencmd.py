@@ -0,0 +1,50 @@
+"""
+Benchmark: diagnostics calls/sec for the original three-spawn vcgencmd path
+vs. the batched PiDiagnostics collector (uncached and cached), using the
+mock_vcgencmd.py shim so it runs on any host.
+
+Usage: python bench_vcgencmd.py [seconds]
+"""
+import os
+import sys
+import time
+import tempfile
+import subprocess
+import diagnostics
+
+SHIM = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mock_vcgencmd.py')
+
+def legacy_diagnostics(binary):
+    # Mirrors the v3.0 HardwareManager.get_pi_diagnostics (one spawn per field)
+    data = {}
+    data['throttled'] = subprocess.check_output([binary, 'get_throttled']).decode().strip().split('=')[1]
+    data['volt_core'] = subprocess.check_output([binary, 'measure_volts', 'core']).decode().strip().split('=')[1]
+    data['clock_arm'] = subprocess.check_output([binary, 'measure_clock', 'arm']).decode().strip().split('=')[1]
+    return data
+
+def measure(name, func, seconds):
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        func()
+        calls += 1
+    elapsed = time.perf_counter() - start
+    print(f"{name:28s} {calls / elapsed:10.1f} calls/s")
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+    with tempfile.TemporaryDirectory() as tmp:
+        binary = os.path.join(tmp, 'vcgencmd')
+        with open(binary, 'w') as f:
+            f.write(f"#!/bin/sh\nexec {sys.executable} {SHIM} \"$@\"\n")
+        os.chmod(binary, 0o755)
+
+        same_fields = diagnostics.PiDiagnostics(fields=['throttled', 'volts'], ttl=0, binary=binary, sysfs_root=tmp)
+        everything = diagnostics.PiDiagnostics(ttl=0, binary=binary, sysfs_root=tmp)
+        cached = diagnostics.PiDiagnostics(ttl=5, binary=binary, sysfs_root=tmp)
+
+        measure("legacy (3 fields, 3 spawns)", lambda: legacy_diagnostics(binary), seconds)
+        measure("batched (throttled+volts)", same_fields.get, seconds)
+        measure("batched (all fields)", everything.get, seconds)
+        cached.get() # warm the cache
+        measure("cached (all fields, 5s ttl)", cached.get, seconds)
@@ -0,0 +1,63 @@
+"""
+Benchmark: v3.0 network.wake_on_lan (hex string, struct.pack per byte,
+bytes concatenation, new socket per call) vs. wol.WakeOnLan (bytes.fromhex,
+cached packet, one reusable socket). Packets go to a local UDP sink, not
+the LAN broadcast address.
+
+Usage: python bench_wol.py [iterations]
+"""
+import sys
+import time
+import socket
+import struct
+import wol
+
+MAC = "AA:BB:CC:DD:EE:FF"
+
+def legacy_packet(mac_address):
+    if len(mac_address) == 17:
+        mac_address = mac_address.replace(mac_address[2], '')
+    data = b'FFFFFFFFFFFF' + (mac_address.encode() * 16)
+    send_data = b''
+    for i in range(0, len(data), 2):
+        send_data += struct.pack('B', int(data[i: i + 2], 16))
+    return send_data
+
+def legacy_send(mac_address, address):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    sock.sendto(legacy_packet(mac_address), address)
+    sock.close() # v3.0 left it to the garbage collector
+
+def measure(name, func, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = time.perf_counter() - start
+    print(f"{name:36s} {iterations / elapsed:12.0f} ops/s  {elapsed / iterations * 1e6:8.2f} us/op")
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    assert legacy_packet(MAC) == wol.magic_packet(MAC)
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(('127.0.0.1', 0))
+    sink.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+    address = sink.getsockname()
+    waker = wol.WakeOnLan(devices={}, groups={}, port=address[1], repeat=1)
+
+    measure("legacy packet build", lambda: legacy_packet(MAC), iterations)
+    measure("bytes.fromhex packet build", lambda: wol.magic_packet.__wrapped__(MAC), iterations)
+    measure("cached packet", lambda: wol.magic_packet(MAC), iterations)
+
+    def drain():
+        sink.setblocking(False)
+        try:
+            while True:
+                sink.recv(200)
+        except BlockingIOError:
+            pass
+
+    measure("legacy send (socket per call)", lambda: legacy_send(MAC, address), iterations // 4)
+    drain()
+    measure("reusable socket send", lambda: waker.send(MAC, '127.0.0.1'), iterations // 4)
+    drain()
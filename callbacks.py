@@ -0,0 +1,142 @@
+"""
+Inline-button routing.
+
+Callback data is '<action>:<arg>:...'. The action selects a route with one
+dict lookup; every route names the auth action it needs, so buttons pass the
+same role and rate limit checks as commands. Signed routes append the issue
+time (base 36) and a truncated HMAC over the data and the chat id:
+
+    k:1234:1718000000:t5qz1c:Xq3_0aF9cKw
+
+A forged, edited, replayed-into-another-chat or expired button is rejected
+without keeping any per-button state. Telegram caps callback_data at 64 bytes.
+"""
+import os
+import hmac
+import time
+import base64
+import hashlib
+import logging
+import config
+
+logger = logging.getLogger(__name__)
+
+MAX_DATA = 64
+SIG_BYTES = 8 # 11 base64 characters
+
+# dispatch() outcomes
+OK = 'OK'
+UNKNOWN = 'UNKNOWN'
+FORGED = 'FORGED'
+EXPIRED = 'EXPIRED'
+DENIED = 'DENIED'
+FAILED = 'FAILED'
+
+def to_base36(number):
+    digits = '0123456789abcdefghijklmnopqrstuvwxyz'
+    text = ''
+    while True:
+        number, rest = divmod(number, 36)
+        text = digits[rest] + text
+        if not number:
+            return text
+
+class Route:
+    __slots__ = ('handler', 'permission', 'signed')
+
+    def __init__(self, handler, permission, signed):
+        self.handler = handler
+        self.permission = permission
+        self.signed = signed
+
+class CallbackRouter:
+    """
+    authorize(user, permission, text) -> bool checks and audits a press,
+    answer(callback_query_id, text) shows a toast for rejected or failed presses.
+    """
+    def __init__(self, authorize, answer, secret=None, ttl=None):
+        self.authorize = authorize
+        self.answer = answer
+        secret = secret if secret is not None else config.CALLBACK_SECRET
+        if isinstance(secret, str):
+            secret = secret.encode()
+        self._mac = hmac.new(secret or os.urandom(32), digestmod=hashlib.sha256) # keyed once, copied per button
+        self.ttl = ttl if ttl is not None else config.CALLBACK_TTL
+        self.dispatched = 0
+        self.rejected = 0
+        self._routes = {}
+
+    def route(self, action, permission, signed=False):
+        """Decorator registering handler(call, *args) for callback data starting with `action`"""
+        def register(handler):
+            if action in self._routes:
+                raise ValueError(f"Callback action '{action}' registered twice")
+            self._routes[action] = Route(handler, permission, signed)
+            return handler
+        return register
+
+    def _sign(self, body, chat_id):
+        mac = self._mac.copy()
+        mac.update(f"{chat_id}|{body}".encode())
+        return base64.urlsafe_b64encode(mac.digest()[:SIG_BYTES]).rstrip(b'=').decode()
+
+    def data(self, action, *args, chat_id=None):
+        """callback_data for a button; chat_id is required for signed routes. Raises ValueError if too long."""
+        route = self._routes[action]
+        fields = [action] + [str(arg) for arg in args]
+        if any(':' in field for field in fields):
+            raise ValueError(f"Callback arguments may not contain ':' ({fields})")
+        if route.signed:
+            fields.append(to_base36(int(time.time())))
+            body = ':'.join(fields)
+            body += ':' + self._sign(body, chat_id)
+        else:
+            body = ':'.join(fields)
+        if len(body.encode()) > MAX_DATA:
+            raise ValueError(f"Callback data is {len(body.encode())} bytes, Telegram allows {MAX_DATA}")
+        return body
+
+    def _answer(self, call, toast):
+        try:
+            self.answer(call.id, toast)
+        except Exception as e:
+            logger.error(f"CALLBACKS: Answering {call.id} failed: {e}")
+
+    def _reject(self, call, status, toast):
+        self.rejected += 1
+        self._answer(call, toast)
+        return status
+
+    def dispatch(self, call):
+        """Routes one CallbackQuery. Returns OK, UNKNOWN, FORGED, EXPIRED, DENIED or FAILED."""
+        data = call.data or ''
+        action, _, rest = data.partition(':')
+        route = self._routes.get(action)
+        if route is None:
+            return self._reject(call, UNKNOWN, "⌛ This button is no longer valid")
+        args = rest.split(':') if rest else []
+
+        if route.signed:
+            chat_id = call.message.chat.id if call.message is not None else None
+            if len(args) < 2:
+                return self._reject(call, FORGED, "⛔ Invalid button")
+            body, _, signature = data.rpartition(':')
+            if not hmac.compare_digest(signature.encode(), self._sign(body, chat_id).encode()):
+                logger.warning(f"CALLBACKS: Bad signature on '{data}' from {call.from_user.id}")
+                return self._reject(call, FORGED, "⛔ Invalid button")
+            issued = int(args[-2], 36)
+            args = args[:-2]
+            if time.time() - issued > self.ttl:
+                return self._reject(call, EXPIRED, "⌛ This button has expired, send the command again")
+
+        if not self.authorize(call.from_user, route.permission, f"callback:{data}"):
+            return self._reject(call, DENIED, "⛔ Not allowed")
+
+        self.dispatched += 1
+        try:
+            route.handler(call, *args)
+        except Exception as e:
+            logger.error(f"CALLBACKS: Handler for '{data}' failed: {e}")
+            self._answer(call, "❌ Something went wrong, try again")
+            return FAILED
+        return OK
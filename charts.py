@@ -0,0 +1,178 @@
+import re
+import io
+import time
+import logging
+import threading
+from collections import OrderedDict
+import config
+
+logger = logging.getLogger(__name__)
+
+RANGES = {'1h': 3600, '6h': 6 * 3600, '24h': 86400, '7d': 7 * 86400, '30d': 30 * 86400}
+SERIES = (('cpu', 'CPU %', '#e4572e'), ('ram', 'RAM %', '#4c9be8'), ('disk', 'Disk %', '#76b041'))
+UNITS = {'m': 60, 'h': 3600, 'd': 86400}
+
+def parse_range(text, default='24h'):
+    """'6h', '90m', '7d' -> seconds. Returns None if unparsable or out of bounds."""
+    text = (text or default).strip().lower()
+    if text in RANGES:
+        return RANGES[text]
+    match = re.fullmatch(r'(\d+)([mhd])', text)
+    if not match:
+        return None
+    seconds = int(match.group(1)) * UNITS[match.group(2)]
+    return seconds if 60 <= seconds <= 366 * 86400 else None
+
+def format_range(seconds):
+    for suffix, size in (('d', 86400), ('h', 3600)):
+        if seconds % size == 0:
+            return f"{seconds // size}{suffix}"
+    return f"{seconds // 60}m"
+
+def lttb(xs, ys, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling. Keeps the first and last
+    points and, per bucket, the point forming the largest triangle with the
+    previously kept point and the next bucket's average, so peaks survive.
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(xs), list(ys)
+    out_x, out_y = [xs[0]], [ys[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        # Average of the next bucket (or the last point)
+        next_start, next_end = end, min(int((i + 2) * every) + 1, n)
+        if next_start >= next_end:
+            avg_x, avg_y = xs[-1], ys[-1]
+        else:
+            count = next_end - next_start
+            avg_x = sum(xs[next_start:next_end]) / count
+            avg_y = sum(ys[next_start:next_end]) / count
+        ax, ay = xs[a], ys[a]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        out_x.append(xs[best])
+        out_y.append(ys[best])
+        a = best
+    out_x.append(xs[-1])
+    out_y.append(ys[-1])
+    return out_x, out_y
+
+class ChartRenderer:
+    """
+    Renders metric history to PNG. The Agg figure, axes and line artists are
+    built once and only their data is replaced per chart. Rendered images are
+    cached by (range, newest bucket, its sample count), so asking for the same
+    chart again before a new sample arrives costs one SQL query and no drawing.
+    Telegram file_ids of sent images are remembered per cache key.
+    matplotlib is imported on the first render (or warm()), not at startup.
+    """
+    def __init__(self, db, width_px=None, height_px=None, dpi=100, cache_size=16):
+        self.db = db
+        self.width_px = width_px or config.GRAPH_WIDTH
+        self.height_px = height_px or config.GRAPH_HEIGHT
+        self.dpi = dpi
+        self.cache_size = cache_size
+        self.renders = 0
+        self._cache = OrderedDict() # key -> png bytes
+        self._file_ids = {}         # key -> Telegram file_id
+        self._lock = threading.Lock()
+        self.figure = None
+
+    def warm(self):
+        """Imports matplotlib and builds the figure ahead of the first /graph"""
+        with self._lock:
+            if self.figure is None:
+                self._build_figure()
+
+    def _build_figure(self):
+        import matplotlib
+        matplotlib.use('Agg') # headless, no GUI toolkit import
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        self.figure = Figure(figsize=(self.width_px / self.dpi, self.height_px / self.dpi), dpi=self.dpi)
+        FigureCanvasAgg(self.figure)
+        self.ax_pct, self.ax_temp = self.figure.subplots(2, 1, sharex=True, height_ratios=(2, 1))
+        self.lines = {}
+        for field, label, color in SERIES:
+            self.lines[field], = self.ax_pct.plot([], [], label=label, color=color, linewidth=1)
+        self.lines['temp'], = self.ax_temp.plot([], [], label='Temp °C', color='#f3a712', linewidth=1)
+        if config.FAN_PIN:
+            self.lines['fan'], = self.ax_pct.plot([], [], label='Fan %', color='#8e6c8a', linewidth=1)
+        self.ax_pct.set_ylim(0, 100)
+        self.ax_pct.legend(loc='upper left', fontsize='small')
+        self.ax_temp.legend(loc='upper left', fontsize='small')
+        for ax in (self.ax_pct, self.ax_temp):
+            ax.grid(True, alpha=0.3)
+        self.title = self.ax_pct.set_title('')
+        self._formatter_span = None
+        # Fixed margins: a layout engine would re-measure every label on each save
+        self.figure.subplots_adjust(left=0.07, right=0.98, top=0.93, bottom=0.08, hspace=0.08)
+
+    def _fetch(self, seconds):
+        """Bucketed averages over the range, aligned so cache keys stay stable"""
+        # Several buckets per pixel for LTTB to choose from
+        points = self.width_px * 4
+        width = max(1, -(-seconds // points))
+        now = int(time.time())
+        start = ((now - seconds) // width) * width
+        return list(self.db.get_history_buckets(start, now + 1, max_points=points + 1, aggregates=('avg',)))
+
+    def _draw(self, seconds, rows):
+        if self.figure is None:
+            self._build_figure()
+        xs = [row['timestamp'] for row in rows]
+        for field, line in self.lines.items():
+            points = [(x, row[f'{field}_avg']) for x, row in zip(xs, rows) if row[f'{field}_avg'] is not None]
+            line.set_data(*lttb([p[0] for p in points], [p[1] for p in points], self.width_px))
+        if seconds != self._formatter_span:
+            from matplotlib.ticker import FuncFormatter
+            fmt = '%H:%M' if seconds <= 86400 else '%d/%m'
+            self.ax_temp.xaxis.set_major_formatter(FuncFormatter(lambda x, _: time.strftime(fmt, time.localtime(x))))
+            self._formatter_span = seconds
+        now = time.time()
+        self.ax_temp.set_xlim(now - seconds, now)
+        self.ax_temp.relim()
+        self.ax_temp.autoscale_view(scalex=False)
+        self.title.set_text(f"Last {format_range(seconds)}")
+        buffer = io.BytesIO()
+        self.figure.savefig(buffer, format='png')
+        self.renders += 1
+        return buffer.getvalue()
+
+    def render(self, seconds):
+        """Returns (cache_key, png_bytes) or (None, None) without data"""
+        rows = self._fetch(seconds)
+        if not rows:
+            return None, None
+        key = (seconds, rows[-1]['timestamp'], rows[-1]['samples'])
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return key, self._cache[key]
+            try:
+                png = self._draw(seconds, rows)
+            except Exception as e:
+                logger.error(f"CHART: Render failed: {e}")
+                return None, None
+            self._cache[key] = png
+            while len(self._cache) > self.cache_size:
+                old, _ = self._cache.popitem(last=False)
+                self._file_ids.pop(old, None)
+            return key, png
+
+    def file_id(self, key):
+        with self._lock:
+            return self._file_ids.get(key)
+
+    def remember_file_id(self, key, file_id):
+        with self._lock:
+            if key in self._cache:
+                self._file_ids[key] = file_id
@@ -1,4 +1,5 @@
 import os
+import socket
 import logging
 from typing import List
 from dotenv import load_dotenv
@@ -16,6 +17,18 @@ try:
 except ValueError:
     ADMIN_USER_IDS = []
 
+# Lower roles (see auth.py for what each may run); ADMIN_USER_IDS may run everything
+try:
+    OPERATOR_USER_IDS = [int(x.strip()) for x in os.getenv('OPERATOR_USER_IDS', '').split(',') if x.strip()]
+    VIEWER_USER_IDS = [int(x.strip()) for x in os.getenv('VIEWER_USER_IDS', '').split(',') if x.strip()]
+except ValueError:
+    OPERATOR_USER_IDS, VIEWER_USER_IDS = [], []
+AUTH_RATE = float(os.getenv('AUTH_RATE', 0.5))  # commands per second per user, sustained
+AUTH_BURST = int(os.getenv('AUTH_BURST', 5))
+# Inline buttons are HMAC-signed; empty = random per run, so buttons from before a restart expire
+CALLBACK_SECRET = os.getenv('CALLBACK_SECRET', '')
+CALLBACK_TTL = int(os.getenv('CALLBACK_TTL', 3600))  # seconds a signed button stays valid
+
 ENABLE_SHELL_EXEC = os.getenv('ENABLE_SHELL_EXEC', 'false').lower() == 'true'
 
 # Features Toggle
@@ -28,10 +41,124 @@ ALERT_TEMP_THRESHOLD = int(os.getenv('ALERT_TEMP_THRESHOLD', 80))
 ALERT_DISK_THRESHOLD = int(os.getenv('ALERT_DISK_THRESHOLD', 90))
 DNS_CHECK_IP = os.getenv('DNS_CHECK_IP', '8.8.8.8')
 
+# Health / systemd watchdog (interval defaults to WatchdogSec / 2 under systemd)
+HEALTH_INTERVAL = float(os.getenv('HEALTH_INTERVAL', 20))
+HEALTH_POLL_MAX_AGE = float(os.getenv('HEALTH_POLL_MAX_AGE', 90))  # getUpdates long-polls for 20s
+HEALTH_LOOP_MAX_AGE = float(os.getenv('HEALTH_LOOP_MAX_AGE', 10))  # event loop heartbeat is 1s
+
+# Prometheus Exporter (optional, serves /metrics)
+EXPORTER_ENABLED = os.getenv('EXPORTER_ENABLED', 'false').lower() == 'true'
+EXPORTER_HOST = os.getenv('EXPORTER_HOST', '0.0.0.0')
+EXPORTER_PORT = int(os.getenv('EXPORTER_PORT', 9101))
+
+# Fleet Mode: 'off', or 'collector' on the bot aggregating agents (python fleet.py on each node)
+FLEET_MODE = os.getenv('FLEET_MODE', 'off').lower()
+FLEET_TOKEN = os.getenv('FLEET_TOKEN', '')                  # shared secret, required
+FLEET_BIND = os.getenv('FLEET_BIND', '0.0.0.0')             # collector listen address
+FLEET_HOST = os.getenv('FLEET_HOST', '127.0.0.1')           # collector address, for agents
+FLEET_PORT = int(os.getenv('FLEET_PORT', 9102))
+FLEET_NAME = os.getenv('FLEET_NAME', socket.gethostname())  # this node's name in the fleet
+FLEET_BATCH_INTERVAL = float(os.getenv('FLEET_BATCH_INTERVAL', 10))
+FLEET_SAMPLE_INTERVAL = float(os.getenv('FLEET_SAMPLE_INTERVAL', 15))
+FLEET_QUERY_TIMEOUT = float(os.getenv('FLEET_QUERY_TIMEOUT', 5))
+FLEET_HANDSHAKE_TIMEOUT = float(os.getenv('FLEET_HANDSHAKE_TIMEOUT', 10)) # seconds for hello/welcome
+
+# Wake-on-LAN
+WOL_DEVICES = os.getenv('WOL_DEVICES', '')          # name=MAC[@iface|cidr|address], comma separated
+WOL_GROUPS = os.getenv('WOL_GROUPS', '')            # group=name+name, comma separated
+WOL_BROADCAST = os.getenv('WOL_BROADCAST', 'auto')  # default target; auto = every interface
+WOL_PORT = int(os.getenv('WOL_PORT', 9))
+WOL_STAGGER = float(os.getenv('WOL_STAGGER', 2))    # seconds between machines in a group
+WOL_REPEAT = int(os.getenv('WOL_REPEAT', 3))         # packets per broadcast address
+
+# /graph Charts
+GRAPH_WIDTH = int(os.getenv('GRAPH_WIDTH', 800))   # pixels, also the LTTB point budget
+GRAPH_HEIGHT = int(os.getenv('GRAPH_HEIGHT', 480))
+
+# Alert Engine (evaluated on every sample)
+ALERT_WINDOW = float(os.getenv('ALERT_WINDOW', 300))       # seconds of samples per rule
+ALERT_SUSTAIN = float(os.getenv('ALERT_SUSTAIN', 120))     # condition must hold this long
+ALERT_COOLDOWN = float(os.getenv('ALERT_COOLDOWN', 1800))  # min seconds between notifications
+ALERT_HYSTERESIS = float(os.getenv('ALERT_HYSTERESIS', 5)) # clears at threshold - hysteresis
+SAMPLE_THROTTLING = os.getenv('SAMPLE_THROTTLING', 'true').lower() == 'true'
+
+# Public IP Lookup (providers are queried concurrently, first answer wins)
+PUBLIC_IP_PROVIDERS = [x.strip() for x in os.getenv(
+    'PUBLIC_IP_PROVIDERS', 'https://api.ipify.org,https://icanhazip.com,https://ifconfig.me/ip'
+).split(',') if x.strip()]
+PUBLIC_IP_TTL = float(os.getenv('PUBLIC_IP_TTL', 300))
+
+# /report collectors run concurrently, each with its own timeout (seconds)
+REPORT_COLLECTOR_TIMEOUT = float(os.getenv('REPORT_COLLECTOR_TIMEOUT', 4))
+REPORT_MAX_WORKERS = int(os.getenv('REPORT_MAX_WORKERS', 4))
+
+# Intervals (in seconds)
+COLLECT_INTERVAL = float(os.getenv('COLLECT_INTERVAL', 60))
+TOP_INTERVAL = float(os.getenv('TOP_INTERVAL', 5))   # /top process sampling
+TOP_N = int(os.getenv('TOP_N', 10))
+
+# GPIO: the only pins /gpio may touch, as name=BCM pin[:pwm] (e.g. relay1=17,fan=18:pwm)
+GPIO_PINS = os.getenv('GPIO_PINS', '')
+GPIO_RAMP_STEP = float(os.getenv('GPIO_RAMP_STEP', 0.05))  # seconds between PWM ramp steps
+
+# PWM fan control (FAN_PIN=0 disables it). Curve points are temp°C:duty%, linear in between.
+FAN_PIN = int(os.getenv('FAN_PIN', 0))
+FAN_CURVE = os.getenv('FAN_CURVE', '50:0,60:40,70:70,75:100')
+FAN_HYSTERESIS = float(os.getenv('FAN_HYSTERESIS', 4))  # °C the CPU must cool before the fan slows down
+FAN_INTERVAL = float(os.getenv('FAN_INTERVAL', 2))      # seconds between control steps
+FAN_MIN_DELTA = float(os.getenv('FAN_MIN_DELTA', 5))    # % change needed before the PWM is rewritten
+FAN_MIN_DUTY = float(os.getenv('FAN_MIN_DUTY', 25))     # % below which the fan would stall
+
+# Hardware Diagnostics (vcgencmd)
+VCGENCMD_PATH = os.getenv('VCGENCMD_PATH', 'vcgencmd')
+# throttled,volts is what /report, the sampler and the exporter use; add clocks and/or mem
+# for the full /sysinfo breakdown (up to 14 more queries per refresh when vcgencmd is spawned)
+DIAG_FIELDS = [x.strip() for x in os.getenv('DIAG_FIELDS', 'throttled,volts').split(',') if x.strip()]
+DIAG_CACHE_TTL = float(os.getenv('DIAG_CACHE_TTL', 5))
+
+# /services dashboard: units queried together in one `systemctl show`
+SERVICES = [x.strip() for x in os.getenv('SERVICES', 'ssh,cron,raspi-botutils').split(',') if x.strip()]
+SYSTEMCTL_PATH = os.getenv('SYSTEMCTL_PATH', 'systemctl')
+SERVICES_CACHE_TTL = float(os.getenv('SERVICES_CACHE_TTL', 10))
+
+# Temperature (sysfs thermal zones)
+THERMAL_ROOT = os.getenv('THERMAL_ROOT', '/sys/class/thermal')
+THERMAL_SAMPLE_HZ = float(os.getenv('THERMAL_SAMPLE_HZ', 0))   # >0 enables smoothed background sampling
+THERMAL_SMOOTHING = float(os.getenv('THERMAL_SMOOTHING', 0.3))  # EMA weight of the newest sample
+
+# Command Dispatcher (handlers run on a bounded pool, limited per command)
+DISPATCH_WORKERS = int(os.getenv('DISPATCH_WORKERS', 8))
+COMMAND_DEFAULT_LIMIT = int(os.getenv('COMMAND_DEFAULT_LIMIT', 4))
+COMMAND_LIMITS = os.getenv('COMMAND_LIMITS', 'speedtest:1,update:1,reboot:1')
+
+# Background Jobs (/update, /speedtest)
+JOB_UPDATE_INTERVAL = float(os.getenv('JOB_UPDATE_INTERVAL', 3))  # min seconds between progress edits
+JOB_TIMEOUT = float(os.getenv('JOB_TIMEOUT', 1800))
+JOB_TAIL_LINES = int(os.getenv('JOB_TAIL_LINES', 15))
+JOB_HISTORY = int(os.getenv('JOB_HISTORY', 20))                  # finished jobs kept in memory
+
+# Outgoing Message Queue (Telegram flood limits)
+OUTBOX_CHAT_RATE = float(os.getenv('OUTBOX_CHAT_RATE', 1))      # messages/sec per chat
+OUTBOX_CHAT_BURST = int(os.getenv('OUTBOX_CHAT_BURST', 3))
+OUTBOX_GLOBAL_RATE = float(os.getenv('OUTBOX_GLOBAL_RATE', 30))  # messages/sec across all chats
+
 # Paths
 DB_FILE = os.getenv('DB_FILE', 'metrics.db')
 LOG_FILE = os.getenv('LOG_FILE', 'bot.log')
 
+# Database Tuning
+DB_FLUSH_SIZE = int(os.getenv('DB_FLUSH_SIZE', 50))           # rows buffered before a forced flush
+DB_FLUSH_INTERVAL = float(os.getenv('DB_FLUSH_INTERVAL', 30))  # seconds between background flushes
+DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', 2048))
+DB_MAX_PENDING = int(os.getenv('DB_MAX_PENDING', 10000))      # rows kept for retry while writes fail
+
+# Metrics Retention (raw samples roll up into 1m -> 15m -> 1h tiers)
+RETENTION_INTERVAL = float(os.getenv('RETENTION_INTERVAL', 300))  # seconds between retention runs
+RETENTION_RAW_HOURS = float(os.getenv('RETENTION_RAW_HOURS', 48))
+RETENTION_1M_DAYS = float(os.getenv('RETENTION_1M_DAYS', 7))
+RETENTION_15M_DAYS = float(os.getenv('RETENTION_15M_DAYS', 30))
+RETENTION_1H_DAYS = float(os.getenv('RETENTION_1H_DAYS', 365))
+
 # Logging Setup
 def setup_logging():
     logging.basicConfig(
@@ -1,78 +1,522 @@
 import sqlite3
 import time
+import zlib
+import atexit
 import logging
+import threading
+from collections import deque
 import config
 
 logger = logging.getLogger(__name__)
 
+# Statements are kept as module constants so sqlite3's statement cache
+# reuses the prepared form on every call.
+INSERT_METRIC_SQL = "INSERT OR REPLACE INTO metrics (ts_ms, cpu, ram, disk, temp, fan) VALUES (?, ?, ?, ?, ?, ?)"
+INSERT_AUDIT_SQL = "INSERT INTO audit_log (timestamp, user_id, command, status) VALUES (?, ?, ?, ?)"
+AUDIT_COLUMNS = ('timestamp', 'user_id', 'command', 'status')
+HISTORY_SQL = "SELECT ts_ms / 1000, cpu / 10.0, ram / 10.0 FROM metrics WHERE ts_ms > ? ORDER BY ts_ms ASC"
+
+# Raw samples are stored as integer tenths (45.3 -> 453) in a WITHOUT ROWID
+# table keyed by millisecond timestamp. SQLite stores small integers in 1-2
+# bytes versus 8 for a REAL, and the clustered key removes the rowid b-tree.
+VALUE_SCALE = 10
+
+def _scale(value):
+    return None if value is None else int(round(value * VALUE_SCALE))
+
+def pack_metric(timestamp, cpu, ram, disk, temp, fan=None):
+    """Converts a sample (timestamp in seconds) to a raw metrics row"""
+    return (int(timestamp * 1000), _scale(cpu), _scale(ram), _scale(disk), _scale(temp), _scale(fan))
+
+# Rollup tiers: (table, bucket seconds, source table). Each tier is fed
+# from the one before it, so every level only aggregates new, complete buckets.
+ROLLUP_TIERS = [
+    ('metrics_1m', 60, 'metrics'),
+    ('metrics_15m', 900, 'metrics_1m'),
+    ('metrics_1h', 3600, 'metrics_15m'),
+]
+ROLLUP_FIELDS = ('cpu', 'ram', 'disk', 'temp', 'fan') # fan: PWM duty %, NULL without fan control
+
+def _rollup_select(bucket_seconds, source):
+    """SELECT that aggregates `source` rows in [?, ?) into rollup buckets"""
+    if source == 'metrics':
+        cols = ["COUNT(*)"]
+        for field in ROLLUP_FIELDS:
+            cols += [f"MIN({field}) / {VALUE_SCALE}.0", f"MAX({field}) / {VALUE_SCALE}.0",
+                     f"AVG({field}) / {VALUE_SCALE}.0"]
+        return (f"SELECT (ts_ms / {bucket_seconds * 1000}) * {bucket_seconds} AS b, {', '.join(cols)} "
+                f"FROM metrics WHERE ts_ms >= ? * 1000 AND ts_ms < ? * 1000 GROUP BY b")
+
+    cols = ["SUM(samples)"]
+    for field in ROLLUP_FIELDS:
+        # Weighted by sample count so merged averages stay exact
+        cols += [f"MIN({field}_min)", f"MAX({field}_max)",
+                 f"SUM({field}_avg * samples) / SUM(samples)"]
+    return (f"SELECT (bucket / {bucket_seconds}) * {bucket_seconds} AS b, {', '.join(cols)} "
+            f"FROM {source} WHERE bucket >= ? AND bucket < ? GROUP BY b")
+
+def _rollup_upsert(table, bucket_seconds, source):
+    columns = ['bucket', 'samples']
+    updates = ["samples = samples + excluded.samples"]
+    for field in ROLLUP_FIELDS:
+        columns += [f"{field}_min", f"{field}_max", f"{field}_avg"]
+        updates += [
+            f"{field}_min = MIN({field}_min, excluded.{field}_min)",
+            f"{field}_max = MAX({field}_max, excluded.{field}_max)",
+            f"{field}_avg = ({field}_avg * samples + excluded.{field}_avg * excluded.samples) / (samples + excluded.samples)",
+        ]
+    # "WHERE true" disambiguates ON CONFLICT after INSERT ... SELECT
+    return (f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"SELECT * FROM ({_rollup_select(bucket_seconds, source)}) WHERE true "
+            f"ON CONFLICT(bucket) DO UPDATE SET {', '.join(updates)}")
+
+BUCKET_AGGREGATES = ('avg', 'min', 'max', 'last')
+
+def _bucket_query(source, fields, aggs):
+    """
+    Groups `source` rows in [start, end) into fixed-width buckets entirely in
+    SQL. The inner query aggregates; the outer join picks the `last` values
+    from the newest row of each bucket. Params: start, width, start, end.
+    """
+    if source == 'metrics':
+        key, samples, alias = "ts_ms / 1000", "COUNT(*)", "m"
+        expr = {
+            'avg': "AVG({f}) / %d.0" % VALUE_SCALE,
+            'min': "MIN({f}) / %d.0" % VALUE_SCALE,
+            'max': "MAX({f}) / %d.0" % VALUE_SCALE,
+            'last': "m.{f} / %d.0" % VALUE_SCALE,
+        }
+        newest, join_key = "MAX(ts_ms)", "ts_ms"
+        where = "ts_ms >= ? * 1000 AND ts_ms < ? * 1000"
+    else:
+        key, samples, alias = "bucket", "SUM(samples)", "t"
+        expr = {
+            'avg': "SUM({f}_avg * samples) / SUM(samples)",
+            'min': "MIN({f}_min)",
+            'max': "MAX({f}_max)",
+            'last': "t.{f}_avg",
+        }
+        newest, join_key = "MAX(bucket)", "bucket"
+        where = "bucket >= ? AND bucket < ?"
+
+    inner = [f"({key} - ?) / ? AS k", f"{samples} AS samples", f"{newest} AS newest"]
+    outer = ["g.k AS k", "g.samples AS samples"]
+    for f in fields:
+        for agg in aggs:
+            if agg == 'last':
+                outer.append(f"{expr['last'].format(f=f)} AS {f}_last")
+            else:
+                inner.append(f"{expr[agg].format(f=f)} AS {f}_{agg}")
+                outer.append(f"g.{f}_{agg} AS {f}_{agg}")
+    return (f"SELECT {', '.join(outer)} FROM "
+            f"(SELECT {', '.join(inner)} FROM {source} WHERE {where} GROUP BY k) g "
+            f"JOIN {source} {alias} ON {alias}.{join_key} = g.newest ORDER BY g.k")
+
 class DatabaseManager:
+    """
+    SQLite storage for metrics and the audit log.
+    Holds one long-lived WAL connection and buffers writes so that many
+    rows share a single transaction (one fsync) instead of one each.
+    """
     def __init__(self):
         self.db_file = config.DB_FILE
+        self.flush_size = config.DB_FLUSH_SIZE
+        self.flush_interval = config.DB_FLUSH_INTERVAL
+        self.max_pending = config.DB_MAX_PENDING
+        self.retention_interval = config.RETENTION_INTERVAL
+        self.retention = {
+            'metrics': config.RETENTION_RAW_HOURS * 3600,
+            'metrics_1m': config.RETENTION_1M_DAYS * 86400,
+            'metrics_15m': config.RETENTION_15M_DAYS * 86400,
+            'metrics_1h': config.RETENTION_1H_DAYS * 86400,
+        }
+        self._last_retention = time.monotonic()
+        self.last_flush = time.monotonic() # progress marker for the health check
+        self._lock = threading.RLock()
+        self._conn = None
+        self._metric_buffer = []
+        self._audit_buffer = deque() # appended without the lock, drained by flush()
+        self._wake = threading.Event() # asks the flusher for an early flush
+        self._last_ts_ms = 0
+        self._stop_event = threading.Event()
+        self._flusher = None
         self._init_db()
+        self._start_flusher()
+        atexit.register(self.close)
+
+    def _connect(self):
+        """Returns the shared connection, opening and tuning it on first use"""
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_file, check_same_thread=False, cached_statements=64)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA cache_size={int(config.DB_CACHE_SIZE_KB) * -1}")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            self._conn = conn
+        return self._conn
 
     def _init_db(self):
         try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                # Metrics Table
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS metrics (
-                        timestamp INTEGER PRIMARY KEY,
-                        cpu_percent REAL,
-                        ram_percent REAL,
-                        disk_percent REAL,
-                        temp REAL
-                    )
-                ''')
-                # Security Audit Log
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS audit_log (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        timestamp INTEGER,
-                        user_id INTEGER,
-                        command TEXT,
-                        status TEXT
-                    )
-                ''')
-                conn.commit()
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    cursor = conn.cursor()
+                    legacy = self._is_legacy_metrics(cursor)
+                    if legacy:
+                        cursor.execute("ALTER TABLE metrics RENAME TO metrics_legacy")
+                    # Metrics Table (values in tenths, see VALUE_SCALE)
+                    cursor.execute('''
+                        CREATE TABLE IF NOT EXISTS metrics (
+                            ts_ms INTEGER PRIMARY KEY,
+                            cpu INTEGER,
+                            ram INTEGER,
+                            disk INTEGER,
+                            temp INTEGER,
+                            fan INTEGER
+                        ) WITHOUT ROWID
+                    ''')
+                    if legacy:
+                        self._migrate_legacy_metrics(cursor)
+                    self._add_columns(cursor, 'metrics', {'fan': 'INTEGER'})
+                    # Security Audit Log
+                    cursor.execute('''
+                        CREATE TABLE IF NOT EXISTS audit_log (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            timestamp INTEGER,
+                            user_id INTEGER,
+                            command TEXT,
+                            status TEXT
+                        )
+                    ''')
+                    # /audit filters by user and/or time and reads newest first
+                    cursor.execute("CREATE INDEX IF NOT EXISTS idx_audit_user_time ON audit_log (user_id, timestamp)")
+                    cursor.execute("CREATE INDEX IF NOT EXISTS idx_audit_time ON audit_log (timestamp)")
+                    # Background job results (output is zlib-compressed)
+                    cursor.execute('''
+                        CREATE TABLE IF NOT EXISTS jobs (
+                            id TEXT PRIMARY KEY,
+                            title TEXT,
+                            command TEXT,
+                            status TEXT,
+                            exit_code INTEGER,
+                            started REAL,
+                            finished REAL,
+                            output BLOB
+                        )
+                    ''')
+                    # Rollup tiers (min/max/avg per bucket)
+                    for table, _, _ in ROLLUP_TIERS:
+                        fields = ', '.join(f"{f}_min REAL, {f}_max REAL, {f}_avg REAL" for f in ROLLUP_FIELDS)
+                        cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} (bucket INTEGER PRIMARY KEY, samples INTEGER, {fields})")
+                        self._add_columns(cursor, table, {f"fan_{agg}": 'REAL' for agg in ('min', 'max', 'avg')})
+                    # Rollup progress: everything before `watermark` is aggregated
+                    cursor.execute('''
+                        CREATE TABLE IF NOT EXISTS rollup_state (
+                            tier TEXT PRIMARY KEY,
+                            watermark INTEGER
+                        )
+                    ''')
         except Exception as e:
             logger.error(f"Database initialization failed: {e}")
 
-    def insert_metric(self, cpu, ram, disk, temp):
+    @staticmethod
+    def _is_legacy_metrics(cursor):
+        """True for pre-v3.1 files: one-second REAL rows keyed by `timestamp`"""
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(metrics)")]
+        return 'cpu_percent' in columns
+
+    @staticmethod
+    def _add_columns(cursor, table, columns):
+        """Adds {name: type} columns that `table` predates (v3.1 files have no fan columns)"""
+        existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+        for name, kind in columns.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {kind}")
+
+    @staticmethod
+    def _migrate_legacy_metrics(cursor):
+        cursor.execute(f'''
+            INSERT OR REPLACE INTO metrics (ts_ms, cpu, ram, disk, temp)
+            SELECT timestamp * 1000,
+                   CAST(ROUND(cpu_percent * {VALUE_SCALE}) AS INTEGER),
+                   CAST(ROUND(ram_percent * {VALUE_SCALE}) AS INTEGER),
+                   CAST(ROUND(disk_percent * {VALUE_SCALE}) AS INTEGER),
+                   CAST(ROUND(temp * {VALUE_SCALE}) AS INTEGER)
+            FROM metrics_legacy
+        ''')
+        migrated = cursor.rowcount
+        cursor.execute("DROP TABLE metrics_legacy")
+        logger.info(f"Migrated {migrated} metrics rows to the compact schema")
+
+    def _start_flusher(self):
+        """Background thread that flushes buffered rows every flush_interval seconds"""
+        if self.flush_interval <= 0:
+            return
+        self._flusher = threading.Thread(target=self._flush_loop, name="db-flusher", daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._stop_event.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._stop_event.is_set():
+                break
+            if self.flush():
+                self.last_flush = time.monotonic()
+            if time.monotonic() - self._last_retention >= self.retention_interval:
+                self._last_retention = time.monotonic()
+                self.run_retention()
+
+    def _maybe_flush(self):
+        if len(self._metric_buffer) + len(self._audit_buffer) >= self.flush_size:
+            self.flush()
+
+    def pending(self):
+        """Number of rows waiting in the write-behind buffer"""
+        with self._lock:
+            return len(self._metric_buffer) + len(self._audit_buffer)
+
+    def flush(self):
+        """Writes all buffered rows in a single transaction. False if the write failed."""
+        with self._lock:
+            if not self._metric_buffer and not self._audit_buffer:
+                return True
+            metrics, self._metric_buffer = self._metric_buffer, []
+            audits = [self._audit_buffer.popleft() for _ in range(len(self._audit_buffer))]
+            try:
+                conn = self._connect()
+                with conn:
+                    if metrics:
+                        conn.executemany(INSERT_METRIC_SQL, metrics)
+                    if audits:
+                        conn.executemany(INSERT_AUDIT_SQL, audits)
+            except Exception as e:
+                logger.error(f"Failed to flush {len(metrics)} metrics / {len(audits)} audit rows: {e}")
+                self._requeue(metrics, audits)
+                return False
+            return True
+
+    def _requeue(self, metrics, audits):
+        """Puts rows from a failed flush back in front of the buffers; the oldest go past max_pending"""
+        self._metric_buffer[:0] = metrics
+        self._audit_buffer.extendleft(reversed(audits))
+        dropped = 0
+        if len(self._metric_buffer) > self.max_pending:
+            dropped += len(self._metric_buffer) - self.max_pending
+            del self._metric_buffer[:-self.max_pending]
+        while len(self._audit_buffer) > self.max_pending:
+            self._audit_buffer.popleft()
+            dropped += 1
+        if dropped:
+            logger.warning(f"Dropped {dropped} oldest buffered rows, more than DB_MAX_PENDING are waiting")
+
+    def run_retention(self, now=None):
+        """
+        Rolls complete buckets up through each tier, then prunes every table
+        past its retention window. Pruning raw rows never loses data because
+        they are already aggregated into metrics_1m by then.
+        """
+        now = int(now if now is not None else time.time())
         try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "INSERT INTO metrics (timestamp, cpu_percent, ram_percent, disk_percent, temp) VALUES (?, ?, ?, ?, ?)",
-                    (int(time.time()), cpu, ram, disk, temp)
-                )
-                # Cleanup old metrics (keep last 48h)
-                cursor.execute("DELETE FROM metrics WHERE timestamp < ?", (int(time.time()) - 172800,))
-                conn.commit()
+            with self._lock:
+                self.flush()
+                conn = self._connect()
+                with conn:
+                    state = dict(conn.execute("SELECT tier, watermark FROM rollup_state"))
+                    source_limit = now
+                    for table, bucket_seconds, source in ROLLUP_TIERS:
+                        start = state.get(table)
+                        if start is None:
+                            # First run: start at the oldest source row
+                            key = 'ts_ms / 1000' if source == 'metrics' else 'bucket'
+                            oldest = conn.execute(f"SELECT MIN({key}) FROM {source}").fetchone()[0]
+                            start = (oldest // bucket_seconds) * bucket_seconds if oldest is not None else 0
+                        # Only whole buckets that the source tier has fully covered
+                        end = (source_limit // bucket_seconds) * bucket_seconds
+                        if end > start:
+                            conn.execute(_rollup_upsert(table, bucket_seconds, source), (start, end))
+                            conn.execute("INSERT OR REPLACE INTO rollup_state (tier, watermark) VALUES (?, ?)", (table, end))
+                            start = end
+                        source_limit = start
+
+                    conn.execute("DELETE FROM metrics WHERE ts_ms < ?", ((now - self.retention['metrics']) * 1000,))
+                    for table, _, _ in ROLLUP_TIERS:
+                        conn.execute(f"DELETE FROM {table} WHERE bucket < ?", (now - self.retention[table],))
         except Exception as e:
-            logger.error(f"Failed to insert metric: {e}")
+            logger.error(f"Retention run failed: {e}")
+
+    def close(self):
+        """Flushes pending rows and closes the connection. Safe to call twice."""
+        self._stop_event.set()
+        self._wake.set()
+        if self._flusher and self._flusher is not threading.current_thread():
+            self._flusher.join(timeout=5)
+        with self._lock:
+            self.flush()
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                except Exception as e:
+                    logger.error(f"Failed to close database: {e}")
+                self._conn = None
+
+    def insert_metric(self, cpu, ram, disk, temp, fan=None):
+        with self._lock:
+            row = pack_metric(time.time(), cpu, ram, disk, temp, fan)
+            if row[0] <= self._last_ts_ms:
+                # Same millisecond (or clock stepped back): keep keys unique
+                row = (self._last_ts_ms + 1,) + row[1:]
+            self._last_ts_ms = row[0]
+            self._metric_buffer.append(row)
+            self._maybe_flush()
 
     def log_command(self, user_id, command, status="SUCCESS"):
+        """Queues an audit row without blocking; the flusher thread writes it"""
+        self._audit_buffer.append((int(time.time()), user_id, command, status))
+        if len(self._audit_buffer) >= self.flush_size:
+            if self._flusher is not None:
+                self._wake.set()
+            else:
+                self.flush()
+
+    def get_audit(self, user_id=None, since=None, limit=20):
+        """Newest audit rows first, optionally for one user and/or since a unix time"""
+        where, params = [], []
+        if user_id is not None:
+            where.append("user_id = ?")
+            params.append(user_id)
+        if since is not None:
+            where.append("timestamp >= ?")
+            params.append(int(since))
+        sql = f"SELECT {', '.join(AUDIT_COLUMNS)} FROM audit_log"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        # Both indexes end in the rowid, so this ordering is an index walk, not a sort
+        sql += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+        self.flush()
+        conn = None
         try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "INSERT INTO audit_log (timestamp, user_id, command, status) VALUES (?, ?, ?, ?)",
-                    (int(time.time()), user_id, command, status)
-                )
-                conn.commit()
+            conn = sqlite3.connect(f"file:{self.db_file}?mode=ro", uri=True)
+            return [dict(zip(AUDIT_COLUMNS, row)) for row in conn.execute(sql, params + [limit])]
         except Exception as e:
-            logger.error(f"Failed to audit log: {e}")
+            logger.error(f"Failed to fetch audit log: {e}")
+            return []
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def save_job(self, job_id, title, command, status, exit_code, started, finished, output):
+        """Stores a finished job; `output` is zlib-compressed bytes"""
+        try:
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO jobs (id, title, command, status, exit_code, started, finished, output) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (job_id, title, command, status, exit_code, started, finished, sqlite3.Binary(output))
+                    )
+        except Exception as e:
+            logger.error(f"Failed to save job {job_id}: {e}")
+
+    def get_job(self, job_id):
+        """Returns a stored job as a dict with decompressed 'output', or None"""
+        try:
+            with self._lock:
+                row = self._connect().execute(
+                    "SELECT id, title, command, status, exit_code, started, finished, output FROM jobs WHERE id = ?",
+                    (job_id,)
+                ).fetchone()
+        except Exception as e:
+            logger.error(f"Failed to fetch job {job_id}: {e}")
+            return None
+        if row is None:
+            return None
+        job = dict(zip(('id', 'title', 'command', 'status', 'exit_code', 'started', 'finished'), row[:7]))
+        job['output'] = zlib.decompress(row[7]).decode(errors='replace') if row[7] else ''
+        return job
+
+    def _history_table(self, seconds):
+        """Finest table whose retention still covers the requested range"""
+        for table in ['metrics'] + [t for t, _, _ in ROLLUP_TIERS]:
+            if seconds <= self.retention[table]:
+                return table
+        return ROLLUP_TIERS[-1][0]
+
+    def _bucket_source(self, conn, start, width, now):
+        """
+        Coarsest rollup tier whose buckets fit inside `width` and whose
+        retention still reaches `start`, with the aligned timestamp where it
+        stops (its watermark). Falls back to raw rows.
+        """
+        state = dict(conn.execute("SELECT tier, watermark FROM rollup_state"))
+        for table, bucket_seconds, _ in reversed(ROLLUP_TIERS):
+            if bucket_seconds <= width and start >= now - self.retention[table] and table in state:
+                return table, state[table]
+        return 'metrics', None
+
+    def get_history_buckets(self, start, end=None, max_points=300, metrics=ROLLUP_FIELDS, aggregates=BUCKET_AGGREGATES):
+        """
+        Streams at most `max_points` bucketed rows for [start, end) as dicts:
+        {'timestamp', 'samples', 'cpu_avg', 'cpu_min', ..., 'temp_last'}.
+        Bucketing runs in SQL and rows are read lazily on a separate read
+        connection, so memory stays bounded whatever the range.
+        """
+        now = int(time.time())
+        start, end = int(start), int(end if end is not None else now + 1)
+        for name in metrics:
+            if name not in ROLLUP_FIELDS:
+                raise ValueError(f"Unknown metric '{name}'")
+        for agg in aggregates:
+            if agg not in BUCKET_AGGREGATES:
+                raise ValueError(f"Unknown aggregate '{agg}'")
+        if end <= start or max_points < 1:
+            return
+        width = max(1, -(-(end - start) // max_points)) # ceil
+
+        self.flush() # make buffered samples visible
+        conn = None
+        try:
+            # WAL readers never block the writer, so streaming is safe
+            conn = sqlite3.connect(f"file:{self.db_file}?mode=ro", uri=True)
+            source, watermark = self._bucket_source(conn, start, width, now)
+            ranges = [(source, start, end)]
+            if watermark is not None and watermark < end:
+                # The tier lags behind by up to one bucket: serve the tail
+                # from raw rows, split on a bucket boundary
+                split = max(start, start + ((watermark - start) // width) * width)
+                ranges = [(source, start, split), ('metrics', split, end)]
+
+            for table, lo, hi in ranges:
+                if hi <= lo:
+                    continue
+                sql = _bucket_query(table, metrics, aggregates)
+                cursor = conn.execute(sql, (start, width, lo, hi))
+                columns = [d[0] for d in cursor.description]
+                for row in cursor:
+                    bucket = dict(zip(columns, row))
+                    bucket['timestamp'] = start + bucket.pop('k') * width
+                    yield bucket
+        except Exception as e:
+            logger.error(f"Failed to fetch history buckets: {e}")
+        finally:
+            if conn is not None:
+                conn.close()
 
     def get_history(self, hours=1):
         cutoff = int(time.time()) - (hours * 3600)
+        table = self._history_table(hours * 3600)
         try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "SELECT timestamp, cpu_percent, ram_percent FROM metrics WHERE timestamp > ? ORDER BY timestamp ASC",
-                    (cutoff,)
-                )
+            with self._lock:
+                self.flush()
+                if table == 'metrics':
+                    cursor = self._connect().execute(HISTORY_SQL, (cutoff * 1000,))
+                else:
+                    # Long ranges come from the pre-aggregated tier
+                    cursor = self._connect().execute(
+                        f"SELECT bucket, cpu_avg, ram_avg FROM {table} WHERE bucket > ? ORDER BY bucket ASC",
+                        (cutoff,)
+                    )
                 return cursor.fetchall()
         except Exception as e:
             logger.error(f"Failed to fetch history: {e}")
@@ -0,0 +1,208 @@
+import os
+import time
+import array
+import fcntl
+import shlex
+import struct
+import logging
+import threading
+import subprocess
+import config
+
+logger = logging.getLogger(__name__)
+
+# get_throttled bitmask (see Raspberry Pi vcgencmd documentation)
+THROTTLE_BITS = {
+    0: 'under_voltage',
+    1: 'freq_capped',
+    2: 'throttled',
+    3: 'soft_temp_limit',
+    16: 'under_voltage_occurred',
+    17: 'freq_capped_occurred',
+    18: 'throttled_occurred',
+    19: 'soft_temp_limit_occurred',
+}
+
+CLOCK_DOMAINS = ('arm', 'core', 'h264', 'isp', 'v3d', 'uart', 'pwm', 'emmc', 'pixel', 'vec', 'hdmi', 'dpi')
+VOLT_RAILS = ('core', 'sdram_c', 'sdram_i', 'sdram_p')
+MEM_SPLITS = ('arm', 'gpu')
+
+SYSFS_THROTTLED = 'sys/devices/platform/soc/soc:firmware/get_throttled'
+SYSFS_ARM_FREQ = 'sys/devices/system/cpu/cpu0/cpufreq/scaling_cur_freq'
+
+# VideoCore mailbox "gencmd" property, the same channel vcgencmd itself uses
+MAILBOX_DEVICE = '/dev/vcio'
+MAILBOX_TAG_GENCMD = 0x00030080
+MAILBOX_MAX_STRING = 1024
+IOCTL_MBOX_PROPERTY = (3 << 30) | (struct.calcsize('P') << 16) | (100 << 8) | 0 # _IOWR(100, 0, char *)
+
+def mailbox_gencmd(fd, command):
+    """Runs one gencmd through an open /dev/vcio fd and returns its text output"""
+    encoded = command.encode() + b'\0'
+    if len(encoded) >= MAILBOX_MAX_STRING:
+        raise ValueError("gencmd command too long")
+    words = MAILBOX_MAX_STRING // 4
+    buf = array.array('I', [0] * (7 + words))
+    buf[1] = 0                      # process request
+    buf[2] = MAILBOX_TAG_GENCMD
+    buf[3] = MAILBOX_MAX_STRING     # value buffer length
+    buf[4] = 0                      # request length
+    buf[5] = 0                      # gencmd error code (response)
+    payload = array.array('I', encoded.ljust(MAILBOX_MAX_STRING, b'\0'))
+    buf[6:6 + words] = payload
+    buf[-1] = 0                     # end tag
+    buf[0] = len(buf) * 4
+    fcntl.ioctl(fd, IOCTL_MBOX_PROPERTY, buf, True)
+    if buf[5] != 0:
+        raise OSError(f"gencmd '{command}' returned error {buf[5]}")
+    return buf[6:6 + words].tobytes().split(b'\0', 1)[0].decode()
+
+def decode_throttled(value):
+    """Turns the get_throttled bitmask into {flag_name: bool}"""
+    return {name: bool(value & (1 << bit)) for bit, name in THROTTLE_BITS.items()}
+
+class PiDiagnostics:
+    """
+    vcgencmd diagnostics collector.
+    Reads sysfs where the kernel exposes the value and sends the remaining
+    queries straight to the firmware mailbox (/dev/vcio, no process spawn).
+    Without mailbox access every query runs in ONE shell spawn. Results are
+    cached for `ttl` seconds so repeated /report or /sysinfo calls are free.
+    """
+    def __init__(self, fields=None, ttl=None, binary=None, sysfs_root='/', mailbox=MAILBOX_DEVICE):
+        self.fields = list(fields if fields is not None else config.DIAG_FIELDS)
+        self.ttl = ttl if ttl is not None else config.DIAG_CACHE_TTL
+        self.binary = binary or config.VCGENCMD_PATH
+        self.sysfs_root = sysfs_root
+        self.mailbox = mailbox
+        self.spawns = 0
+        self._cache = None
+        self._cached_at = 0.0
+        self._lock = threading.Lock()
+
+    def _sysfs(self, path):
+        try:
+            with open(os.path.join(self.sysfs_root, path)) as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    def _commands(self, skip):
+        """(label, vcgencmd args) for every configured field not served by sysfs"""
+        commands = []
+        if 'throttled' in self.fields and 'throttled' not in skip:
+            commands.append(('throttled', ['get_throttled']))
+        if 'clocks' in self.fields:
+            commands += [(f'clock_{d}', ['measure_clock', d]) for d in CLOCK_DOMAINS
+                         if f'clock_{d}' not in skip]
+        if 'volts' in self.fields:
+            commands += [(f'volt_{r}', ['measure_volts', r]) for r in VOLT_RAILS]
+        if 'mem' in self.fields:
+            commands += [(f'mem_{m}', ['get_mem', m]) for m in MEM_SPLITS]
+        return commands
+
+    def _run_mailbox(self, commands):
+        """Queries the firmware directly. Returns None if the mailbox is unusable."""
+        if not self.mailbox or not os.path.exists(self.mailbox):
+            return None
+        try:
+            fd = os.open(self.mailbox, os.O_RDWR)
+        except OSError as e:
+            logger.info(f"DIAG: Mailbox unavailable ({e}), falling back to vcgencmd")
+            self.mailbox = None
+            return None
+        raw = {}
+        try:
+            for label, args in commands:
+                try:
+                    line = mailbox_gencmd(fd, ' '.join(args))
+                except OSError as e:
+                    logger.debug(f"DIAG: Mailbox query {label} failed: {e}")
+                    continue
+                if '=' in line:
+                    raw[label] = line.split('=', 1)[1]
+        finally:
+            os.close(fd)
+        return raw or None
+
+    def _run_batch(self, commands):
+        """Runs all vcgencmd queries in a single `sh -c` and returns {label: raw value}"""
+        script = '; '.join(
+            f"echo @{label}; {shlex.quote(self.binary)} {' '.join(shlex.quote(a) for a in args)} 2>&1"
+            for label, args in commands
+        )
+        self.spawns += 1
+        # Not check_output: one unsupported query must not discard the rest
+        output = subprocess.run(['sh', '-c', script], stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT, timeout=5).stdout.decode()
+
+        raw, label = {}, None
+        for line in output.splitlines():
+            line = line.strip()
+            if line.startswith('@'):
+                label = line[1:]
+            elif label and '=' in line:
+                # throttled=0x0 / frequency(48)=600000000 / volt=1.2000V / arm=948M
+                raw[label] = line.split('=', 1)[1]
+                label = None
+        if not raw:
+            logger.warning(f"DIAG: No usable vcgencmd output: {output.strip()[:200]}")
+        return raw
+
+    def _collect(self):
+        raw = {}
+        # Fast paths that need no process at all
+        if 'throttled' in self.fields:
+            value = self._sysfs(SYSFS_THROTTLED)
+            if value is not None:
+                raw['throttled'] = f"0x{int(value, 16):x}"
+        if 'clocks' in self.fields:
+            value = self._sysfs(SYSFS_ARM_FREQ)
+            if value is not None:
+                raw['clock_arm'] = str(int(value) * 1000) # kHz -> Hz
+
+        commands = self._commands(skip=raw)
+        if commands:
+            fetched = self._run_mailbox(commands)
+            raw.update(fetched if fetched is not None else self._run_batch(commands))
+        return self._parse(raw)
+
+    @staticmethod
+    def _parse(raw):
+        data = {}
+        clocks, volts, mem = {}, {}, {}
+        for label, value in raw.items():
+            try:
+                if label == 'throttled':
+                    data['throttled'] = value
+                    data['throttle_flags'] = decode_throttled(int(value, 16))
+                elif label.startswith('clock_'):
+                    clocks[label[6:]] = int(value)
+                elif label.startswith('volt_'):
+                    volts[label[5:]] = float(value.rstrip('V'))
+                elif label.startswith('mem_'):
+                    mem[label[4:]] = int(value.rstrip('M'))
+            except ValueError:
+                logger.warning(f"DIAG: Could not parse {label}={value}")
+
+        data.update(clocks=clocks, volts=volts, mem=mem)
+        # Keys used by /report since v3.0
+        if 'core' in volts:
+            data['volt_core'] = f"{volts['core']:.4f}V"
+        if 'arm' in clocks:
+            data['clock_arm'] = str(clocks['arm'])
+        return data
+
+    def get(self, max_age=None):
+        """Returns cached diagnostics, collecting them again once older than the TTL"""
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            if self._cache is not None and time.monotonic() - self._cached_at < max_age:
+                return self._cache
+            try:
+                self._cache = self._collect()
+                self._cached_at = time.monotonic()
+                return self._cache
+            except Exception as e:
+                logger.error(f"Error executing vcgencmd: {e}")
+                return {'error': str(e)}
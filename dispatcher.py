@@ -0,0 +1,164 @@
+import time
+import asyncio
+import logging
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import telebot
+import config
+
+logger = logging.getLogger(__name__)
+
+def parse_limits(spec):
+    """'speedtest:1,update:1' -> {'speedtest': 1, 'update': 1}"""
+    limits = {}
+    for item in spec.split(','):
+        if ':' in item:
+            name, value = item.split(':', 1)
+            limits[name.strip().lstrip('/')] = int(value)
+    return limits
+
+def command_key(update):
+    """Concurrency bucket for an incoming Message/CallbackQuery"""
+    text = getattr(update, 'text', None)
+    if text and text.startswith('/'):
+        return text.split()[0][1:].split('@')[0].lower()
+    if getattr(update, 'data', None) is not None:
+        return 'callback'
+    return 'message'
+
+class CommandDispatcher:
+    """
+    asyncio core that replaces TeleBot's polling loop and worker pool.
+    - Long polling runs on its own executor thread and never waits on handlers.
+    - Handlers (blocking code) run on a bounded thread pool.
+    - Each command has its own semaphore, so one slow /speedtest or /update
+      can only occupy its own slots, not every worker.
+    - stats() reports queued/running counts and latency per command.
+    """
+    def __init__(self, workers=None, limits=None, default_limit=None):
+        self.workers = workers or config.DISPATCH_WORKERS
+        self.limits = limits if limits is not None else parse_limits(config.COMMAND_LIMITS)
+        self.default_limit = default_limit or config.COMMAND_DEFAULT_LIMIT
+        self.loop = None
+        self.last_poll = None # monotonic time of the last getUpdates attempt, failed or not
+        self.last_beat = None # monotonic time of the last event loop heartbeat
+        self.loop_lag = 0.0   # how late the last heartbeat woke up, in seconds
+        self.max_loop_lag = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="handler")
+        self._poll_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="poller")
+        self._semaphores = {}
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+        self._stopping = None
+        self._ready = threading.Event()
+
+    def _stat(self, key):
+        return self._stats.setdefault(key, {'queued': 0, 'running': 0, 'done': 0, 'failed': 0,
+                                            'max_queued': 0, 'last_latency': 0.0, 'total_time': 0.0})
+
+    def _semaphore(self, key):
+        if key not in self._semaphores:
+            self._semaphores[key] = asyncio.Semaphore(self.limits.get(key, self.default_limit))
+        return self._semaphores[key]
+
+    def stats(self):
+        """{command: {'queued', 'running', 'done', 'failed', 'max_queued', 'last_latency', 'total_time'}}"""
+        with self._stats_lock:
+            return {key: dict(value) for key, value in self._stats.items()}
+
+    def queue_depth(self):
+        with self._stats_lock:
+            return sum(s['queued'] for s in self._stats.values())
+
+    async def _run(self, key, task, args, kwargs):
+        with self._stats_lock:
+            stat = self._stat(key)
+            stat['queued'] += 1
+            stat['max_queued'] = max(stat['max_queued'], stat['queued'])
+        enqueued = time.monotonic()
+        async with self._semaphore(key):
+            with self._stats_lock:
+                stat['queued'] -= 1
+                stat['running'] += 1
+            started = time.monotonic()
+            try:
+                await self.loop.run_in_executor(self._executor, functools.partial(task, *args, **kwargs))
+                ok = True
+            except Exception as e:
+                logger.error(f"DISPATCH: Handler for '{key}' failed: {e}")
+                ok = False
+            finally:
+                with self._stats_lock:
+                    stat['running'] -= 1
+                    stat['done' if ok else 'failed'] += 1
+                    stat['last_latency'] = time.monotonic() - enqueued
+                    stat['total_time'] += time.monotonic() - started
+
+    def submit(self, task, *args, **kwargs):
+        """Schedules a handler call from any thread; returns a concurrent Future"""
+        key = command_key(args[0]) if args else getattr(task, '__name__', 'task')
+        return asyncio.run_coroutine_threadsafe(self._run(key, task, args, kwargs), self.loop)
+
+    async def _poll(self, bot, timeout):
+        offset, backoff = None, 1
+        while not self._stopping.is_set():
+            try:
+                updates = await self.loop.run_in_executor(self._poll_executor, functools.partial(
+                    bot.get_updates, offset=offset, timeout=timeout, long_polling_timeout=timeout))
+                backoff = 1
+            except Exception as e:
+                # A failed attempt is still progress: the watchdog catches a hung poller, not a lost network
+                self.last_poll = time.monotonic()
+                logger.error(f"DISPATCH: getUpdates failed: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+                continue
+            self.last_poll = time.monotonic()
+            if updates:
+                offset = updates[-1].update_id + 1
+                # Routing only; handlers are handed to submit() via _exec_task
+                bot.process_new_updates(updates)
+
+    async def _heartbeat(self, interval=1.0):
+        """Measures event loop lag: anything blocking the loop delays this wake-up"""
+        while True:
+            expected = self.loop.time() + interval
+            await asyncio.sleep(interval)
+            self.loop_lag = max(0.0, self.loop.time() - expected)
+            self.max_loop_lag = max(self.max_loop_lag, self.loop_lag)
+            self.last_beat = time.monotonic()
+
+    async def _main(self, bot, timeout):
+        self.loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        self._ready.set()
+        poller = asyncio.create_task(self._poll(bot, timeout))
+        heartbeat = asyncio.create_task(self._heartbeat())
+        await self._stopping.wait()
+        poller.cancel()
+        heartbeat.cancel()
+
+    def run(self, bot, timeout=20):
+        """Blocks running the polling loop until stop() is called"""
+        try:
+            asyncio.run(self._main(bot, timeout))
+        finally:
+            self._executor.shutdown(wait=False)
+            self._poll_executor.shutdown(wait=False)
+
+    def wait_ready(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def stop(self):
+        if self.loop and self._stopping:
+            self.loop.call_soon_threadsafe(self._stopping.set)
+
+class DispatchingBot(telebot.TeleBot):
+    """TeleBot whose handlers are executed by a CommandDispatcher instead of its worker pool"""
+    def __init__(self, token, dispatcher, **kwargs):
+        super().__init__(token, threaded=False, **kwargs)
+        self.dispatcher = dispatcher
+
+    def _exec_task(self, task, *args, **kwargs):
+        self.dispatcher.submit(task, *args, **kwargs)
@@ -0,0 +1,171 @@
+"""
+Embedded Prometheus exporter (text exposition format 0.0.4).
+
+The response body is rebuilt once per sample by update(), registered as a
+MetricsSampler listener, from state the bot already holds in memory. A
+scrape only sends the prepared bytes (gzipped too if the scraper asks), so
+it never runs a subprocess or touches SQLite.
+"""
+import gzip
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import config
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_value(value):
+    if value is True or value is False:
+        return '1' if value else '0'
+    if isinstance(value, float) and value != value:
+        return 'NaN'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def render(families, prefix='raspibot_'):
+    """
+    families: iterable of (name, type, help, samples) where samples is a list
+    of (labels dict, value). Samples with a None value are skipped.
+    """
+    lines = []
+    for name, kind, help_text, samples in families:
+        samples = [(labels, value) for labels, value in samples if value is not None]
+        if not samples:
+            continue
+        full = prefix + name
+        lines.append(f"# HELP {full} {help_text}")
+        lines.append(f"# TYPE {full} {kind}")
+        for labels, value in samples:
+            label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            lines.append(f"{full}{{{label_text}}} {_format_value(value)}" if label_text
+                         else f"{full} {_format_value(value)}")
+    return ('\n'.join(lines) + '\n').encode()
+
+class MetricsExporter:
+    """
+    Collectors are callables returning metric families (see render()); they
+    run on the sampler thread, once per sample.
+    """
+    def __init__(self, host=None, port=None):
+        self.host = host if host is not None else config.EXPORTER_HOST
+        self.port = port if port is not None else config.EXPORTER_PORT
+        self.scrapes = 0
+        self.updates = 0
+        self._collectors = []
+        self._body = b''
+        self._gzipped = gzip.compress(self._body)
+        self._server = None
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def update(self, sample=None):
+        """Rebuilds the response body. `sample` is the MetricsSampler dict (unused, for listener use)."""
+        families = []
+        for collector in self._collectors:
+            try:
+                families.extend(collector())
+            except Exception as e:
+                logger.error(f"EXPORTER: Collector {collector} failed: {e}")
+        body = render(families)
+        # Swap both at once: a concurrent scrape sees the old or the new pair
+        self._body, self._gzipped = body, gzip.compress(body, compresslevel=5)
+        self.updates += 1
+
+    def payload(self, accept_gzip=False):
+        return self._gzipped if accept_gzip else self._body
+
+    @property
+    def address(self):
+        return self._server.server_address if self._server else None
+
+    def start(self):
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                gzipped = 'gzip' in self.headers.get('Accept-Encoding', '')
+                body = exporter.payload(gzipped)
+                exporter.scrapes += 1
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                if gzipped:
+                    self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            logger.error(f"EXPORTER: Cannot listen on {self.host}:{self.port}: {e}")
+            return False
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="exporter", daemon=True).start()
+        logger.info(f"EXPORTER: Serving /metrics on {self.host}:{self.address[1]}")
+        return True
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+def sample_families(sample):
+    """Families for a MetricsSampler sample dict"""
+    if not sample:
+        return []
+    return [
+        ('cpu_percent', 'gauge', "CPU utilisation", [({}, sample.get('cpu'))]),
+        ('memory_percent', 'gauge', "RAM utilisation", [({}, sample.get('ram'))]),
+        ('disk_percent', 'gauge', "Root filesystem utilisation", [({}, sample.get('disk'))]),
+        ('cpu_temperature_celsius', 'gauge', "CPU temperature", [({}, sample.get('temp'))]),
+        ('fan_duty_percent', 'gauge', "Fan PWM duty cycle", [({}, sample.get('fan'))]),
+        ('last_sample_timestamp_seconds', 'gauge', "Unix time of the last sample", [({}, sample.get('timestamp'))]),
+    ]
+
+def throttle_families(diag):
+    """Families for cached vcgencmd diagnostics (see diagnostics.PiDiagnostics)"""
+    flags = diag.get('throttle_flags') or {}
+    families = [('throttle_flag', 'gauge', "vcgencmd get_throttled bits",
+                 [({'flag': name}, bool(on)) for name, on in flags.items()])]
+    volts = diag.get('volts') or {}
+    families.append(('voltage_volts', 'gauge', "vcgencmd measure_volts",
+                     [({'rail': rail}, value) for rail, value in volts.items()]))
+    clocks = diag.get('clocks') or {}
+    families.append(('clock_hertz', 'gauge', "vcgencmd measure_clock",
+                     [({'domain': domain}, value) for domain, value in clocks.items()]))
+    return families
+
+def service_families(states):
+    """Families for cached services.ServiceMonitor states"""
+    states = states or {}
+    return [
+        ('service_active', 'gauge', "1 if the systemd unit is active",
+         [({'unit': unit}, s['active'] == 'active') for unit, s in states.items()]),
+        ('service_restarts_total', 'counter', "systemd NRestarts per unit",
+         [({'unit': unit}, s['restarts']) for unit, s in states.items()]),
+    ]
+
+def command_families(stats):
+    """Families for dispatcher.CommandDispatcher.stats()"""
+    return [
+        ('commands_total', 'counter', "Handled commands by outcome",
+         [({'command': cmd, 'status': status}, s[status]) for cmd, s in stats.items() for status in ('done', 'failed')]),
+        ('command_seconds_total', 'counter', "Total handler time per command",
+         [({'command': cmd}, s['total_time']) for cmd, s in stats.items()]),
+        ('command_last_latency_seconds', 'gauge', "Latency of the most recent call per command",
+         [({'command': cmd}, s['last_latency']) for cmd, s in stats.items()]),
+        ('command_queued', 'gauge', "Commands waiting for a concurrency slot",
+         [({'command': cmd}, s['queued']) for cmd, s in stats.items()]),
+    ]
@@ -0,0 +1,158 @@
+"""
+Closed-loop PWM fan control.
+
+Every FAN_INTERVAL seconds the CPU temperature is mapped to a duty cycle
+through FAN_CURVE. While cooling, the curve is read FAN_HYSTERESIS degrees
+higher, so a temperature hovering around a curve point doesn't make the fan
+hunt. The PWM pin is only rewritten when the duty moves by FAN_MIN_DELTA or
+reaches fully on/off. A failed or implausible reading never drives the fan:
+the last duty is held, and after MAX_FAILED_READS in a row (or before any
+good reading) the fan runs at 100%.
+"""
+import time
+import logging
+import threading
+import config
+
+logger = logging.getLogger(__name__)
+
+DEVICE_NAME = 'fan_pwm'
+# °C, exclusive of 0: a running SoC sits above freezing, and 0.0 is what failed
+# sensor reads used to return. Anything outside is a bad reading.
+PLAUSIBLE_TEMP = (0.0, 125.0)
+MAX_FAILED_READS = 3            # bad readings in a row before the fan goes to 100%
+
+def parse_curve(spec):
+    """'50:0,60:40,75:100' (°C:duty %) -> [(50.0, 0.0), (60.0, 0.4), (75.0, 1.0)] sorted by temperature"""
+    points = []
+    for entry in filter(None, (part.strip() for part in (spec or '').split(','))):
+        temp, _, duty = entry.partition(':')
+        try:
+            points.append((float(temp), max(0.0, min(1.0, float(duty) / 100))))
+        except ValueError:
+            logger.error(f"FAN: Ignoring curve point '{entry}', expected <°C>:<duty %>")
+    return sorted(points)
+
+def curve_duty(curve, temp):
+    """Duty cycle (0.0-1.0) for a temperature, linear between curve points and flat past the ends"""
+    if not curve:
+        return 1.0
+    if temp <= curve[0][0]:
+        return curve[0][1]
+    for (t0, d0), (t1, d1) in zip(curve, curve[1:]):
+        if temp <= t1:
+            return d0 + (d1 - d0) * (temp - t0) / (t1 - t0)
+    return curve[-1][1]
+
+class FanController:
+    """
+    Drives a PWM fan from temperature readings. read_temperature defaults to
+    hal.get_cpu_temperature; tests pass a thermal model instead.
+    """
+    def __init__(self, hal, pin=None, curve=None, hysteresis=None, interval=None,
+                 min_delta=None, min_duty=None, read_temperature=None):
+        self.hal = hal
+        self.pin = pin if pin is not None else config.FAN_PIN
+        self.curve = curve if curve is not None else parse_curve(config.FAN_CURVE)
+        self.hysteresis = hysteresis if hysteresis is not None else config.FAN_HYSTERESIS
+        self.interval = interval if interval is not None else config.FAN_INTERVAL
+        self.min_delta = min_delta if min_delta is not None else config.FAN_MIN_DELTA / 100
+        self.min_duty = min_duty if min_duty is not None else config.FAN_MIN_DUTY / 100
+        self.read_temperature = read_temperature or hal.get_cpu_temperature
+        self.duty = None        # last duty written to the pin
+        self.temperature = None
+        self.failed_reads = 0   # bad readings in a row
+        self.updates = 0
+        self.writes = 0
+        self.last_update = None # monotonic time of the last control step
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self):
+        return bool(self.pin)
+
+    def target(self, temp):
+        """Duty for `temp` given the current duty: the curve going up, the curve + hysteresis going down"""
+        duty = curve_duty(self.curve, temp)
+        if self.duty is not None and duty < self.duty:
+            duty = min(self.duty, curve_duty(self.curve, temp + self.hysteresis))
+        if 0.0 < duty < self.min_duty:
+            duty = self.min_duty
+        return duty
+
+    def _read(self):
+        """Temperature from read_temperature, None if reading failed"""
+        try:
+            temp = self.read_temperature()
+        except Exception as e:
+            logger.error(f"FAN: Reading temperature failed: {e}")
+            return None
+        return temp
+
+    @staticmethod
+    def plausible(temp):
+        return temp is not None and PLAUSIBLE_TEMP[0] < temp <= PLAUSIBLE_TEMP[1]
+
+    def update(self, temp=None):
+        """One control step. Returns the duty cycle in effect."""
+        temp = self._read() if temp is None else temp
+        self.updates += 1
+        self.last_update = time.monotonic()
+        if not self.plausible(temp):
+            return self._fail_safe(temp)
+        self.failed_reads = 0
+        self.temperature = temp
+        duty = self.target(temp)
+        if (self.duty is None or abs(duty - self.duty) >= self.min_delta
+                or (duty != self.duty and duty in (0.0, 1.0))):
+            self._write(duty)
+        return self.duty
+
+    def _fail_safe(self, temp):
+        """Holds the last duty on a bad reading; full speed if they persist or none was ever good"""
+        self.failed_reads += 1
+        if self.duty is None or self.failed_reads >= MAX_FAILED_READS:
+            if self.duty != 1.0:
+                logger.warning(f"FAN: {self.failed_reads} bad temperature reading(s) (last {temp}), running at 100%")
+                self._write(1.0)
+        else:
+            logger.warning(f"FAN: Ignoring temperature reading {temp}, holding {self.duty:.0%}")
+        return self.duty
+
+    def _write(self, duty):
+        if self.hal.setup_pin(self.pin, DEVICE_NAME, is_pwm=True) is None:
+            return
+        self.hal.set_pin_state(DEVICE_NAME, duty)
+        reading = 'no reading' if self.temperature is None else f"{self.temperature:.1f}°C"
+        logger.debug(f"FAN: {reading} -> {duty:.0%}")
+        self.duty = duty
+        self.writes += 1
+
+    def duty_percent(self):
+        """Current duty in percent for the metrics table, None before the first step"""
+        return None if self.duty is None else round(self.duty * 100, 1)
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while not self._stop_event.is_set():
+            try:
+                self.update()
+            except Exception as e:
+                logger.error(f"FAN: Control step failed: {e}")
+            next_tick = max(next_tick + self.interval, time.monotonic())
+            self._stop_event.wait(next_tick - time.monotonic())
+
+    def start(self):
+        if not self.enabled or (self._thread and self._thread.is_alive()):
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="fan-control", daemon=True)
+        self._thread.start()
+        logger.info(f"FAN: Controlling BCM {self.pin} every {self.interval}s, curve {self.curve}")
+
+    def stop(self, timeout=5):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
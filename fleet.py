@@ -0,0 +1,430 @@
+"""
+Fleet mode: one bot aggregating many Pis.
+
+Each node runs a lightweight agent (`python fleet.py`) that samples locally
+and pushes metric batches to the central bot's FleetCollector over one
+persistent TCP connection. The same connection carries queries the other
+way (/report, /top for a host), so agents need no inbound port.
+
+Frames are a 4-byte length followed by JSON compressed on a zlib stream
+that lives as long as the connection (Z_SYNC_FLUSH per frame), so repeated
+keys across batches compress to almost nothing.
+"""
+import hmac
+import json
+import zlib
+import time
+import socket
+import struct
+import logging
+import itertools
+import threading
+import socketserver
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+import config
+
+logger = logging.getLogger(__name__)
+
+MAX_FRAME = 4 * 1024 * 1024 # bytes after decompression
+# What a broken, closed or corrupt connection raises from Channel.recv()
+CHANNEL_ERRORS = (OSError, ValueError, zlib.error)
+
+class Channel:
+    """Framed, stream-compressed JSON messages over a connected socket"""
+    def __init__(self, sock):
+        self.sock = sock
+        self.bytes_sent = 0
+        self.raw_sent = 0
+        self._send_lock = threading.Lock()
+        self._compressor = zlib.compressobj(6)
+        self._decompressor = zlib.decompressobj()
+
+    def send(self, message):
+        raw = json.dumps(message, separators=(',', ':')).encode()
+        with self._send_lock:
+            data = self._compressor.compress(raw) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+            self.sock.sendall(struct.pack('!I', len(data)) + data)
+            self.bytes_sent += len(data) + 4
+            self.raw_sent += len(raw)
+
+    def _read_exact(self, size):
+        buffer = bytearray(size)
+        view, received = memoryview(buffer), 0
+        while received < size:
+            count = self.sock.recv_into(view[received:])
+            if count == 0:
+                raise ConnectionError("connection closed")
+            received += count
+        return bytes(buffer)
+
+    def recv(self):
+        (size,) = struct.unpack('!I', self._read_exact(4))
+        if size > MAX_FRAME:
+            raise ValueError(f"frame too large ({size} bytes)")
+        raw = self._decompressor.decompress(self._read_exact(size), MAX_FRAME)
+        if self._decompressor.unconsumed_tail:
+            raise ValueError("frame too large after decompression")
+        message = json.loads(raw)
+        if not isinstance(message, dict):
+            raise ValueError("malformed frame")
+        return message
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+class FleetAgent:
+    """
+    Node side. push(sample) buffers samples (oldest dropped while
+    disconnected); they are sent every `batch_interval` seconds or once
+    `batch_size` are waiting. Queries from the collector run on a small
+    pool and are answered on the same connection.
+    """
+    def __init__(self, host=None, port=None, name=None, token=None, batch_interval=None,
+                 batch_size=100, buffer_size=1000):
+        self.host = host or config.FLEET_HOST
+        self.port = port or config.FLEET_PORT
+        self.name = name or config.FLEET_NAME
+        self.token = token if token is not None else config.FLEET_TOKEN
+        self.batch_interval = batch_interval if batch_interval is not None else config.FLEET_BATCH_INTERVAL
+        self.batch_size = batch_size
+        self.batches_sent = 0
+        self.channel = None
+        self._handlers = {}
+        self._buffer = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="agent-query")
+        self._thread = None
+
+    @property
+    def connected(self):
+        return self.channel is not None
+
+    def add_handler(self, query, func):
+        """func(**args) -> JSON-serialisable result"""
+        self._handlers[query] = func
+
+    def push(self, sample):
+        """MetricsSampler listener"""
+        with self._lock:
+            self._buffer.append(sample)
+            if len(self._buffer) >= self.batch_size:
+                self._wake.set()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=config.FLEET_HANDSHAKE_TIMEOUT)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        channel = Channel(sock)
+        try:
+            channel.send({'type': 'hello', 'host': self.name, 'token': self.token})
+            reply = channel.recv()
+        except CHANNEL_ERRORS:
+            channel.close()
+            raise
+        if reply.get('type') != 'welcome':
+            channel.close()
+            raise PermissionError(reply.get('error', 'rejected'))
+        sock.settimeout(None) # the reader blocks until the collector sends something
+        return channel
+
+    def _answer(self, channel, message):
+        handler = self._handlers.get(message.get('query'))
+        try:
+            if handler is None:
+                raise KeyError(f"unknown query '{message.get('query')}'")
+            reply = {'type': 'response', 'id': message.get('id'), 'result': handler(**message.get('args', {}))}
+        except Exception as e:
+            reply = {'type': 'response', 'id': message.get('id'), 'error': str(e)}
+        try:
+            channel.send(reply)
+        except OSError:
+            pass # the sender loop notices the broken connection
+
+    def _read(self, channel):
+        try:
+            while True:
+                message = channel.recv()
+                if message.get('type') == 'request':
+                    self._executor.submit(self._answer, channel, message)
+        except CHANNEL_ERRORS as e:
+            if self.channel is channel:
+                logger.warning(f"FLEET: Connection to collector lost: {e}")
+        finally:
+            channel.close()
+            self._wake.set()
+
+    def _send_batches(self, channel):
+        reader = threading.Thread(target=self._read, args=(channel,), name="agent-reader", daemon=True)
+        reader.start()
+        while not self._stop_event.is_set() and reader.is_alive():
+            self._wake.wait(self.batch_interval)
+            self._wake.clear()
+            with self._lock:
+                batch = list(self._buffer)
+                self._buffer.clear()
+            if not batch:
+                continue
+            try:
+                channel.send({'type': 'metrics', 'samples': batch})
+                self.batches_sent += 1
+            except OSError:
+                with self._lock:
+                    self._buffer.extendleft(reversed(batch)) # retry after reconnecting
+                break
+
+    def _run(self):
+        backoff = 1
+        while not self._stop_event.is_set():
+            try:
+                self.channel = self._connect()
+            except CHANNEL_ERRORS as e:
+                logger.warning(f"FLEET: Cannot reach collector {self.host}:{self.port} ({e}), retrying in {backoff}s")
+                self._stop_event.wait(backoff)
+                backoff = min(backoff * 2, 30)
+                continue
+            logger.info(f"FLEET: Connected to collector {self.host}:{self.port} as '{self.name}'")
+            backoff = 1
+            channel = self.channel
+            try:
+                self._send_batches(channel)
+            finally:
+                self.channel = None
+                channel.close()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="fleet-agent", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop_event.set()
+        self._wake.set()
+        channel = self.channel
+        if channel is not None:
+            channel.close()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        self._executor.shutdown(wait=False)
+
+class _Host:
+    def __init__(self, name, channel, address):
+        self.name = name
+        self.channel = channel
+        self.address = address
+        self.connected_at = time.time()
+        self.last_seen = time.time()
+        self.latest = None
+        self.samples = 0
+        self.pending = {} # request id -> Future
+
+class FleetCollector:
+    """
+    Central side. Tracks connected agents and their latest samples, calls
+    on_sample(host, sample) for every pushed sample, and sends queries to
+    agents. fan_out() queries many hosts at once: requests are written to
+    every connection first and then awaited together, so the total time is
+    that of the slowest host rather than the sum.
+    """
+    def __init__(self, host=None, port=None, token=None, on_sample=None, timeout=None, handshake_timeout=None):
+        self.bind_host = host if host is not None else config.FLEET_BIND
+        self.port = port if port is not None else config.FLEET_PORT
+        self.token = token if token is not None else config.FLEET_TOKEN
+        self.on_sample = on_sample
+        self.timeout = timeout if timeout is not None else config.FLEET_QUERY_TIMEOUT
+        self.handshake_timeout = handshake_timeout if handshake_timeout is not None else config.FLEET_HANDSHAKE_TIMEOUT
+        self._hosts = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._server = None
+
+    @property
+    def address(self):
+        return self._server.server_address if self._server else None
+
+    def _accept(self, channel, address):
+        # A client that connects and never says hello must not hold a server thread
+        channel.sock.settimeout(self.handshake_timeout)
+        hello = channel.recv()
+        name = str(hello.get('host') or address[0])
+        token = str(hello.get('token', ''))
+        if hello.get('type') != 'hello' or not self.token or not hmac.compare_digest(token, self.token):
+            logger.warning(f"FLEET: Rejected agent '{name}' from {address[0]}")
+            channel.send({'type': 'error', 'error': 'invalid token'})
+            return None
+        host = _Host(name, channel, address)
+        with self._lock:
+            previous = self._hosts.get(name)
+            self._hosts[name] = host
+        if previous is not None and previous.channel is not None:
+            previous.channel.close() # the agent reconnected
+        channel.send({'type': 'welcome'})
+        channel.sock.settimeout(None) # agents only speak when they have a batch or a response
+        logger.info(f"FLEET: Agent '{name}' connected from {address[0]}")
+        return host
+
+    def _serve(self, sock, address):
+        channel = Channel(sock)
+        host = None
+        try:
+            host = self._accept(channel, address)
+            if host is None:
+                return
+            while True:
+                message = channel.recv()
+                host.last_seen = time.time()
+                if message.get('type') == 'metrics':
+                    self._receive_samples(host, message.get('samples', []))
+                elif message.get('type') == 'response':
+                    future = host.pending.pop(message.get('id'), None)
+                    if future is not None:
+                        if 'error' in message:
+                            future.set_exception(RuntimeError(message['error']))
+                        else:
+                            future.set_result(message.get('result'))
+        except CHANNEL_ERRORS as e:
+            if host is not None:
+                logger.warning(f"FLEET: Agent '{host.name}' disconnected: {e}")
+            else:
+                logger.warning(f"FLEET: Handshake from {address[0]} failed: {e}")
+        finally:
+            channel.close()
+            if host is not None:
+                self._disconnected(host)
+
+    def _receive_samples(self, host, samples):
+        for sample in samples:
+            host.latest = sample
+            host.samples += 1
+            if self.on_sample is None:
+                continue
+            try:
+                self.on_sample(host.name, sample)
+            except Exception as e:
+                logger.error(f"FLEET: on_sample for '{host.name}' failed: {e}")
+
+    def _disconnected(self, host):
+        with self._lock:
+            if host.channel is not None:
+                host.channel = None
+        for future in list(host.pending.values()):
+            if not future.done():
+                future.set_exception(ConnectionError(f"{host.name} disconnected"))
+        host.pending.clear()
+
+    def hosts(self):
+        """Snapshot of known hosts: [{'name', 'connected', 'last_seen', 'latest', 'samples'}]"""
+        with self._lock:
+            return [{'name': h.name, 'connected': h.channel is not None, 'last_seen': h.last_seen,
+                     'latest': h.latest, 'samples': h.samples} for h in sorted(self._hosts.values(), key=lambda h: h.name)]
+
+    def query(self, name, query, **args):
+        """Sends one query; returns a Future with the agent's result"""
+        future = Future()
+        with self._lock:
+            host = self._hosts.get(name)
+        if host is None or host.channel is None:
+            future.set_exception(LookupError(f"host '{name}' is not connected"))
+            return future
+        request_id = next(self._ids)
+        host.pending[request_id] = future
+        try:
+            host.channel.send({'type': 'request', 'id': request_id, 'query': query, 'args': args})
+        except OSError as e:
+            host.pending.pop(request_id, None)
+            future.set_exception(ConnectionError(f"{name}: {e}"))
+        return future
+
+    def fan_out(self, query, hosts=None, timeout=None, **args):
+        """
+        Runs `query` on every connected host (or `hosts`) concurrently.
+        Returns ({host: result}, {host: error message}).
+        """
+        if hosts is None:
+            hosts = [h['name'] for h in self.hosts() if h['connected']]
+        futures = {name: self.query(name, query, **args) for name in hosts}
+        wait(futures.values(), timeout=timeout if timeout is not None else self.timeout)
+        results, errors = {}, {}
+        for name, future in futures.items():
+            if not future.done():
+                errors[name] = 'timeout'
+            elif future.exception() is not None:
+                errors[name] = str(future.exception())
+            else:
+                results[name] = future.result()
+        return results, errors
+
+    def start(self):
+        collector = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                self.request.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+                collector._serve(self.request, self.client_address)
+
+        class Server(socketserver.ThreadingTCPServer):
+            allow_reuse_address = True
+            daemon_threads = True
+
+        try:
+            self._server = Server((self.bind_host, self.port), Handler)
+        except OSError as e:
+            logger.error(f"FLEET: Cannot listen on {self.bind_host}:{self.port}: {e}")
+            return False
+        threading.Thread(target=self._server.serve_forever, name="fleet-collector", daemon=True).start()
+        logger.info(f"FLEET: Collector listening on {self.bind_host}:{self.address[1]}")
+        return True
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        with self._lock:
+            channels = [h.channel for h in self._hosts.values() if h.channel is not None]
+        for channel in channels:
+            channel.close()
+
+def run_agent():
+    """Entry point for a node: sample locally, push to the collector, answer queries"""
+    import hardware, network, sampler, system
+    config.setup_logging()
+    if not config.FLEET_TOKEN:
+        logger.error("FLEET: FLEET_TOKEN is not set")
+        return
+    hal = hardware.HardwareManager()
+    metrics_sampler = sampler.MetricsSampler(None, hal, interval=config.FLEET_SAMPLE_INTERVAL)
+    agent = FleetAgent()
+
+    def report():
+        diag = hal.get_pi_diagnostics()
+        return {'temp': hal.get_cpu_temperature(), 'throttled': diag.get('throttled'),
+                'volt_core': diag.get('volt_core'), 'local_ip': network.get_local_ip(),
+                'sample': metrics_sampler.latest}
+
+    agent.add_handler('report', report)
+    agent.add_handler('top', lambda sort='cpu', limit=5: system.get_top_processes(limit=limit, sort=sort))
+    metrics_sampler.add_listener(agent.push)
+    system.process_monitor.start()
+    metrics_sampler.start()
+    agent.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        agent.stop()
+        metrics_sampler.stop()
+        system.process_monitor.stop()
+
+if __name__ == "__main__":
+    run_agent()
@@ -1,17 +1,27 @@
 import logging
 import os
-import subprocess
-# Try to import gpiozero, fallback to Mock if on Windows/non-Pi
-try:
-    from gpiozero import OutputDevice, PWMOutputDevice, CPUTemperature
-    GPIO_AVAILABLE = True
-except (ImportError, OSError):
-    GPIO_AVAILABLE = False
+import threading
+import importlib.util
+# gpiozero is slow to import on a Pi Zero, so only check that it is installed;
+# it is imported on the first pin or sensor access (see _gpiozero)
+GPIO_AVAILABLE = importlib.util.find_spec('gpiozero') is not None
 
 from mock_hardware import MockOutputDevice, MockPWMOutputDevice, MockCPUTemperature
+from diagnostics import PiDiagnostics
+from thermal import ThermalZones
 
 logger = logging.getLogger(__name__)
 
+_gpio_module = None
+
+def _gpiozero():
+    """Imports gpiozero on first use. Raises ImportError/OSError like the import."""
+    global _gpio_module
+    if _gpio_module is None:
+        import gpiozero
+        _gpio_module = gpiozero
+    return _gpio_module
+
 class HardwareManager:
     """
     Hardware Abstraction Layer (HAL)
@@ -20,21 +30,60 @@ class HardwareManager:
     def __init__(self):
         self._devices = {}
         self.mock_mode = not GPIO_AVAILABLE
+        self.diagnostics = PiDiagnostics()
+        self.thermal = None
+        self._temp_sensor = None # reused for every reading
+        self._temp_lock = threading.Lock() # sampler, fan, /report and fleet threads all read it
         
         if self.mock_mode:
             logger.warning("HARDWARE: gpiozero not found or failed. Running in MOCK mode.")
         else:
-            logger.info("HARDWARE: gpiozero loaded. Running in REAL mode.")
+            logger.info("HARDWARE: gpiozero installed. Running in REAL mode.")
+
+    def _gpio(self):
+        """gpiozero module, or None after falling back to MOCK mode if it fails to load"""
+        if self.mock_mode:
+            return None
+        try:
+            return _gpiozero()
+        except (ImportError, OSError) as e:
+            logger.warning(f"HARDWARE: gpiozero failed to load ({e}). Switching to MOCK mode.")
+            self.mock_mode = True
+            return None
+
+    def _init_temperature(self):
+        if self.mock_mode:
+            self._temp_sensor = MockCPUTemperature()
+            return
+        self.thermal = ThermalZones()
+        if self.thermal.available:
+            self.thermal.start_sampling() # no-op unless THERMAL_SAMPLE_HZ > 0
+            return
+        gpiozero = self._gpio()
+        self._temp_sensor = gpiozero.CPUTemperature() if gpiozero else MockCPUTemperature()
 
     def get_cpu_temperature(self):
-        """Returns CPU temperature in celsius"""
+        """Returns CPU temperature in celsius, None if it can't be read"""
         try:
-            if self.mock_mode:
-                return MockCPUTemperature().temperature
-            return CPUTemperature().temperature
+            if self.thermal is None and self._temp_sensor is None:
+                with self._temp_lock:
+                    if self.thermal is None and self._temp_sensor is None:
+                        self._init_temperature()
+            if self.thermal is not None and self.thermal.available:
+                if self.thermal.smoothed is not None:
+                    return self.thermal.smoothed
+                return self.thermal.read()
+            return float(self._temp_sensor.temperature)
         except Exception as e:
             logger.error(f"Error reading temp: {e}")
-            return 0.0
+            return None
+
+    def get_thermal_zones(self):
+        """{zone: celsius} for every thermal zone (CPU only in mock mode)"""
+        if self.thermal is not None and self.thermal.available:
+            return self.thermal.read_all()
+        temp = self.get_cpu_temperature()
+        return {} if temp is None else {'cpu-thermal': temp}
 
     def setup_pin(self, pin_number, name, is_pwm=False):
         """Safely setup a GPIO pin"""
@@ -42,10 +91,11 @@ class HardwareManager:
             return self._devices[name]
 
         try:
-            if self.mock_mode:
+            gpiozero = self._gpio()
+            if gpiozero is None:
                 device = MockPWMOutputDevice(pin_number) if is_pwm else MockOutputDevice(pin_number)
             else:
-                device = PWMOutputDevice(pin_number) if is_pwm else OutputDevice(pin_number)
+                device = gpiozero.PWMOutputDevice(pin_number) if is_pwm else gpiozero.OutputDevice(pin_number)
             
             self._devices[name] = device
             logger.info(f"HARDWARE: Setup pin {pin_number} as '{name}' (PWM={is_pwm})")
@@ -62,7 +112,9 @@ class HardwareManager:
             return
 
         try:
-            if isinstance(device, (PWMOutputDevice, MockPWMOutputDevice)):
+            gpiozero = self._gpio()
+            pwm_types = (MockPWMOutputDevice,) + ((gpiozero.PWMOutputDevice,) if gpiozero else ())
+            if isinstance(device, pwm_types):
                  # PWM logic
                  device.value = max(0.0, min(1.0, float(state)))
             else:
@@ -72,31 +124,28 @@ class HardwareManager:
         except Exception as e:
              logger.error(f"HARDWARE: Error setting '{name}' to {state}: {e}")
 
+    def get_pin_state(self, name):
+        """Current value of a set-up pin (0/1, or 0.0-1.0 for PWM), None if unknown"""
+        device = self._devices.get(name)
+        return None if device is None else device.value
+
+    def release_pin(self, name):
+        """Closes a pin's device so the pin can be set up again (or by another process)"""
+        device = self._devices.pop(name, None)
+        if device is None:
+            return
+        try:
+            device.close()
+            logger.info(f"HARDWARE: Released '{name}'")
+        except Exception as e:
+            logger.error(f"HARDWARE: Error releasing '{name}': {e}")
+
     def get_pi_diagnostics(self):
-        """Runs vcgencmd to get voltage/throttling"""
+        """vcgencmd voltage/clock/throttling data (batched and cached, see diagnostics.py)"""
         if self.mock_mode:
             return {
                 "throttled": "0x0 (Mock)",
                 "volt_core": "1.2000V (Mock)",
                 "clock_arm": "1500000000 (Mock)"
             }
-
-        data = {}
-        try:
-            # Throttled
-            res = subprocess.check_output(['vcgencmd', 'get_throttled']).decode().strip()
-            data['throttled'] = res.split('=')[1]
-            
-            # Volt Core
-            res = subprocess.check_output(['vcgencmd', 'measure_volts', 'core']).decode().strip()
-            data['volt_core'] = res.split('=')[1]
-            
-            # Key Clocks
-            res = subprocess.check_output(['vcgencmd', 'measure_clock', 'arm']).decode().strip()
-            data['clock_arm'] = res.split('=')[1]
-            
-        except Exception as e:
-            logger.error(f"Error executing vcgencmd: {e}")
-            data['error'] = str(e)
-            
-        return data
+        return self.diagnostics.get()
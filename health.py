@@ -0,0 +1,117 @@
+import os
+import time
+import socket
+import logging
+import threading
+import config
+
+logger = logging.getLogger(__name__)
+
+def sd_notify(state, socket_path=None):
+    """
+    Sends a state string ("READY=1", "WATCHDOG=1", ...) to systemd's
+    NOTIFY_SOCKET. Returns False when not running under systemd.
+    """
+    path = socket_path or os.getenv('NOTIFY_SOCKET')
+    if not path:
+        return False
+    if path.startswith('@'):
+        path = '\0' + path[1:] # abstract namespace
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM | socket.SOCK_CLOEXEC) as sock:
+            sock.sendto(state.encode(), path)
+        return True
+    except OSError as e:
+        logger.error(f"HEALTH: sd_notify({state!r}) failed: {e}")
+        return False
+
+def watchdog_interval():
+    """Half of systemd's WatchdogSec (from WATCHDOG_USEC), else HEALTH_INTERVAL"""
+    usec = os.getenv('WATCHDOG_USEC')
+    if usec and usec.isdigit() and int(usec) > 0:
+        return int(usec) / 2e6
+    return config.HEALTH_INTERVAL
+
+class HealthMonitor:
+    """
+    Pets the systemd watchdog only while every registered component is making
+    progress. Each check reports the monotonic time of its last progress (or
+    None before the first); a check older than its max_age, or whose thread
+    has died, withholds WATCHDOG=1 so systemd restarts the bot.
+    """
+    def __init__(self, interval=None, notify_socket=None):
+        self.interval = interval or watchdog_interval()
+        self.notify_socket = notify_socket
+        self.started = time.monotonic()
+        self.pings = 0
+        self.withheld = 0
+        self.gauges = {} # name -> callable, extra metrics reported by status()
+        self._checks = {} # name -> (last_progress, max_age, thread)
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def register(self, name, last_progress, max_age, thread=None):
+        """last_progress() -> monotonic time or None; thread() -> Thread or None"""
+        self._checks[name] = (last_progress, max_age, thread)
+
+    def status(self):
+        """{'healthy', 'checks': {name: {'age', 'max_age', 'alive', 'ok'}}, **gauges}"""
+        now = time.monotonic()
+        checks = {}
+        for name, (last_progress, max_age, thread) in self._checks.items():
+            try:
+                last = last_progress()
+            except Exception as e:
+                logger.error(f"HEALTH: Check {name} failed: {e}")
+                last = None
+            age = now - (last if last is not None else self.started)
+            worker = thread() if thread else None
+            alive = worker.is_alive() if worker is not None else None
+            checks[name] = {'age': age, 'max_age': max_age, 'alive': alive,
+                            'ok': age <= max_age and alive is not False}
+        result = {'healthy': all(c['ok'] for c in checks.values()), 'checks': checks}
+        for name, gauge in self.gauges.items():
+            try:
+                result[name] = gauge()
+            except Exception:
+                result[name] = None
+        return result
+
+    def notify(self, state):
+        return sd_notify(state, self.notify_socket)
+
+    def tick(self):
+        """One watchdog round. Returns True if WATCHDOG=1 was sent."""
+        status = self.status()
+        failing = [name for name, check in status['checks'].items() if not check['ok']]
+        if failing:
+            self.withheld += 1
+            logger.warning(f"HEALTH: Withholding watchdog ping, stalled: {', '.join(failing)}")
+            self.notify(f"STATUS=Stalled: {', '.join(failing)}")
+            return False
+        self.pings += 1
+        self.notify("WATCHDOG=1")
+        return True
+
+    def _run(self, wait_for):
+        if wait_for is not None:
+            wait_for()
+        self.notify("READY=1\nSTATUS=Polling")
+        logger.info(f"HEALTH: Ready, watchdog every {self.interval:.1f}s")
+        while not self._stop_event.wait(self.interval):
+            self.tick()
+
+    def start(self, wait_for=None):
+        """Sends READY=1 once wait_for() returns, then runs the watchdog loop"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(wait_for,), name="health", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop_event.set()
+        self.notify("STOPPING=1")
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
@@ -0,0 +1,151 @@
+import os
+import time
+import zlib
+import signal
+import secrets
+import logging
+import threading
+import subprocess
+from collections import deque
+import config
+
+logger = logging.getLogger(__name__)
+
+class Job:
+    """One background command. Holds only the output tail in memory."""
+    def __init__(self, job_id, title, command, shell=False, chat_id=None):
+        self.id = job_id
+        self.title = title
+        self.command = command
+        self.shell = shell
+        self.chat_id = chat_id
+        self.status = 'PENDING' # PENDING, RUNNING, DONE, FAILED, CANCELLED, TIMEOUT
+        self.exit_code = None
+        self.started = None
+        self.finished = None
+        self.lines = 0
+        self.tail = deque(maxlen=config.JOB_TAIL_LINES)
+        self.process = None
+        self._compressor = zlib.compressobj(6)
+        self._chunks = []
+
+    @property
+    def running(self):
+        return self.status in ('PENDING', 'RUNNING')
+
+    def _append(self, line):
+        self.lines += 1
+        self.tail.append(line.rstrip())
+        self._chunks.append(self._compressor.compress(line.encode(errors='replace')))
+
+    def compressed_output(self):
+        return b''.join(self._chunks) + self._compressor.flush()
+
+    def tail_text(self, max_chars=3500):
+        """Last output lines, trimmed to fit in one Telegram message"""
+        return '\n'.join(self.tail)[-max_chars:]
+
+class JobManager:
+    """
+    Runs long commands (apt upgrade, speedtest) as background jobs.
+    stdout is read line by line. on_progress(job) fires at most once every
+    `update_interval` seconds, so bursts of output are coalesced into one
+    message edit. Completed output is stored zlib-compressed in SQLite.
+    """
+    def __init__(self, db=None, update_interval=None, timeout=None):
+        self.db = db
+        self.update_interval = update_interval if update_interval is not None else config.JOB_UPDATE_INTERVAL
+        self.timeout = timeout if timeout is not None else config.JOB_TIMEOUT
+        self.jobs = {}
+        self._lock = threading.Lock()
+
+    def start(self, title, command, shell=False, chat_id=None, on_progress=None, on_done=None):
+        """Starts `command` in the background and returns its Job"""
+        job = Job(secrets.token_hex(3), title, command, shell=shell, chat_id=chat_id)
+        with self._lock:
+            self.jobs[job.id] = job
+            # Forget old finished jobs; their output lives in the database
+            finished = [j for j in self.jobs.values() if not j.running]
+            for old in finished[:-config.JOB_HISTORY]:
+                del self.jobs[old.id]
+        threading.Thread(target=self._run, args=(job, on_progress, on_done),
+                         name=f"job-{job.id}", daemon=True).start()
+        return job
+
+    def _notify(self, callback, job):
+        if callback is None:
+            return
+        try:
+            callback(job)
+        except Exception as e:
+            logger.error(f"JOB {job.id}: Progress callback failed: {e}")
+
+    def _run(self, job, on_progress, on_done):
+        job.started = time.time()
+        try:
+            job.process = subprocess.Popen(job.command, shell=job.shell, stdout=subprocess.PIPE,
+                                           stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                                           start_new_session=True) # own group so cancel kills children
+        except Exception as e:
+            job._append(f"Failed to start: {e}\n")
+            job.status = 'FAILED'
+            self._finish(job, on_done)
+            return
+
+        if job.status == 'CANCELLED':
+            self._kill(job) # cancelled before the process existed
+        else:
+            job.status = 'RUNNING'
+        watchdog = threading.Timer(self.timeout, self._expire, args=(job,))
+        watchdog.daemon = True
+        watchdog.start()
+
+        last_emit = 0.0
+        for raw in iter(job.process.stdout.readline, b''):
+            job._append(raw.decode(errors='replace'))
+            now = time.monotonic()
+            if now - last_emit >= self.update_interval:
+                last_emit = now
+                self._notify(on_progress, job)
+        job.exit_code = job.process.wait()
+        watchdog.cancel()
+
+        if job.status == 'RUNNING':
+            job.status = 'DONE' if job.exit_code == 0 else 'FAILED'
+        self._finish(job, on_done)
+
+    def _finish(self, job, on_done):
+        job.finished = time.time()
+        if self.db is not None:
+            self.db.save_job(job.id, job.title, str(job.command), job.status, job.exit_code,
+                             job.started, job.finished, job.compressed_output())
+        job._chunks = [] # now stored in SQLite
+        logger.info(f"JOB {job.id} '{job.title}' finished: {job.status} (exit {job.exit_code})")
+        self._notify(on_done, job)
+
+    def _kill(self, job):
+        try:
+            os.killpg(job.process.pid, signal.SIGTERM)
+        except (ProcessLookupError, AttributeError):
+            pass
+
+    def _expire(self, job):
+        if job.running:
+            job.status = 'TIMEOUT'
+            self._kill(job)
+
+    def cancel(self, job_id):
+        """Terminates a running job. Returns (success, message)."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return False, "Job not found"
+        if not job.running:
+            return False, f"Job already {job.status}"
+        job.status = 'CANCELLED'
+        self._kill(job)
+        return True, f"Cancelled job {job_id}"
+
+    def list(self):
+        """Known jobs, newest first"""
+        with self._lock:
+            return sorted(self.jobs.values(), key=lambda j: j.started or 0, reverse=True)
@@ -3,6 +3,7 @@ class MockOutputDevice:
         self.pin = pin
         self.state = False
         self.value = 0
+        self.closed = False
 
     def on(self):
         self.state = True
@@ -16,6 +17,9 @@ class MockOutputDevice:
         if self.state: self.off()
         else: self.on()
 
+    def close(self):
+        self.closed = True
+
 class MockPWMOutputDevice(MockOutputDevice):
     def __init__(self, pin):
         super().__init__(pin)
@@ -36,3 +40,22 @@ class MockCPUTemperature:
         # Return a fake temperature that varies slightly
         import random
         return 45.0 + random.uniform(-2, 5)
+
+class MockThermalModel:
+    """
+    First-order thermal model of a loaded SoC with a PWM fan, for fan
+    control tests: `power` watts in, heat out through a heatsink whose
+    conductance (W/°C) grows with the fan duty cycle.
+    """
+    def __init__(self, ambient=25.0, power=6.0, capacity=30.0, passive=0.08, fan_gain=0.25):
+        self.ambient = ambient
+        self.power = power
+        self.capacity = capacity # J/°C
+        self.passive = passive
+        self.fan_gain = fan_gain
+        self.temperature = ambient
+
+    def step(self, seconds, duty, load=1.0):
+        conductance = self.passive + self.fan_gain * duty
+        self.temperature += (self.power * load - conductance * (self.temperature - self.ambient)) / self.capacity * seconds
+        return self.temperature
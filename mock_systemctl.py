@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Fake `systemctl` for tests and benchmarks on hosts without systemd.
+Supports `show [--property=A,B] -- UNIT...`, `is-active [--quiet] UNIT` and
+`restart UNIT`, printing the same formats as the real tool.
+
+Unit states live in the JSON file named by MOCK_SYSTEMCTL_STATE
+({"nginx": "failed", "ssh": "active"}); units not listed are active, and
+a state of "not-found" makes a unit look uninstalled. `restart` makes the
+unit active and counts the restart. Every invocation is appended to
+MOCK_SYSTEMCTL_LOG if set, so tests can count spawns.
+"""
+import os
+import sys
+import json
+import time
+
+SUB_STATES = {'active': 'running', 'inactive': 'dead', 'failed': 'failed', 'activating': 'start'}
+
+def load():
+    path = os.getenv('MOCK_SYSTEMCTL_STATE')
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+def save(state):
+    path = os.getenv('MOCK_SYSTEMCTL_STATE')
+    if path:
+        with open(path, 'w') as f:
+            json.dump(state, f)
+
+def unit_id(unit):
+    return unit if '.' in unit else f"{unit}.service"
+
+def properties(unit, state):
+    active = state.get(unit, 'active')
+    found = active != 'not-found'
+    active = active if found else 'inactive'
+    return {
+        'Id': unit_id(unit),
+        'Description': f"Mock {unit}" if found else '',
+        'LoadState': 'loaded' if found else 'not-found',
+        'ActiveState': active,
+        'SubState': SUB_STATES.get(active, active),
+        'MainPID': str(1000 + sum(map(ord, unit)) if active == 'active' else 0),
+        'NRestarts': str(state.get(f"{unit}.restarts", 0)),
+        # an hour ago on CLOCK_MONOTONIC, in microseconds
+        'ActiveEnterTimestampMonotonic': str(int((time.monotonic() - 3600) * 1e6)) if active == 'active' else '0',
+    }
+
+def main(args):
+    log = os.getenv('MOCK_SYSTEMCTL_LOG')
+    if log:
+        with open(log, 'a') as f:
+            f.write(' '.join(args) + '\n')
+    options = [a for a in args if a.startswith('--')]
+    words = [a for a in args if not a.startswith('-')]
+    if not words:
+        print("usage: systemctl <command>", file=sys.stderr)
+        return 1
+    command, units = words[0], words[1:]
+    state = load()
+
+    if command == 'show':
+        wanted = None
+        for option in options:
+            if option.startswith('--property='):
+                wanted = option.split('=', 1)[1].split(',')
+        blocks = []
+        for unit in units:
+            props = properties(unit, state)
+            blocks.append('\n'.join(f"{k}={v}" for k, v in props.items() if wanted is None or k in wanted))
+        print('\n\n'.join(blocks))
+        return 0
+    if command == 'is-active' and units:
+        active = properties(units[0], state)['ActiveState']
+        if '--quiet' not in options:
+            print(active)
+        return 0 if active == 'active' else 3
+    if command == 'restart' and units:
+        if state.get(units[0]) == 'not-found':
+            print(f"Failed to restart {unit_id(units[0])}: Unit {unit_id(units[0])} not found.", file=sys.stderr)
+            return 5
+        state[units[0]] = 'active'
+        state[f"{units[0]}.restarts"] = state.get(f"{units[0]}.restarts", 0) + 1
+        save(state)
+        return 0
+    print(f"Unknown command verb {command}.", file=sys.stderr)
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,59 @@
+"""
+Local stand-in for systemd's NOTIFY_SOCKET, for tests.
+
+    sock = FakeNotifySocket(tmp_path / "notify").start()
+    os.environ['NOTIFY_SOCKET'] = sock.path
+    ...
+    sock.wait_for("READY=1")
+    sock.messages  # ["READY=1\\nSTATUS=Polling", "WATCHDOG=1", ...]
+    sock.stop()
+"""
+import os
+import time
+import socket
+import threading
+
+class FakeNotifySocket:
+    def __init__(self, path):
+        self.path = str(path)
+        self.messages = []
+        self._sock = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(self.path)
+        self._sock.settimeout(0.1)
+        threading.Thread(target=self._receive, daemon=True).start()
+        return self
+
+    def _receive(self):
+        while self._sock is not None:
+            try:
+                data = self._sock.recv(4096)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            with self._lock:
+                self.messages.append(data.decode())
+
+    def states(self):
+        """Every KEY=VALUE assignment received, in order"""
+        with self._lock:
+            return [line for message in self.messages for line in message.splitlines()]
+
+    def wait_for(self, state, timeout=5):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if state in self.states():
+                return True
+            time.sleep(0.01)
+        return False
+
+    def stop(self):
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            sock.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
@@ -0,0 +1,157 @@
+"""
+Local stand-in for the Telegram Bot API, for tests and benchmarks.
+
+    server = FakeTelegramServer().start()
+    telebot.apihelper.API_URL = server.api_url
+    server.push_message("/report", user_id=42)
+    ...
+    server.calls  # [(method, params, monotonic_time), ...]
+    server.stop()
+
+chat_interval > 0 answers sends to the same chat closer together than that
+with 429 Too Many Requests (retry_after = server.retry_after).
+"""
+import json
+import time
+import threading
+from urllib.parse import parse_qs, urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class FakeTelegramServer:
+    def __init__(self, poll_wait=0.05, chat_interval=0):
+        self.poll_wait = poll_wait
+        self.chat_interval = chat_interval # >0 simulates per-chat flood control
+        self.calls = []
+        self.rate_limits = {} # method -> number of 429 replies still to send
+        self.retry_after = 1
+        self.flood_errors = 0
+        self._last_chat_send = {}
+        self._updates = []
+        self._next_update_id = 1
+        self._next_message_id = 1
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def api_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/bot{{0}}/{{1}}"
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _params(self):
+                params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                ctype = self.headers.get('Content-Type', '')
+                if body and 'application/x-www-form-urlencoded' in ctype:
+                    params.update({k: v[0] for k, v in parse_qs(body.decode()).items()})
+                elif body and 'application/json' in ctype:
+                    params.update(json.loads(body))
+                elif body:
+                    params['_raw'] = body
+                return params
+
+            def _handle(self):
+                method = urlparse(self.path).path.rsplit('/', 1)[-1]
+                status, payload = server._dispatch(method, self._params())
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass # client went away mid long-poll
+
+            do_GET = do_POST = _handle
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def push_message(self, text, user_id=42, chat_id=None, username="tester"):
+        """Queues an incoming text message; commands get a bot_command entity"""
+        with self._lock:
+            message = {
+                'message_id': self._next_message_id,
+                'date': int(time.time()),
+                'chat': {'id': chat_id or user_id, 'type': 'private'},
+                'from': {'id': user_id, 'is_bot': False, 'first_name': username, 'username': username},
+                'text': text,
+            }
+            if text.startswith('/'):
+                message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+            self._next_message_id += 1
+            self._updates.append({'update_id': self._next_update_id, 'message': message})
+            self._next_update_id += 1
+
+    def push_callback(self, data, user_id=42, chat_id=None, message_id=1):
+        with self._lock:
+            self._updates.append({'update_id': self._next_update_id, 'callback_query': {
+                'id': str(self._next_update_id),
+                'from': {'id': user_id, 'is_bot': False, 'first_name': 'tester'},
+                'chat_instance': '1',
+                'data': data,
+                'message': {'message_id': message_id, 'date': int(time.time()),
+                            'chat': {'id': chat_id or user_id, 'type': 'private'}, 'text': ''},
+            }})
+            self._next_update_id += 1
+
+    def sent(self, method=None):
+        with self._lock:
+            return [(m, p) for m, p, _ in self.calls if method is None or m == method]
+
+    def _dispatch(self, method, params):
+        with self._lock:
+            self.calls.append((method, params, time.monotonic()))
+            flooded = False
+            if self.chat_interval and method.startswith(('send', 'edit')):
+                chat, now = params.get('chat_id'), time.monotonic()
+                flooded = now - self._last_chat_send.get(chat, -1e9) < self.chat_interval
+                if not flooded:
+                    self._last_chat_send[chat] = now
+                else:
+                    self.flood_errors += 1
+            if self.rate_limits.get(method) or flooded:
+                if not flooded:
+                    self.rate_limits[method] -= 1
+                return 429, {'ok': False, 'error_code': 429, 'description': 'Too Many Requests',
+                             'parameters': {'retry_after': self.retry_after}}
+        if method == 'getUpdates':
+            offset = int(params.get('offset') or 0)
+            deadline = time.monotonic() + self.poll_wait
+            while True:
+                with self._lock:
+                    self._updates = [u for u in self._updates if u['update_id'] >= offset]
+                    if self._updates or time.monotonic() >= deadline:
+                        return 200, {'ok': True, 'result': list(self._updates)}
+                time.sleep(0.005)
+        if method == 'getMe':
+            return 200, {'ok': True, 'result': {'id': 1, 'is_bot': True, 'first_name': 'bot', 'username': 'bot'}}
+        if method in ('answerCallbackQuery', 'deleteMessage'):
+            return 200, {'ok': True, 'result': True}
+
+        with self._lock:
+            message_id = int(params.get('message_id') or self._next_message_id)
+            if 'message_id' not in params:
+                self._next_message_id += 1
+        chat_id = params.get('chat_id', 0)
+        result = {'message_id': message_id, 'date': int(time.time()),
+                  'chat': {'id': int(chat_id) if str(chat_id).lstrip('-').isdigit() else 0, 'type': 'private'},
+                  'text': params.get('text', '')}
+        if method == 'sendPhoto':
+            result['photo'] = [{'file_id': f"photo-{message_id}", 'file_unique_id': f"u{message_id}",
+                                'width': 800, 'height': 400}]
+        return 200, {'ok': True, 'result': result}
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Fake `vcgencmd` for tests and benchmarks on non-Pi hosts.
+Prints the same output format as the real tool, e.g.:
+    mock_vcgencmd.py get_throttled      -> throttled=0x50000
+    mock_vcgencmd.py measure_clock arm  -> frequency(48)=1500000000
+The throttled value can be overridden with MOCK_VCGENCMD_THROTTLED.
+"""
+import os
+import sys
+
+CLOCKS = {'arm': 1500000000, 'core': 500000000, 'h264': 0, 'isp': 0, 'v3d': 500000000,
+          'uart': 48000000, 'pwm': 0, 'emmc': 250000000, 'pixel': 75000000, 'vec': 0,
+          'hdmi': 0, 'dpi': 0}
+CLOCK_IDS = {'arm': 48, 'core': 1, 'h264': 28, 'isp': 45, 'v3d': 46, 'uart': 22, 'pwm': 25,
+             'emmc': 50, 'pixel': 29, 'vec': 10, 'hdmi': 0, 'dpi': 4}
+VOLTS = {'core': 0.8563, 'sdram_c': 1.1000, 'sdram_i': 1.1000, 'sdram_p': 1.1000}
+MEM = {'arm': 948, 'gpu': 76}
+
+def main(args):
+    if not args:
+        print("usage: vcgencmd <command>", file=sys.stderr)
+        return 1
+    cmd, arg = args[0], (args[1] if len(args) > 1 else None)
+    if cmd == 'get_throttled':
+        print(f"throttled={os.getenv('MOCK_VCGENCMD_THROTTLED', '0x0')}")
+    elif cmd == 'measure_clock' and arg in CLOCKS:
+        print(f"frequency({CLOCK_IDS[arg]})={CLOCKS[arg]}")
+    elif cmd == 'measure_volts' and (arg or 'core') in VOLTS:
+        print(f"volt={VOLTS[arg or 'core']:.4f}V")
+    elif cmd == 'get_mem' and arg in MEM:
+        print(f"{arg}={MEM[arg]}M")
+    elif cmd == 'measure_temp':
+        print("temp=47.2'C")
+    else:
+        print(f"error=1 error_msg=\"Command not registered\"")
+        return 255
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,10 +1,12 @@
 import subprocess
 import socket
 import logging
-import requests
 import json
 import socket
-import struct
+import time
+import ipaddress
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import config
 
 logger = logging.getLogger(__name__)
@@ -19,12 +21,114 @@ def get_local_ip():
     except Exception:
         return "127.0.0.1"
 
+class PublicIPResolver:
+    """
+    Cached public IP lookup.
+    - Fresh for `ttl` seconds; after that the stale value is served while a
+      background thread refreshes it (stale-while-revalidate).
+    - All providers are queried concurrently over one pooled keep-alive
+      Session and the first valid answer wins.
+    - Listeners are called with (old_ip, new_ip) when the address changes.
+    """
+    def __init__(self, providers=None, ttl=None, timeout=3):
+        self.providers = list(providers if providers is not None else config.PUBLIC_IP_PROVIDERS)
+        self.ttl = ttl if ttl is not None else config.PUBLIC_IP_TTL
+        self.timeout = timeout
+        self.ip = None
+        self.updated_at = 0.0
+        self._session = None
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(self.providers)), thread_name_prefix="public-ip")
+
+    @property
+    def session(self):
+        if self._session is None:
+            import requests # deferred: not needed until the first lookup
+            self._session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=len(self.providers) or 1, pool_maxsize=2)
+            self._session.mount('http://', adapter)
+            self._session.mount('https://', adapter)
+        return self._session
+
+    def add_listener(self, callback):
+        """Registers callback(old_ip, new_ip), called when the public IP changes"""
+        self._listeners.append(callback)
+
+    def _query(self, url):
+        text = self.session.get(url, timeout=self.timeout).text.strip()
+        return str(ipaddress.ip_address(text)) # Rejects HTML error pages etc.
+
+    def refresh(self):
+        """Queries every provider at once and returns the first valid IP (or None)"""
+        pending = {self._executor.submit(self._query, url): url for url in self.providers}
+        deadline = time.monotonic() + self.timeout + 1
+        ip = None
+        while pending and ip is None:
+            done, _ = wait(pending, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                url = pending.pop(future)
+                try:
+                    ip = future.result()
+                    break
+                except Exception as e:
+                    logger.debug(f"Public IP provider {url} failed: {e}")
+        for future in pending:
+            future.cancel()
+
+        if ip is None:
+            logger.warning("Public IP lookup failed on all providers")
+            return None
+        self._update(ip)
+        return ip
+
+    def _update(self, ip):
+        with self._lock:
+            old, self.ip = self.ip, ip
+            self.updated_at = time.monotonic()
+        if old is not None and old != ip:
+            logger.info(f"Public IP changed: {old} -> {ip}")
+            for callback in self._listeners:
+                try:
+                    callback(old, ip)
+                except Exception as e:
+                    logger.error(f"Public IP listener failed: {e}")
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                self._refreshing = False
+        threading.Thread(target=run, name="public-ip-refresh", daemon=True).start()
+
+    def get(self):
+        """Returns the cached IP, refreshing synchronously only on first use"""
+        if self.ip is None:
+            return self.refresh()
+        if time.monotonic() - self.updated_at > self.ttl:
+            self._refresh_in_background()
+        return self.ip
+
+public_ip = PublicIPResolver()
+
 def get_public_ip():
     try:
-        return requests.get('https://api.ipify.org', timeout=3).text
+        return public_ip.get() or "Unknown"
     except Exception:
         return "Unknown"
 
+# Plain output prints progress lines, used by the /speedtest job
+SPEEDTEST_COMMAND = ['speedtest-cli', '--secure']
+
 def run_speedtest():
     """Runs speedtest-cli and returns a dict of results"""
     try:
@@ -47,29 +151,7 @@ def run_speedtest():
         logger.error(f"Speedtest failed: {e}")
         return None
 
-def wake_on_lan(mac_address):
-    """Sends a Magic Packet to the specified MAC address"""
-    try:
-        # Check mac format
-        if len(mac_address) == 17:
-             sep = mac_address[2]
-             mac_address = mac_address.replace(sep, '')
-        
-        if len(mac_address) != 12:
-            raise ValueError("Invalid MAC Address")
-
-        data = b'FFFFFFFFFFFF' + (mac_address.encode() * 16)
-        send_data = b''
-        
-        # Convert hex string to bytes
-        for i in range(0, len(data), 2):
-            send_data += struct.pack('B', int(data[i: i + 2], 16))
-
-        # Broadcast
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-        sock.sendto(send_data, ('<broadcast>', 9))
-        return True
-    except Exception as e:
-        logger.error(f"WOL failed for {mac_address}: {e}")
-        return False
+def wake_on_lan(mac_address, target=None):
+    """Sends a Magic Packet to the specified MAC address (see wol.py for devices and groups)"""
+    import wol
+    return wol.default().send(mac_address, target)
@@ -0,0 +1,211 @@
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+from telebot.apihelper import ApiTelegramException
+import config
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes, lowest number is sent first
+ALERT = 0
+NORMAL = 1
+BULK = 2 # progress edits, refreshes
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`"""
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0 # set from 429 retry_after
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """Seconds until a token is available (0 if one is available now)"""
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+class _Item:
+    __slots__ = ('func', 'chat_id', 'args', 'kwargs', 'priority', 'merge_key', 'futures', 'attempts')
+
+    def __init__(self, func, chat_id, args, kwargs, priority, merge_key):
+        self.func = func
+        self.chat_id = chat_id
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.merge_key = merge_key
+        self.futures = [Future()]
+        self.attempts = 0
+
+class MessageScheduler:
+    """
+    Single outbound queue for Telegram API calls.
+    - Per-chat and global token buckets keep us under the flood limits.
+    - Priority lanes: alerts jump ahead of routine replies and bulk edits.
+    - A pending edit of a message is replaced by a newer edit of the same
+      message, so only the latest text is sent.
+    - 429 replies pause that chat for `retry_after` and requeue the call at
+      the front of its lane. Handler threads never sleep on a back-off.
+    """
+    def __init__(self, chat_rate=None, chat_burst=None, global_rate=None, max_attempts=5):
+        self.chat_rate = chat_rate or config.OUTBOX_CHAT_RATE
+        self.chat_burst = chat_burst or config.OUTBOX_CHAT_BURST
+        self.global_bucket = TokenBucket(global_rate or config.OUTBOX_GLOBAL_RATE, global_rate or config.OUTBOX_GLOBAL_RATE)
+        self.max_attempts = max_attempts
+        self.stats = {'sent': 0, 'merged': 0, 'retried': 0, 'failed': 0}
+        self._buckets = {}
+        self._lanes = {ALERT: deque(), NORMAL: deque(), BULK: deque()}
+        self._pending_merge = {}
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="outbox", daemon=True)
+        self._thread.start()
+
+    def _bucket(self, chat_id):
+        if chat_id not in self._buckets:
+            self._buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return self._buckets[chat_id]
+
+    def depth(self):
+        with self._cond:
+            return sum(len(lane) for lane in self._lanes.values())
+
+    def submit(self, func, chat_id, *args, priority=NORMAL, merge_key=None, **kwargs):
+        """Queues func(*args, **kwargs) and returns a Future with its result"""
+        with self._cond:
+            if merge_key is not None and merge_key in self._pending_merge:
+                item = self._pending_merge[merge_key]
+                item.func, item.args, item.kwargs = func, args, kwargs
+                item.priority = min(item.priority, priority)
+                future = Future()
+                item.futures.append(future)
+                self.stats['merged'] += 1
+                return future
+            item = _Item(func, chat_id, args, kwargs, priority, merge_key)
+            if merge_key is not None:
+                self._pending_merge[merge_key] = item
+            self._lanes[priority].append(item)
+            self._cond.notify()
+            return item.futures[0]
+
+    def call(self, func, chat_id, *args, priority=NORMAL, merge_key=None, **kwargs):
+        """Queues and waits for the result (re-raises API errors)"""
+        return self.submit(func, chat_id, *args, priority=priority, merge_key=merge_key, **kwargs).result()
+
+    def _next_ready(self, now):
+        """Highest-priority item whose chat and the global bucket allow a send, or the wait time"""
+        global_wait = self.global_bucket.wait_time(now)
+        soonest = None
+        for priority in sorted(self._lanes):
+            lane = self._lanes[priority]
+            for item in lane:
+                wait = max(global_wait, self._bucket(item.chat_id).wait_time(now))
+                if wait == 0:
+                    lane.remove(item)
+                    return item, 0
+                soonest = wait if soonest is None else min(soonest, wait)
+        return None, soonest
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopping and not any(self._lanes.values()):
+                        return
+                    item, wait = self._next_ready(time.monotonic())
+                    if item is not None:
+                        break
+                    self._cond.wait(timeout=wait)
+                if item.merge_key is not None:
+                    self._pending_merge.pop(item.merge_key, None)
+                self.global_bucket.take()
+                self._bucket(item.chat_id).take()
+            self._execute(item)
+
+    def _execute(self, item):
+        item.attempts += 1
+        try:
+            result = item.func(*item.args, **item.kwargs)
+        except ApiTelegramException as e:
+            if e.error_code == 429 and item.attempts < self.max_attempts:
+                retry_after = (e.result_json.get('parameters') or {}).get('retry_after', 1)
+                logger.warning(f"OUTBOX: 429 for chat {item.chat_id}, retrying in {retry_after}s")
+                with self._cond:
+                    self.stats['retried'] += 1
+                    self._bucket(item.chat_id).blocked_until = time.monotonic() + retry_after
+                    self._lanes[item.priority].appendleft(item)
+                    self._cond.notify()
+                return
+            self._resolve(item, error=e)
+            return
+        except Exception as e:
+            self._resolve(item, error=e)
+            return
+        self._resolve(item, result=result)
+
+    def _resolve(self, item, result=None, error=None):
+        with self._cond:
+            self.stats['sent' if error is None else 'failed'] += 1
+        if error is not None:
+            logger.error(f"OUTBOX: {getattr(item.func, '__name__', 'call')} to {item.chat_id} failed: {error}")
+        for future in item.futures:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def stop(self, timeout=5):
+        """Drains the queue and stops the worker"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join(timeout=timeout)
+
+class OutboxMixin:
+    """
+    TeleBot mixin routing outgoing messages through `self.outbox`.
+    Extra keywords: priority=outbox.ALERT/NORMAL/BULK, and wait=True to block
+    until the call is sent and return its Message. By default the call is
+    queued and a Future is returned, so a flood-limited chat never stalls the
+    sampler or a handler; failures are logged by the outbox.
+    """
+    outbox = None
+
+    def _queued(self, func, chat_id, args, kwargs, merge_key=None):
+        priority = kwargs.pop('priority', NORMAL)
+        wait = kwargs.pop('wait', False)
+        if self.outbox is None or threading.current_thread() is self.outbox._thread:
+            return func(chat_id, *args, **kwargs)
+        future = self.outbox.submit(func, chat_id, chat_id, *args, priority=priority, merge_key=merge_key, **kwargs)
+        return future.result() if wait else future
+
+    def send_message(self, chat_id, *args, **kwargs):
+        return self._queued(super().send_message, chat_id, args, kwargs)
+
+    def send_photo(self, chat_id, *args, **kwargs):
+        return self._queued(super().send_photo, chat_id, args, kwargs)
+
+    def send_document(self, chat_id, *args, **kwargs):
+        return self._queued(super().send_document, chat_id, args, kwargs)
+
+    def edit_message_text(self, text, chat_id=None, message_id=None, *args, **kwargs):
+        priority = kwargs.pop('priority', NORMAL)
+        wait = kwargs.pop('wait', False)
+        edit = super().edit_message_text
+        if self.outbox is None or threading.current_thread() is self.outbox._thread:
+            return edit(text, chat_id, message_id, *args, **kwargs)
+        future = self.outbox.submit(lambda: edit(text, chat_id, message_id, *args, **kwargs), chat_id,
+                                    priority=priority, merge_key=('edit', chat_id, message_id))
+        return future.result() if wait else future
@@ -0,0 +1,251 @@
+"""
+Whitelisted GPIO pins and a scheduler for timed pin sequences.
+
+GPIO_PINS names the pins /gpio may touch (relay1=17,fan=18:pwm); anything
+else is refused. A command is parsed and checked, and all of its pins are
+set up, before any pin changes. Steps due now are applied together under one
+lock, later steps run on a single scheduler thread:
+
+    relay1=on fan=0.4            both pins in one step
+    relay1=on wait=2 relay1=off  two second pulse
+    fan=0.8/3 wait=3 relay1=off  PWM ramp to 0.8 over 3s (ramps don't hold up
+                                 the tokens after them, wait does)
+"""
+import time
+import heapq
+import logging
+import itertools
+import threading
+import config
+
+logger = logging.getLogger(__name__)
+
+ON = ('on', '1', 'true', 'high')
+OFF = ('off', '0', 'false', 'low')
+MAX_SEQUENCE = 3600 # seconds
+
+class Pin:
+    __slots__ = ('name', 'number', 'pwm')
+
+    def __init__(self, name, number, pwm=False):
+        self.name = name
+        self.number = number
+        self.pwm = pwm
+
+    def __repr__(self):
+        return f"Pin({self.name!r}, {self.number}, pwm={self.pwm})"
+
+def parse_pins(spec):
+    """'relay1=17,fan=18:pwm' -> {name: Pin}"""
+    pins = {}
+    for entry in filter(None, (part.strip() for part in (spec or '').split(','))):
+        name, _, rest = entry.partition('=')
+        number, _, kind = rest.partition(':')
+        try:
+            pins[name.strip().lower()] = Pin(name.strip().lower(), int(number), kind.strip().lower() == 'pwm')
+        except ValueError:
+            logger.error(f"GPIO: Ignoring pin '{entry}', expected name=<BCM pin>[:pwm]")
+    return pins
+
+def parse_value(pin, text):
+    """on/off for any pin, a duty cycle (0.4 or 40%) for PWM pins. Raises ValueError."""
+    text = text.strip().lower()
+    if text in ON:
+        return 1.0 if pin.pwm else True
+    if text in OFF:
+        return 0.0 if pin.pwm else False
+    if not pin.pwm:
+        raise ValueError(f"'{pin.name}' is on/off only")
+    try:
+        value = float(text[:-1]) / 100 if text.endswith('%') else float(text)
+    except ValueError:
+        raise ValueError(f"Bad value '{text}' for '{pin.name}'") from None
+    if not 0.0 <= value <= 1.0:
+        raise ValueError(f"Duty cycle for '{pin.name}' must be 0-1 or 0-100%")
+    return value
+
+def _seconds(text, token):
+    try:
+        seconds = float(text.strip().lower().rstrip('s'))
+    except ValueError:
+        raise ValueError(f"Bad duration in '{token}'") from None
+    if not 0 < seconds <= MAX_SEQUENCE:
+        raise ValueError(f"Duration in '{token}' must be between 0 and {MAX_SEQUENCE}s")
+    return seconds
+
+class PinSetupError(RuntimeError):
+    """Raised when pins of a command can't be set up; nothing was written"""
+    def __init__(self, names):
+        super().__init__(f"Could not set up {', '.join(names)}")
+        self.names = names
+
+class Ramp:
+    """Moves a PWM pin from its duty when the ramp starts to `target`"""
+    __slots__ = ('target', 'start')
+
+    def __init__(self, target):
+        self.target = target
+        self.start = None
+
+    def at(self, fraction, current):
+        if self.start is None:
+            self.start = current or 0.0
+        return self.start + (self.target - self.start) * fraction
+
+def parse_command(pins, args, ramp_step=None):
+    """
+    /gpio tokens -> ([(offset, [(Pin, value)])] sorted by offset, duration).
+    A value is a bool, a duty cycle or a (Ramp, fraction) pair. Pins can be
+    named or given by BCM number; '/gpio 18 on' is still accepted. Raises
+    ValueError describing the first bad token.
+    """
+    ramp_step = ramp_step or config.GPIO_RAMP_STEP
+    if len(args) == 2 and '=' not in args[0] + args[1]:
+        args = [f"{args[0]}={args[1]}"] # v3.0 form
+    by_number = {str(pin.number): pin for pin in pins.values()}
+    steps = {} # offset -> [(Pin, value)]
+    offset = duration = 0.0
+    for token in args:
+        name, sep, value = token.partition('=')
+        name = name.strip().lower()
+        if not sep or not value:
+            raise ValueError(f"Expected name=value, got '{token}'")
+        if name == 'wait':
+            offset += _seconds(value, token)
+            duration = max(duration, offset)
+            continue
+        pin = pins.get(name) or by_number.get(name)
+        if pin is None:
+            raise ValueError(f"Pin '{name}' is not in GPIO_PINS ({', '.join(pins) or 'none configured'})")
+        target, _, over = value.partition('/')
+        if not over:
+            steps.setdefault(round(offset, 6), []).append((pin, parse_value(pin, target)))
+            continue
+        if not pin.pwm:
+            raise ValueError(f"Only PWM pins can ramp ('{pin.name}')")
+        seconds = _seconds(over, token)
+        ramp = Ramp(parse_value(pin, target))
+        count = max(1, round(seconds / ramp_step))
+        for i in range(1, count + 1):
+            steps.setdefault(round(offset + seconds * i / count, 6), []).append((pin, (ramp, i / count)))
+        duration = max(duration, offset + seconds)
+    if not steps:
+        raise ValueError("Nothing to do")
+    if duration > MAX_SEQUENCE:
+        raise ValueError(f"Sequences may last at most {MAX_SEQUENCE}s")
+    return sorted(steps.items(), key=lambda step: step[0]), duration
+
+class GpioController:
+    """
+    Runs /gpio commands against the HardwareManager. Devices are set up once
+    per registered pin and reused; close() releases them. A new command on a
+    pin cancels whatever sequence was still driving it.
+    """
+    def __init__(self, hal, pins=None, ramp_step=None):
+        self.hal = hal
+        self.pins = pins if pins is not None else parse_pins(config.GPIO_PINS)
+        self.ramp_step = ramp_step or config.GPIO_RAMP_STEP
+        self.steps_run = 0
+        self.max_jitter = 0.0 # worst lateness of a scheduled step, seconds
+        self._queue = []      # heap of (due, tiebreak, sequence id, actions)
+        self._sequences = {}  # id -> {'pins': names, 'left': steps not yet run}
+        self._ids = itertools.count(1)
+        self._tiebreak = itertools.count()
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+    def _setup(self, pins):
+        """Sets up every pin before any is written. Raises PinSetupError naming the ones that failed."""
+        failed = [pin.name for pin in pins if self.hal.setup_pin(pin.number, pin.name, is_pwm=pin.pwm) is None]
+        if failed:
+            raise PinSetupError(failed)
+
+    def _apply(self, actions):
+        with self._write_lock:
+            self._setup([pin for pin, _ in actions]) # a step changes all of its pins or none
+            for pin, value in actions:
+                if isinstance(value, tuple):
+                    ramp, fraction = value
+                    value = ramp.at(fraction, self.hal.get_pin_state(pin.name))
+                self.hal.set_pin_state(pin.name, value)
+            self.steps_run += 1
+
+    def run(self, args):
+        """
+        Validates and starts a command. Returns (sequence id or None if it finished at once, duration).
+        Raises ValueError for a bad command and PinSetupError if a pin can't be set up.
+        """
+        steps, duration = parse_command(self.pins, args, self.ramp_step)
+        touched = {pin.name for _, actions in steps for pin, _ in actions}
+        with self._write_lock:
+            self._setup([self.pins[name] for name in sorted(touched)])
+        now = time.monotonic()
+        with self._cond:
+            for seq_id in [i for i, seq in self._sequences.items() if seq['pins'] & touched]:
+                del self._sequences[seq_id] # its queued steps are skipped
+                logger.info(f"GPIO: Sequence #{seq_id} superseded")
+        if steps[0][0] == 0:
+            self._apply(steps.pop(0)[1])
+        if not steps:
+            return None, duration
+
+        with self._cond:
+            seq_id = next(self._ids)
+            self._sequences[seq_id] = {'pins': touched, 'left': len(steps)}
+            for offset, actions in steps:
+                heapq.heappush(self._queue, (now + offset, next(self._tiebreak), seq_id, actions))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="gpio-scheduler", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        logger.info(f"GPIO: Sequence #{seq_id} started ({len(steps)} steps, {duration:.2f}s)")
+        return seq_id, duration
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and (not self._queue or self._queue[0][0] > time.monotonic()):
+                    self._cond.wait(self._queue[0][0] - time.monotonic() if self._queue else None)
+                if self._closed:
+                    return
+                due, _, seq_id, actions = heapq.heappop(self._queue)
+                sequence = self._sequences.get(seq_id)
+                if sequence is None:
+                    continue # cancelled
+                sequence['left'] -= 1
+                if not sequence['left']:
+                    del self._sequences[seq_id]
+            self.max_jitter = max(self.max_jitter, time.monotonic() - due)
+            try:
+                self._apply(actions)
+            except Exception as e:
+                logger.error(f"GPIO: Step of sequence #{seq_id} failed: {e}")
+
+    def active(self):
+        """Ids of sequences with steps still to run"""
+        with self._cond:
+            return sorted(self._sequences)
+
+    def stop(self):
+        """Cancels every running sequence, leaving pins as they are. Returns how many were cancelled."""
+        with self._cond:
+            count = len(self._sequences)
+            self._sequences.clear()
+            self._queue.clear()
+        return count
+
+    def states(self):
+        """{name: value} for every registered pin, None if it was never set"""
+        return {name: self.hal.get_pin_state(name) for name in self.pins}
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+        with self._write_lock:
+            for name in self.pins:
+                self.hal.release_pin(name)
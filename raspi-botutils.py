@@ -1,4 +1,8 @@
 import os
+import html
+import signal
+import functools
+import heapq
 import time
 import logging
 import telebot
@@ -6,31 +10,137 @@ from telebot import types
 from threading import Thread
 
 # Import Modules (Flat Structure)
-import config, database
-import hardware, network, system
+import config, database, auth, callbacks
+import hardware, pins, fan, network, system, services, sampler, report, dispatcher, jobs, outbox, alerts, charts, health, exporter, fleet, wol
 
 # Logger Setup
 logger = config.setup_logging()
 
 # Bot & DB Init
-bot = telebot.TeleBot(config.TELEGRAM_TOKEN, parse_mode='HTML')
+class RaspiBot(outbox.OutboxMixin, dispatcher.DispatchingBot):
+    """Handlers dispatched by the asyncio core, replies paced by the outbox"""
+
+command_dispatcher = dispatcher.CommandDispatcher()
+bot = RaspiBot(config.TELEGRAM_TOKEN, command_dispatcher, parse_mode='HTML')
+bot.outbox = outbox.MessageScheduler()
 db = database.DatabaseManager()
 hal = hardware.HardwareManager()
+gpio_controller = pins.GpioController(hal)
+fan_controller = fan.FanController(hal)
+if fan_controller.enabled and any(p.number == config.FAN_PIN for p in gpio_controller.pins.values()):
+    logger.warning(f"FAN_PIN {config.FAN_PIN} is also in GPIO_PINS; /gpio will fight the fan controller")
+metrics_sampler = sampler.MetricsSampler(db, hal)
+job_manager = jobs.JobManager(db)
+service_monitor = services.ServiceMonitor()
+chart_renderer = charts.ChartRenderer(db)
+
+# Watchdog: systemd restarts us if any of these stops making progress
+health_monitor = health.HealthMonitor()
+health_monitor.register('poller', lambda: command_dispatcher.last_poll, config.HEALTH_POLL_MAX_AGE)
+health_monitor.register('event_loop', lambda: command_dispatcher.last_beat, config.HEALTH_LOOP_MAX_AGE)
+health_monitor.register('sampler', lambda: metrics_sampler.last_sample, 3 * metrics_sampler.interval,
+                        thread=lambda: metrics_sampler._thread)
+if db.flush_interval > 0: # DB_FLUSH_INTERVAL=0: no flusher thread, rows are written by size only
+    health_monitor.register('db_writer', lambda: db.last_flush, 3 * db.flush_interval, thread=lambda: db._flusher)
+if fan_controller.enabled:
+    health_monitor.register('fan', lambda: fan_controller.last_update, 3 * fan_controller.interval,
+                            thread=lambda: fan_controller._thread)
+health_monitor.gauges.update({
+    'loop_lag': lambda: command_dispatcher.loop_lag,
+    'max_loop_lag': lambda: command_dispatcher.max_loop_lag,
+    'outbox_depth': lambda: bot.outbox.depth(),
+    'db_pending': db.pending,
+})
+
+# Prometheus /metrics, rebuilt once per sample from in-memory state
+def bot_families():
+    status = health_monitor.status()
+    return [
+        ('processes', 'gauge', "Running processes",
+         [({}, system.process_monitor.process_count if system.process_monitor.updated_at else None)]),
+        ('db_pending_rows', 'gauge', "Rows waiting in the DB write-behind buffer", [({}, status['db_pending'])]),
+        ('outbox_depth', 'gauge', "Telegram calls waiting in the outbox", [({}, status['outbox_depth'])]),
+        ('loop_lag_seconds', 'gauge', "Event loop heartbeat lag", [({}, status['loop_lag'])]),
+        ('health_check_ok', 'gauge', "Watchdog check status",
+         [({'check': name}, check['ok']) for name, check in status['checks'].items()]),
+    ]
+
+metrics_exporter = exporter.MetricsExporter()
+metrics_exporter.add_collector(lambda: exporter.sample_families(metrics_sampler.latest))
+metrics_exporter.add_collector(lambda: exporter.throttle_families(hal.get_pi_diagnostics())) # at most one query per DIAG_CACHE_TTL
+metrics_exporter.add_collector(lambda: exporter.command_families(command_dispatcher.stats()))
+metrics_exporter.add_collector(lambda: exporter.service_families(service_monitor.cached()))
+metrics_exporter.add_collector(bot_families)
+
+# Fleet mode: agents on other Pis push samples here and answer /report, /top
+host_alerts = {} # host -> AlertEngine
+
+def on_fleet_sample(host, sample):
+    engine = host_alerts.get(host)
+    if engine is None:
+        engine = host_alerts[host] = alerts.AlertEngine(
+            alerts.default_rules(), notify=lambda text: notify_admins(f"[{html.escape(host)}] {text}"))
+    engine.feed(sample)
+
+fleet_collector = fleet.FleetCollector(on_sample=on_fleet_sample) if config.FLEET_MODE == 'collector' else None
+
+def fleet_target(message, command):
+    """Host named in '/<command> <host|all>' when running as a fleet collector, else None"""
+    args = (message.text or '').split()
+    if fleet_collector is None or len(args) < 2 or args[0].split('@')[0] != f'/{command}':
+        return None
+    return args[1]
+
+# /report data sources, gathered concurrently
+report_collector = report.ReportCollector()
+report_collector.add('temp', hal.get_cpu_temperature)
+report_collector.add('diag', hal.get_pi_diagnostics)
+report_collector.add('public_ip', network.get_public_ip)
+report_collector.add('local_ip', network.get_local_ip)
 
 # --- Decorators ---
+authorizer = auth.Authorizer()
+
+def authorize(user, action, text):
+    """Role and rate limit check for one update, recorded in the audit log. Returns True if allowed."""
+    status, audit_it = authorizer.check(user.id, action)
+    if audit_it:
+        db.log_command(user.id, text[:200], status)
+    if status != auth.OK:
+        logger.warning(f"AUTH: {status} {action} by {user.id} ({user.username})")
+    return status == auth.OK
+
 def auth_required(func):
-    """Secure Only: Ensures user is in ADMIN_USER_IDS list"""
+    """Runs the handler only if the sender's role allows this command"""
+    @functools.wraps(func)
     def wrapper(message, *args, **kwargs):
-        if not config.ADMIN_USER_IDS:
-            return func(message, *args, **kwargs) # Open mode if list empty (Warning)
-            
-        user_id = message.from_user.id
-        if user_id not in config.ADMIN_USER_IDS:
-            logger.warning(f"Unauthorized access attempt by {user_id} ({message.from_user.username})")
-            return # Silent ignore or reply? Silent is safer.
+        if not authorize(message.from_user, dispatcher.command_key(message), message.text or ''):
+            return # Silent ignore, don't confirm the bot exists to strangers
         return func(message, *args, **kwargs)
     return wrapper
 
+callback_router = callbacks.CallbackRouter(authorize, lambda call_id, text: bot.answer_callback_query(call_id, text))
+
+def notify_admins(text):
+    """Queues a message to every admin without waiting (runs on the sampler thread)"""
+    for admin_id in config.ADMIN_USER_IDS:
+        try:
+            bot.send_message(admin_id, text, priority=outbox.ALERT)
+        except Exception as e:
+            logger.error(f"Notify {admin_id} failed: {e}")
+
+def warm_up():
+    """Loads the /graph plotting stack once polling is up, off the startup path"""
+    command_dispatcher.wait_ready()
+    chart_renderer.warm()
+
+def on_service_change(unit, old, new):
+    icon = "🟢" if new == 'active' else "🔴"
+    notify_admins(f"{icon} <b>Service {html.escape(unit)}</b>: {old} → {new}")
+
+def on_public_ip_change(old_ip, new_ip):
+    notify_admins(f"🌐 <b>Public IP changed</b>\n<code>{old_ip}</code> → <code>{new_ip}</code>")
+
 # --- Handlers ---
 
 @bot.message_handler(commands=['start', 'help'])
@@ -40,113 +150,480 @@ def send_welcome(message):
         "<b>🤖 RaspiBot 'Ultimate' Console v3.0</b>\n\n"
         "<b>📊 Status</b>\n"
         "/report - System Dashboard\n"
+        "/graph [1h|6h|24h|7d|30d] - Metric History\n"
         "/net - Network Info\n"
         "/services - Critical Services\n\n"
         "<b>🕹️ Control</b>\n"
         "/top - Process Manager\n"
         "/reboot - Restart System\n"
-        "/update - System Update (apt)\n\n"
+        "/update - System Update (apt)\n"
+        "/jobs - Background Jobs\n\n"
         "<b>🔧 Tools</b>\n"
         "/speedtest - Internet Speed\n"
-        "/wol - Wake-on-LAN\n"
-        "/gpio - Pin Control\n"
-        "/sysinfo - Diagnostics (vcgencmd)"
+        "/wol [device|group|MAC] - Wake-on-LAN\n"
+        "/gpio [pin=on|off|0.4 ...] - Pin Control\n"
+        "/sysinfo - Diagnostics (vcgencmd)\n"
+        "/health - Bot Health\n"
+        "/audit [user] [since] - Command Log (admin)\n"
+        "/fleet - Fleet Hosts (collector mode)"
     )
     bot.reply_to(message, text)
 
 @bot.message_handler(commands=['report'])
 @auth_required
 def system_report(message):
-    msg = bot.reply_to(message, "⏳ Gathering data...")
-    
-    # Measure
-    cpu = hal.get_cpu_temperature()
-    diag = hal.get_pi_diagnostics()
-    pub_ip = network.get_public_ip()
-    local_ip = network.get_local_ip()
+    if fleet_target(message, 'report'):
+        fleet_report(message, fleet_target(message, 'report'))
+        return
+    msg = bot.reply_to(message, "⏳ Gathering data...", wait=True)
     
+    # Measure (all sources in parallel)
+    result = report_collector.collect()
+    values, errors = result['values'], result['errors']
+
+    def show(name, value):
+        return f"N/A ({html.escape(str(errors[name]))})" if name in errors else value
+
+    temp = values.get('temp')
+    diag = values.get('diag', {})
     throttled = diag.get('throttled', 'N/A')
     warn_icon = "⚠️" if throttled != '0x0' else "✅"
+    timings = " ".join(f"{name}={secs * 1000:.0f}ms" for name, secs in
+                       sorted(result['timings'].items(), key=lambda kv: kv[1], reverse=True))
 
     text = (
         f"<b>📊 SYSTEM REPORT</b>\n"
-        f"<b>Temp:</b> {cpu:.1f}°C\n"
-        f"<b>Voltage:</b> {diag.get('volt_core', 'N/A')}\n"
-        f"<b>Throttled:</b> {throttled} {warn_icon}\n"
+        f"<b>Temp:</b> {show('temp', f'{temp:.1f}°C' if temp is not None else 'N/A')}\n"
+        f"<b>Voltage:</b> {show('diag', diag.get('volt_core', 'N/A'))}\n"
+        f"<b>Throttled:</b> {show('diag', f'{throttled} {warn_icon}')}\n"
         f"━━━━━━━━━━━━━━\n"
-        f"<b>Local IP:</b> <code>{local_ip}</code>\n"
-        f"<b>Public IP:</b> <code>{pub_ip}</code>\n"
+        f"<b>Local IP:</b> <code>{show('local_ip', values.get('local_ip'))}</code>\n"
+        f"<b>Public IP:</b> <code>{show('public_ip', values.get('public_ip'))}</code>\n"
+        f"<i>⏱ {timings}</i>\n"
     )
     bot.edit_message_text(text, message.chat.id, msg.message_id)
 
+@bot.message_handler(commands=['graph'])
+@auth_required
+def graph(message):
+    args = message.text.split()
+    seconds = charts.parse_range(args[1] if len(args) > 1 else None)
+    if seconds is None:
+        bot.reply_to(message, "Usage: /graph [1h|6h|24h|7d|30d|&lt;n&gt;m|&lt;n&gt;h|&lt;n&gt;d]")
+        return
+    key, png = chart_renderer.render(seconds)
+    if png is None:
+        bot.reply_to(message, "No metrics recorded for that range yet.")
+        return
+    caption = f"📈 Last {charts.format_range(seconds)}"
+    file_id = chart_renderer.file_id(key)
+    if file_id:
+        try:
+            bot.send_photo(message.chat.id, file_id, caption=caption, wait=True) # Already on Telegram's servers
+            return
+        except Exception as e:
+            logger.warning(f"Cached chart file_id rejected, re-uploading: {e}")
+    sent = bot.send_photo(message.chat.id, png, caption=caption, wait=True)
+    if sent and sent.photo:
+        chart_renderer.remember_file_id(key, sent.photo[-1].file_id)
+
+@bot.message_handler(commands=['sysinfo'])
+@auth_required
+def sysinfo(message):
+    diag = hal.get_pi_diagnostics()
+    if 'error' in diag:
+        bot.reply_to(message, f"❌ vcgencmd failed: {diag['error']}")
+        return
+
+    text = f"<b>🔧 DIAGNOSTICS</b>\n<b>Throttled:</b> {diag.get('throttled', 'N/A')}\n"
+    active = [name for name, on in diag.get('throttle_flags', {}).items() if on]
+    if active:
+        text += "⚠️ " + ", ".join(active) + "\n"
+    if diag.get('clocks'):
+        text += "<b>Clocks (MHz):</b> " + ", ".join(
+            f"{d}={hz / 1_000_000:.0f}" for d, hz in diag['clocks'].items() if hz) + "\n"
+    if diag.get('volts'):
+        text += "<b>Volts:</b> " + ", ".join(f"{r}={v:.3f}V" for r, v in diag['volts'].items()) + "\n"
+    if diag.get('mem'):
+        text += "<b>Memory split:</b> " + ", ".join(f"{k}={mb}M" for k, mb in diag['mem'].items()) + "\n"
+    if 'clocks' not in diag:
+        text += f"<b>Voltage:</b> {diag.get('volt_core', 'N/A')}\n<b>ARM clock:</b> {diag.get('clock_arm', 'N/A')}\n"
+    bot.reply_to(message, text)
+
+@bot.message_handler(commands=['health'])
+@auth_required
+def show_health(message):
+    status = health_monitor.status()
+    text = f"<b>🩺 HEALTH</b> {'✅' if status['healthy'] else '⚠️'}\n"
+    for name, check in status['checks'].items():
+        alive = "" if check['alive'] is None else (" (thread alive)" if check['alive'] else " (thread DEAD)")
+        text += f"{'✅' if check['ok'] else '❌'} {name}: {check['age']:.0f}s ago / {check['max_age']:.0f}s{alive}\n"
+    text += (f"<b>Loop lag:</b> {status['loop_lag'] * 1000:.1f}ms (max {status['max_loop_lag'] * 1000:.1f}ms)\n"
+             f"<b>Outbox:</b> {status['outbox_depth']} queued, <b>DB buffer:</b> {status['db_pending']} rows\n"
+             f"<b>Watchdog:</b> {health_monitor.pings} pings, {health_monitor.withheld} withheld")
+    bot.reply_to(message, text)
+
+@bot.message_handler(commands=['audit'])
+@auth_required
+def show_audit(message):
+    """/audit [user_id] [since]: recent commands, e.g. '/audit 6h' or '/audit 12345 1d'"""
+    user_id = since = None
+    for arg in message.text.split()[1:]:
+        if arg.isdigit():
+            user_id = int(arg)
+        elif charts.parse_range(arg) is not None:
+            since = time.time() - charts.parse_range(arg)
+        else:
+            bot.reply_to(message, "Usage: /audit [user_id] [since, e.g. 6h]")
+            return
+    rows = db.get_audit(user_id=user_id, since=since)
+    if not rows:
+        bot.reply_to(message, "No audit entries.")
+        return
+    text = "<b>🛂 AUDIT</b>\n"
+    for row in rows:
+        when = time.strftime('%m-%d %H:%M', time.localtime(row['timestamp']))
+        text += f"{when} <code>{row['user_id']}</code> {html.escape(row['command'])} [{row['status']}]\n"
+    bot.reply_to(message, text)
+
+def send_services(chat_id, max_age=None):
+    if not service_monitor.units:
+        bot.send_message(chat_id, "No services configured. Set SERVICES, e.g. <code>ssh,cron,nginx</code>")
+        return
+    states = service_monitor.get(max_age)
+    if states is None:
+        bot.send_message(chat_id, "❌ Could not query systemctl")
+        return
+    up = sum(1 for s in states.values() if s['active'] == 'active')
+    text = f"<b>⚙️ SERVICES</b> ({up}/{len(states)} active)\n"
+    markup = types.InlineKeyboardMarkup()
+    for unit, s in states.items():
+        name = html.escape(unit)
+        if not s['loaded']:
+            text += f"⚪ {name}: not installed\n"
+            continue
+        if s['active'] == 'active':
+            uptime = f", up {services.format_uptime(s['since'])}" if s['since'] is not None else ""
+            text += f"🟢 {name}: {s['sub']}{uptime}"
+        else:
+            text += f"{'🔴' if s['active'] == 'failed' else '🟡'} {name}: {s['active']} ({s['sub']})"
+            try:
+                markup.add(types.InlineKeyboardButton(
+                    f"🔁 Restart {unit}", callback_data=callback_router.data('sr', unit, chat_id=chat_id)))
+            except ValueError:
+                pass # unit name too long for a button
+        text += f" [{s['restarts']} restarts]\n" if s['restarts'] else "\n"
+    markup.add(types.InlineKeyboardButton("🔄 Refresh", callback_data=callback_router.data('sv')))
+    bot.send_message(chat_id, text, reply_markup=markup)
+
+@bot.message_handler(commands=['services'])
+@auth_required
+def show_services(message):
+    send_services(message.chat.id)
+
 @bot.message_handler(commands=['reboot'])
 @auth_required
 def confirm_reboot(message):
     markup = types.InlineKeyboardMarkup()
-    markup.add(types.InlineKeyboardButton("🔴 CONFIRM REBOOT", callback_data="sys_reboot"))
-    markup.add(types.InlineKeyboardButton("❌ Cancel", callback_data="cancel"))
+    markup.add(types.InlineKeyboardButton("🔴 CONFIRM REBOOT",
+                                          callback_data=callback_router.data('rb', chat_id=message.chat.id)))
+    markup.add(types.InlineKeyboardButton("❌ Cancel", callback_data=callback_router.data('x')))
     bot.reply_to(message, "⚠️ <b>Are you sure you want to REBOOT?</b>", reply_markup=markup)
 
 @bot.message_handler(commands=['top'])
 @auth_required
 def show_top(message):
-    procs = system.get_top_processes()
-    text = "<b>🔝 Top Processes</b>\n"
+    if fleet_target(message, 'top'):
+        fleet_top(message, fleet_target(message, 'top'))
+        return
+    send_top(message.chat.id)
+
+TOP_PAGE = 5 # processes per /top page
+
+def send_top(chat_id, sort='cpu', page=0):
+    procs = system.get_top_processes(limit=config.TOP_N, sort=sort)
+    pages = max(1, -(-len(procs) // TOP_PAGE))
+    page = min(page, pages - 1)
+    text = f"<b>🔝 Top Processes</b> (by {sort.upper()}, page {page + 1}/{pages})\n"
     markup = types.InlineKeyboardMarkup()
     
-    for p in procs:
-        text += f"• {p['name']} ({p['cpu']}%) - PID {p['pid']}\n"
-        markup.add(types.InlineKeyboardButton(f"Kill {p['name']}", callback_data=f"kill_{p['pid']}"))
+    for p in procs[page * TOP_PAGE:(page + 1) * TOP_PAGE]:
+        text += f"• {p['name']} ({p['cpu']}% CPU, {p['mem']}% MEM, {p['io'] / 1024:.0f} KiB/s) - PID {p['pid']}\n"
+        kill = callback_router.data('k', p['pid'], p['started'], chat_id=chat_id)
+        markup.add(types.InlineKeyboardButton(f"Kill {p['name']}", callback_data=kill))
         
-    markup.add(types.InlineKeyboardButton("🔄 Refresh", callback_data="refresh_top"))
-    bot.send_message(message.chat.id, text, reply_markup=markup)
+    markup.row(*[types.InlineKeyboardButton(f"Sort {key.upper()}", callback_data=callback_router.data('tp', key, 0))
+                 for key in system.ProcessMonitor.SORT_KEYS if key != sort])
+    paging = []
+    if page > 0:
+        paging.append(types.InlineKeyboardButton("◀️", callback_data=callback_router.data('tp', sort, page - 1)))
+    paging.append(types.InlineKeyboardButton("🔄 Refresh", callback_data=callback_router.data('tp', sort, page)))
+    if page < pages - 1:
+        paging.append(types.InlineKeyboardButton("▶️", callback_data=callback_router.data('tp', sort, page + 1)))
+    markup.row(*paging)
+    bot.send_message(chat_id, text, reply_markup=markup)
+
+def fleet_hosts(target):
+    return None if target == 'all' else [target]
+
+def fleet_errors(errors):
+    return "".join(f"❌ <b>{html.escape(host)}</b>: {html.escape(err)}\n" for host, err in sorted(errors.items()))
+
+def fleet_report(message, target):
+    """/report <host|all>: queries the agents concurrently and merges the replies"""
+    results, errors = fleet_collector.fan_out('report', hosts=fleet_hosts(target))
+    text = "<b>📊 FLEET REPORT</b>\n"
+    for host, r in sorted(results.items()):
+        sample = r.get('sample') or {}
+        temp = f"{r['temp']:.1f}°C" if r.get('temp') is not None else "N/A"
+        text += (f"<b>{html.escape(host)}</b> {temp}, CPU {sample.get('cpu', 'N/A')}%, "
+                 f"RAM {sample.get('ram', 'N/A')}%, Disk {sample.get('disk', 'N/A')}%, "
+                 f"throttled {r.get('throttled', 'N/A')}, <code>{r.get('local_ip')}</code>\n")
+    bot.reply_to(message, text + fleet_errors(errors) if results or errors else "No agents connected.")
+
+def fleet_top(message, target, sort='cpu'):
+    """/top <host|all>: top processes merged across hosts"""
+    results, errors = fleet_collector.fan_out('top', hosts=fleet_hosts(target), sort=sort, limit=10)
+    rows = [dict(p, host=host) for host, procs in results.items() for p in procs]
+    text = f"<b>🔝 Fleet Top Processes</b> (by {sort.upper()})\n"
+    for p in heapq.nlargest(10, rows, key=lambda r: r[sort] or 0):
+        text += f"• [{html.escape(p['host'])}] {html.escape(p['name'])} ({p['cpu']}% CPU, {p['mem']}% MEM) - PID {p['pid']}\n"
+    markup = types.InlineKeyboardMarkup()
+    try:
+        markup.row(*[types.InlineKeyboardButton(f"{'🔄' if key == sort else 'Sort'} {key.upper()}",
+                                                callback_data=callback_router.data('ft', key, target))
+                     for key in system.ProcessMonitor.SORT_KEYS])
+    except ValueError:
+        markup = None # host name too long for callback_data
+    bot.reply_to(message, text + fleet_errors(errors), reply_markup=markup)
+
+@bot.message_handler(commands=['fleet'])
+@auth_required
+def show_fleet(message):
+    if fleet_collector is None:
+        bot.reply_to(message, "Fleet mode is off (FLEET_MODE=collector enables it).")
+        return
+    hosts = fleet_collector.hosts()
+    if not hosts:
+        bot.reply_to(message, "No agents have connected yet.")
+        return
+    text = "<b>🛰️ Fleet</b>\n"
+    for h in hosts:
+        latest = h['latest'] or {}
+        text += (f"{'🟢' if h['connected'] else '🔴'} <b>{html.escape(h['name'])}</b> "
+                 f"CPU {latest.get('cpu', '?')}% RAM {latest.get('ram', '?')}% Temp {latest.get('temp', '?')}°C "
+                 f"({time.time() - h['last_seen']:.0f}s ago)\n")
+    text += "\n/report &lt;host|all&gt;, /top &lt;host|all&gt;"
+    bot.reply_to(message, text)
+
+def render_job(job):
+    icon = {"RUNNING": "⏳", "DONE": "✅", "PENDING": "⏳"}.get(job.status, "❌")
+    text = f"{icon} <b>{html.escape(job.title)}</b> [<code>{job.id}</code>] {job.status}"
+    if job.exit_code is not None:
+        text += f" (exit {job.exit_code})"
+    return text + f"\n<pre>{html.escape(job.tail_text()) or '...'}</pre>"
+
+def start_job(message, title, command, shell=False):
+    """Starts a background job and streams its output into one edited message"""
+    msg = bot.reply_to(message, f"⏳ Starting {title}...", wait=True)
+    last_text = [None]
+
+    def update(job):
+        text = render_job(job)
+        if text == last_text[0]:
+            return # Telegram rejects edits that change nothing
+        last_text[0] = text
+        markup = None
+        if job.running:
+            markup = types.InlineKeyboardMarkup()
+            markup.add(types.InlineKeyboardButton("⛔ Cancel", callback_data=callback_router.data('jc', job.id, chat_id=msg.chat.id)))
+        priority = outbox.BULK if job.running else outbox.NORMAL
+        bot.edit_message_text(text, msg.chat.id, msg.message_id, reply_markup=markup, priority=priority)
+
+    job_manager.start(title, command, shell=shell, chat_id=message.chat.id, on_progress=update, on_done=update)
+
+@bot.message_handler(commands=['update'])
+@auth_required
+def system_update(message):
+    start_job(message, "System Update", system.UPDATE_COMMAND, shell=True)
+
+@bot.message_handler(commands=['speedtest'])
+@auth_required
+def speedtest(message):
+    start_job(message, "Speedtest", network.SPEEDTEST_COMMAND)
+
+@bot.message_handler(commands=['jobs'])
+@auth_required
+def list_jobs(message):
+    job_list = job_manager.list()
+    if not job_list:
+        bot.reply_to(message, "No jobs yet.")
+        return
+    text = "<b>🧰 Jobs</b>\n"
+    markup = types.InlineKeyboardMarkup()
+    for job in job_list:
+        text += f"• <code>{job.id}</code> {html.escape(job.title)} - {job.status} ({job.lines} lines)\n"
+        if job.running:
+            markup.add(types.InlineKeyboardButton(f"⛔ Cancel {job.id}", callback_data=callback_router.data('jc', job.id, chat_id=message.chat.id)))
+    text += "\nFull output: /job &lt;id&gt;"
+    bot.reply_to(message, text, reply_markup=markup)
+
+@bot.message_handler(commands=['job'])
+@auth_required
+def show_job(message):
+    args = message.text.split()
+    if len(args) != 2:
+        bot.reply_to(message, "Usage: /job <id>")
+        return
+    stored = db.get_job(args[1])
+    if stored is None:
+        job = job_manager.jobs.get(args[1])
+        bot.reply_to(message, render_job(job) if job else "Job not found")
+        return
+    output = stored['output']
+    if len(output) > 3500:
+        bot.send_document(message.chat.id, output.encode(), visible_file_name=f"job-{stored['id']}.log",
+                          caption=f"{stored['title']} - {stored['status']}")
+    else:
+        bot.reply_to(message, f"<b>{html.escape(stored['title'])}</b> - {stored['status']}\n"
+                              f"<pre>{html.escape(output)}</pre>")
+
+@bot.message_handler(commands=['wol'])
+@auth_required
+def wake_on_lan(message):
+    waker = wol.default()
+    args = message.text.split()
+    if len(args) != 2:
+        text = "Usage: /wol &lt;device|group|MAC&gt;\n"
+        if waker.devices:
+            text += "<b>Devices:</b> " + ", ".join(html.escape(d.name) for d in waker.devices.values()) + "\n"
+        if waker.groups:
+            text += "<b>Groups:</b> " + ", ".join(f"{html.escape(g)} ({len(m)})" for g, m in waker.groups.items())
+        bot.reply_to(message, text)
+        return
+    try:
+        devices = waker.resolve(args[1])
+    except KeyError as e:
+        bot.reply_to(message, f"❌ {html.escape(str(e.args[0]))}")
+        return
+    if len(devices) == 1:
+        ok = waker.wake(devices[0])
+        bot.reply_to(message, f"{'✅ Magic packet sent to' if ok else '❌ Failed to wake'} {html.escape(devices[0].name)}")
+        return
+
+    msg = bot.reply_to(message, f"⏳ Waking {len(devices)} machines, {waker.stagger:g}s apart...", wait=True)
+    lines = []
+
+    def progress(device, ok):
+        lines.append(f"{'✅' if ok else '❌'} {html.escape(device.name)}")
+        bot.edit_message_text(f"⏳ Waking {len(devices)} machines\n" + "\n".join(lines),
+                              msg.chat.id, msg.message_id, priority=outbox.BULK)
+
+    def done(results):
+        bot.edit_message_text(f"⚡ Woke {sum(results.values())}/{len(results)} machines\n" + "\n".join(lines),
+                              msg.chat.id, msg.message_id)
+
+    waker.wake_many(devices, on_progress=progress, on_done=done)
+
+GPIO_USAGE = ("Usage: /gpio relay1=on fan=0.4 (together)\n"
+              "/gpio relay1=on wait=2 relay1=off (sequence)\n"
+              "/gpio fan=0.8/3 (PWM ramp over 3s), /gpio stop")
 
 @bot.message_handler(commands=['gpio'])
 @auth_required
 def gpio_control(message):
-    # Example: /gpio 18 on, /gpio 18 off
-    try:
-        args = message.text.split()
-        if len(args) != 3:
-            raise ValueError
-        pin = int(args[1])
-        state = args[2].lower()
-        
-        # Security: In a real env, whitelist these pins in config
-        
-        hal.setup_pin(pin, f"userspace_pin_{pin}")
-        if state == 'on': hal.set_pin_state(f"userspace_pin_{pin}", True)
-        elif state == 'off': hal.set_pin_state(f"userspace_pin_{pin}", False)
-        else: bot.reply_to(message, "State must be 'on' or 'off'"); return
+    args = message.text.split()[1:]
+    if not gpio_controller.pins:
+        bot.reply_to(message, "No pins configured. Set GPIO_PINS, e.g. <code>relay1=17,fan=18:pwm</code>")
+        return
+    if not args:
+        text = "<b>🔌 GPIO</b>\n"
+        for name, value in gpio_controller.states().items():
+            pin = gpio_controller.pins[name]
+            shown = "-" if value is None else (f"{value:.0%}" if pin.pwm else ("ON" if value else "OFF"))
+            text += f"• {name} (BCM {pin.number}{', PWM' if pin.pwm else ''}): {shown}\n"
+        active = gpio_controller.active()
+        if active:
+            text += f"Running sequences: {', '.join(f'#{i}' for i in active)}\n"
+        bot.reply_to(message, text + "\n" + GPIO_USAGE)
+        return
+    if args == ['stop']:
+        bot.reply_to(message, f"⏹ Cancelled {gpio_controller.stop()} sequence(s)")
+        return
 
-        bot.reply_to(message, f"✅ Set Pin {pin} to {state.upper()}")
-        
-    except (ValueError, IndexError):
-        bot.reply_to(message, "Usage: /gpio <pin> <on/off>")
+    try:
+        seq_id, duration = gpio_controller.run(args)
+    except ValueError as e:
+        bot.reply_to(message, f"❌ {html.escape(str(e))}\n{GPIO_USAGE}")
+        return
+    except pins.PinSetupError as e:
+        bot.reply_to(message, f"❌ {html.escape(str(e))}, nothing was changed")
+        return
+    if seq_id is None:
+        bot.reply_to(message, f"✅ {html.escape(' '.join(args))}")
+    else:
+        bot.reply_to(message, f"▶️ Sequence #{seq_id} running for {duration:.1f}s (/gpio stop cancels)")
 
 # --- Callbacks ---
 @bot.callback_query_handler(func=lambda call: True)
 def handle_query(call):
-    if call.data == "cancel":
+    callback_router.dispatch(call)
+
+@callback_router.route('x', 'cancel')
+def on_cancel(call):
+    bot.delete_message(call.message.chat.id, call.message.message_id)
+
+@callback_router.route('rb', 'reboot', signed=True)
+def on_reboot(call):
+    bot.answer_callback_query(call.id, "Rebooting...")
+    system.reboot_system()
+
+@callback_router.route('tp', 'top')
+def on_top(call, sort, page):
+    bot.delete_message(call.message.chat.id, call.message.message_id)
+    send_top(call.message.chat.id, sort=sort, page=int(page))
+
+@callback_router.route('ft', 'top')
+def on_fleet_top(call, sort, target):
+    if fleet_collector is None:
+        bot.answer_callback_query(call.id, "Fleet mode is off")
+        return
+    bot.delete_message(call.message.chat.id, call.message.message_id)
+    fleet_top(call.message, target, sort=sort)
+
+@callback_router.route('k', 'kill', signed=True)
+def on_kill(call, pid, started):
+    success, msg = system.kill_process(int(pid), started=int(started))
+    bot.answer_callback_query(call.id, msg, show_alert=not success)
+    if success:
         bot.delete_message(call.message.chat.id, call.message.message_id)
-        
-    elif call.data == "sys_reboot":
-        bot.answer_callback_query(call.id, "Rebooting...")
-        system.reboot_system()
-        
-    elif call.data == "refresh_top":
+        send_top(call.message.chat.id)
+
+@callback_router.route('sv', 'services')
+def on_services_refresh(call):
+    bot.delete_message(call.message.chat.id, call.message.message_id)
+    send_services(call.message.chat.id, max_age=0)
+
+@callback_router.route('sr', 'service_restart', signed=True)
+def on_service_restart(call, unit):
+    bot.answer_callback_query(call.id, f"Restarting {unit}...")
+    success, msg = service_monitor.restart(unit)
+    bot.send_message(call.message.chat.id, f"{'✅' if success else '❌'} {html.escape(msg)}")
+    if success:
         bot.delete_message(call.message.chat.id, call.message.message_id)
-        show_top(call.message)
-        
-    elif call.data.startswith("kill_"):
-        pid = int(call.data.split('_')[1])
-        success, msg = system.kill_process(pid)
-        bot.answer_callback_query(call.id, msg, show_alert=not success)
-        if success:
-             bot.delete_message(call.message.chat.id, call.message.message_id)
-             show_top(call.message)
+        send_services(call.message.chat.id)
+
+@callback_router.route('jc', 'job_cancel', signed=True)
+def on_job_cancel(call, job_id):
+    success, msg = job_manager.cancel(job_id)
+    bot.answer_callback_query(call.id, msg, show_alert=not success)
 
 # --- Main Loop ---
+def on_stop_signal(signum, frame):
+    """SIGTERM (systemctl stop/restart) and SIGINT end polling so main()'s cleanup runs"""
+    logger.info(f"Received {signal.Signals(signum).name}, shutting down...")
+    command_dispatcher.stop()
+
 def main():
     logger.info("Ultimate RaspiBot v3.0 Starting...")
     
@@ -162,7 +639,37 @@ def main():
     except Exception as e:
         logger.error(f"Startup notify failed: {e}")
 
-    bot.infinity_polling()
+    network.public_ip.add_listener(on_public_ip_change)
+    if service_monitor.units:
+        service_monitor.add_listener(on_service_change)
+        metrics_sampler.add_listener(lambda sample: service_monitor.get()) # one systemctl per sample
+    metrics_sampler.add_listener(alerts.AlertEngine(alerts.default_rules(), notify=notify_admins).feed)
+    if fleet_collector is not None:
+        fleet_collector.start()
+    if config.EXPORTER_ENABLED and metrics_exporter.start():
+        metrics_sampler.add_listener(metrics_exporter.update)
+    if fan_controller.enabled:
+        fan_controller.start()
+        metrics_sampler.add_field('fan', fan_controller.duty_percent)
+    metrics_sampler.start()
+    system.process_monitor.start()
+    Thread(target=warm_up, name="warm-up", daemon=True).start()
+    health_monitor.start(wait_for=command_dispatcher.wait_ready) # READY=1 once polling runs
+    signal.signal(signal.SIGTERM, on_stop_signal)
+    signal.signal(signal.SIGINT, on_stop_signal)
+    try:
+        command_dispatcher.run(bot)
+    finally:
+        health_monitor.stop()
+        metrics_exporter.stop()
+        if fleet_collector is not None:
+            fleet_collector.stop()
+        system.process_monitor.stop()
+        metrics_sampler.stop()
+        fan_controller.stop()
+        gpio_controller.close() # release pin devices
+        bot.outbox.stop() # deliver queued replies
+        db.close() # Flush buffered metrics/audit rows
 
 if __name__ == "__main__":
     main()
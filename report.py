@@ -0,0 +1,59 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+import config
+
+logger = logging.getLogger(__name__)
+
+class ReportCollector:
+    """
+    Runs independent data collectors concurrently.
+    Report latency becomes that of the slowest collector (capped by its
+    timeout) instead of the sum of all of them. Collectors that fail or
+    time out are reported in `errors` so the caller can render partial data.
+    """
+    def __init__(self, max_workers=None):
+        self._collectors = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or config.REPORT_MAX_WORKERS,
+                                            thread_name_prefix="report")
+
+    def add(self, name, func, timeout=None):
+        """Registers func() under `name` with its own timeout in seconds"""
+        self._collectors[name] = (func, timeout if timeout is not None else config.REPORT_COLLECTOR_TIMEOUT)
+
+    @staticmethod
+    def _timed(func, timings, name):
+        start = time.perf_counter()
+        try:
+            return func()
+        finally:
+            timings[name] = time.perf_counter() - start
+
+    def collect(self):
+        """
+        Returns {'values': {name: result}, 'timings': {name: seconds},
+        'errors': {name: message}}. Never raises.
+        """
+        started = time.monotonic()
+        timings = {}
+        futures = {name: self._executor.submit(self._timed, func, timings, name)
+                   for name, (func, _) in self._collectors.items()}
+
+        values, errors = {}, {}
+        for name, future in futures.items():
+            timeout = self._collectors[name][1]
+            remaining = max(0, started + timeout - time.monotonic())
+            done, _ = wait([future], timeout=remaining)
+            if not done:
+                future.cancel()
+                errors[name] = "timeout"
+                timings.setdefault(name, timeout)
+                logger.warning(f"REPORT: Collector '{name}' timed out after {timeout}s")
+                continue
+            try:
+                values[name] = future.result()
+            except Exception as e:
+                errors[name] = str(e)
+                logger.error(f"REPORT: Collector '{name}' failed: {e}")
+
+        return {'values': values, 'timings': dict(timings), 'errors': errors}
@@ -0,0 +1,112 @@
+import time
+import logging
+import threading
+import psutil
+import config
+
+logger = logging.getLogger(__name__)
+
+class MetricsSampler:
+    """
+    Background sampler feeding the metrics table.
+    Runs on its own thread at a fixed rate: ticks are scheduled against the
+    monotonic clock (start + n * interval) so collection time never adds drift,
+    and ticks missed while the Pi was busy are skipped rather than replayed.
+    """
+    def __init__(self, db, hal, interval=None, disk_path='/'):
+        self.db = db
+        self.hal = hal
+        self.interval = float(interval if interval is not None else config.COLLECT_INTERVAL)
+        self.disk_path = disk_path
+        self.latest = None
+        self.samples_taken = 0
+        self.missed_ticks = 0
+        self.last_sample = None # monotonic time of the last successful sample
+        self._listeners = []
+        self._fields = {} # extra sample keys, e.g. 'fan'
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def add_listener(self, callback):
+        """Registers callback(sample) to be called after every sample"""
+        self._listeners.append(callback)
+
+    def add_field(self, name, func):
+        """Adds sample[name] = func() to every sample; 'fan' is also stored in the metrics table"""
+        self._fields[name] = func
+
+    def _throttled(self):
+        """1.0 while the firmware reports throttling/capping/under-voltage, None if unknown"""
+        flags = self.hal.get_pi_diagnostics().get('throttle_flags')
+        if not flags:
+            return None
+        current = ('under_voltage', 'freq_capped', 'throttled', 'soft_temp_limit')
+        return 1.0 if any(flags[name] for name in current) else 0.0
+
+    def collect(self):
+        """Takes one sample and returns it as a dict"""
+        sample = {
+            'timestamp': time.time(),
+            # interval=None compares against the previous call: non-blocking
+            'cpu': psutil.cpu_percent(interval=None),
+            'ram': psutil.virtual_memory().percent,
+            'disk': psutil.disk_usage(self.disk_path).percent,
+            'temp': self.hal.get_cpu_temperature(),
+        }
+        if config.SAMPLE_THROTTLING:
+            sample['throttled'] = self._throttled()
+        for name, func in self._fields.items():
+            sample[name] = func()
+        return sample
+
+    def sample_once(self):
+        try:
+            sample = self.collect()
+        except Exception as e:
+            logger.error(f"SAMPLER: Collection failed: {e}")
+            return None
+
+        self.latest = sample
+        self.samples_taken += 1
+        self.last_sample = time.monotonic()
+        if self.db is not None: # None on fleet agents, which only push samples
+            # Buffered by DatabaseManager, written in batches
+            self.db.insert_metric(sample['cpu'], sample['ram'], sample['disk'], sample['temp'], sample.get('fan'))
+
+        for callback in self._listeners:
+            try:
+                callback(sample)
+            except Exception as e:
+                logger.error(f"SAMPLER: Listener {callback} failed: {e}")
+        return sample
+
+    def _run(self):
+        psutil.cpu_percent(interval=None) # Prime the CPU counter
+        next_tick = time.monotonic()
+        while not self._stop_event.is_set():
+            self.sample_once()
+            next_tick += self.interval
+            now = time.monotonic()
+            if next_tick < now:
+                # Fell behind (suspend, heavy load): skip to the next future slot
+                skipped = int((now - next_tick) // self.interval) + 1
+                self.missed_ticks += skipped
+                next_tick += skipped * self.interval
+            self._stop_event.wait(next_tick - now)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-sampler", daemon=True)
+        self._thread.start()
+        logger.info(f"SAMPLER: Started (interval={self.interval}s)")
+
+    def stop(self, timeout=5):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
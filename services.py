@@ -0,0 +1,120 @@
+import time
+import logging
+import threading
+import subprocess
+import config
+import system
+
+logger = logging.getLogger(__name__)
+
+PROPERTIES = ('Id', 'Description', 'LoadState', 'ActiveState', 'SubState', 'MainPID', 'NRestarts',
+              'ActiveEnterTimestampMonotonic')
+
+def parse_show(output):
+    """`systemctl show` output (KEY=VALUE blocks separated by blank lines) -> list of dicts"""
+    blocks = []
+    for chunk in output.strip().split('\n\n'):
+        block = {}
+        for line in chunk.splitlines():
+            key, sep, value = line.partition('=')
+            if sep:
+                block[key.strip()] = value.strip()
+        if block:
+            blocks.append(block)
+    return blocks
+
+def _unit_state(props):
+    state = {
+        'description': props.get('Description', ''),
+        'loaded': props.get('LoadState') == 'loaded',
+        'active': props.get('ActiveState', 'unknown'),
+        'sub': props.get('SubState', ''),
+        'pid': int(props.get('MainPID') or 0),
+        'restarts': int(props.get('NRestarts') or 0),
+        'since': None,
+    }
+    entered = int(props.get('ActiveEnterTimestampMonotonic') or 0)
+    if entered and state['active'] == 'active':
+        # systemd's monotonic clock is CLOCK_MONOTONIC, the same as time.monotonic()
+        state['since'] = max(0.0, time.monotonic() - entered / 1e6)
+    return state
+
+def format_uptime(seconds):
+    """3725 -> '1h 2m', 200000 -> '2d 7h'"""
+    minutes, hours, days = int(seconds // 60) % 60, int(seconds // 3600) % 24, int(seconds // 86400)
+    if days:
+        return f"{days}d {hours}h"
+    return f"{hours}h {minutes}m" if hours else f"{minutes}m"
+
+class ServiceMonitor:
+    """
+    Unit states behind /services.
+    Every configured unit is queried in ONE `systemctl show` spawn instead of
+    one `systemctl is-active` per unit. Results are cached for `ttl` seconds;
+    listeners hear about ActiveState changes between refreshes.
+    """
+    def __init__(self, units=None, ttl=None, binary=None):
+        self.units = list(units if units is not None else config.SERVICES)
+        self.ttl = ttl if ttl is not None else config.SERVICES_CACHE_TTL
+        self.binary = binary or config.SYSTEMCTL_PATH
+        self.spawns = 0
+        self._cache = None
+        self._cached_at = 0.0
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, callback):
+        """Registers callback(unit, old_state, new_state), called when a unit's ActiveState changes"""
+        self._listeners.append(callback)
+
+    def _query(self):
+        args = [self.binary, 'show', '--no-pager', f"--property={','.join(PROPERTIES)}", '--', *self.units]
+        self.spawns += 1
+        output = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=5).stdout.decode()
+        blocks = parse_show(output)
+        if len(blocks) != len(self.units):
+            raise RuntimeError(f"systemctl show returned {len(blocks)} units for {len(self.units)}")
+        # One block per unit, in argument order (Id may be an alias target, e.g. sshd.service)
+        return {unit: _unit_state(props) for unit, props in zip(self.units, blocks)}
+
+    def get(self, max_age=None):
+        """{unit: state} from the cache, queried again once older than the TTL. None if systemctl failed."""
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            if self._cache is not None and time.monotonic() - self._cached_at < max_age:
+                return self._cache
+            if not self.units:
+                return {}
+            try:
+                states = self._query()
+            except Exception as e:
+                logger.error(f"SERVICES: systemctl show failed: {e}")
+                return None
+            previous, self._cache = self._cache, states
+            self._cached_at = time.monotonic()
+        if previous is not None:
+            for unit, state in states.items():
+                old = previous.get(unit)
+                if old is not None and old['active'] != state['active']:
+                    self._notify(unit, old['active'], state['active'])
+        return states
+
+    def cached(self):
+        """Last known states without querying (None before the first query)"""
+        return self._cache
+
+    def _notify(self, unit, old, new):
+        logger.info(f"SERVICES: {unit} {old} -> {new}")
+        for callback in self._listeners:
+            try:
+                callback(unit, old, new)
+            except Exception as e:
+                logger.error(f"SERVICES: Listener {callback} failed: {e}")
+
+    def restart(self, unit):
+        """Restarts a configured unit through system.restart_service. Returns (success, message)."""
+        if unit not in self.units:
+            return False, f"'{unit}' is not in SERVICES"
+        success = system.restart_service(unit)
+        self._cached_at = 0.0 # the next get() sees the new state
+        return success, f"Restarted {unit}" if success else f"Restarting {unit} failed"
@@ -1,7 +1,11 @@
 import os
+import time
+import heapq
+import threading
 import subprocess
 import psutil
 import logging
+import config
 
 logger = logging.getLogger(__name__)
 
@@ -16,10 +20,12 @@ def shutdown_system():
     logger.warning("System Shutdown requested via Bot")
     os.system("sudo shutdown now")
 
+UPDATE_COMMAND = "sudo apt update && sudo apt upgrade -y"
+
 def run_system_update():
-    """Runs apt update and upgrade -y. Returns output log."""
+    """Runs apt update and upgrade -y. Returns output log. (/update streams it via jobs.JobManager)"""
     try:
-        cmd = "sudo apt update && sudo apt upgrade -y"
+        cmd = UPDATE_COMMAND
         # Using subprocess to capture output real-time is hard in bot, so we just run wait
         # This might timeout if too long.
         output = subprocess.check_output(cmd, shell=True, stderr=subprocess.STDOUT, timeout=600).decode()
@@ -32,43 +38,150 @@ def run_system_update():
 def get_service_status(service_name):
     try:
         # systemctl is-active returns 0 if active, else non-zero
-        subprocess.check_call(['systemctl', 'is-active', '--quiet', service_name])
+        subprocess.check_call([config.SYSTEMCTL_PATH, 'is-active', '--quiet', service_name])
         return True
     except subprocess.CalledProcessError:
         return False
 
 def restart_service(service_name):
+    # sudo only when needed: the systemd unit already runs the bot as root
+    sudo = ['sudo'] if os.geteuid() != 0 else []
     try:
-        subprocess.check_call(['sudo', 'systemctl', 'restart', service_name])
+        subprocess.check_call(sudo + [config.SYSTEMCTL_PATH, 'restart', service_name], timeout=60)
         return True
-    except Exception:
+    except Exception as e:
+        logger.error(f"Restarting {service_name} failed: {e}")
         return False
 
-def get_top_processes(limit=5):
-    procs = []
-    for p in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
+class ProcessMonitor:
+    """
+    Background process sampler behind /top.
+    psutil.Process objects are kept alive between ticks, so cpu_percent()
+    measures the real delta since the previous tick (a fresh object always
+    reports 0.0). Each tick rebuilds the top-N list for every sort key with
+    heapq.nlargest, and requests just return the prepared list. Every
+    process's CPU and I/O rate changes each tick, so there is nothing to gain
+    from patching a heap in place.
+    """
+    SORT_KEYS = ('cpu', 'mem', 'io')
+
+    def __init__(self, interval=None, top_n=None):
+        self.interval = interval if interval is not None else config.TOP_INTERVAL
+        self.top_n = top_n if top_n is not None else config.TOP_N
+        self.updated_at = None
+        self.process_count = 0
+        self._procs = {} # pid -> [Process, last io bytes, last sample time]
+        self._top = {key: [] for key in self.SORT_KEYS}
+        self._lock = threading.Lock()
+        self._sample_lock = threading.Lock() # _procs and the cpu_percent() state belong to one sampler at a time
+        self._ready = threading.Event()      # set once a tick with real CPU deltas is published
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        """Refreshes per-process stats and the per-key top-N lists"""
+        with self._sample_lock:
+            rows = self._collect()
+            top = {key: heapq.nlargest(self.top_n, rows, key=lambda r, k=key: r[k] or 0)
+                   for key in self.SORT_KEYS}
+            with self._lock:
+                self._top = top
+                self.process_count = len(rows)
+                self.updated_at = time.time()
+            self._ready.set()
+
+    def _prime(self):
+        """Starts the CPU/IO counters of every process without publishing the (all-zero) result"""
+        with self._sample_lock:
+            self._collect()
+
+    def _collect(self):
+        now = time.monotonic()
+        pids = set(psutil.pids())
+        for pid in list(self._procs):
+            if pid not in pids:
+                del self._procs[pid]
+
+        rows = []
+        for pid in pids:
+            entry = self._procs.get(pid)
+            try:
+                if entry is None:
+                    proc = psutil.Process(pid)
+                    proc.cpu_percent(None) # prime: first call is always 0.0
+                    entry = self._procs[pid] = [proc, None, now]
+                proc = entry[0]
+                with proc.oneshot():
+                    cpu = proc.cpu_percent(None)
+                    mem = proc.memory_percent()
+                    name = proc.name()
+                    started = int(proc.create_time())
+                    try:
+                        io = proc.io_counters()
+                        io_total = io.read_bytes + io.write_bytes
+                    except (psutil.AccessDenied, AttributeError, NotImplementedError):
+                        io_total = None
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                self._procs.pop(pid, None)
+                continue
+
+            io_rate = 0.0
+            if io_total is not None and entry[1] is not None and now > entry[2]:
+                io_rate = (io_total - entry[1]) / (now - entry[2])
+            entry[1], entry[2] = io_total, now
+            rows.append({'pid': pid, 'name': name, 'cpu': cpu, 'mem': round(mem, 1), 'io': io_rate,
+                         'started': started})
+        return rows
+
+    def top(self, sort='cpu', limit=5, timeout=5):
+        """Cached top processes; before the first tick, starts the monitor and waits for it"""
+        if sort not in self.SORT_KEYS:
+            raise ValueError(f"Unknown sort key '{sort}'")
+        if not self._ready.is_set():
+            self.start() # no-op when main() already started it
+            self._ready.wait(timeout)
+        with self._lock:
+            return self._top[sort][:limit]
+
+    def _run(self):
         try:
-             # Force a CPU read
-             p.cpu_percent()
-             procs.append(p)
-        except (psutil.NoSuchProcess, psutil.AccessDenied): pass
-    
-    # Sort
-    top = sorted(procs, key=lambda p: p.info['cpu_percent'] or 0, reverse=True)[:limit]
-    
-    res = []
-    for p in top:
-        res.append({
-            'pid': p.info['pid'],
-            'name': p.info['name'],
-            'cpu': p.info['cpu_percent'],
-            'mem': p.info['memory_percent']
-        })
-    return res
-
-def kill_process(pid):
+            self._prime()
+        except Exception as e:
+            logger.error(f"Process sampling failed: {e}")
+        self._stop_event.wait(0.2) # a short first interval so CPU deltas mean something
+        next_tick = time.monotonic()
+        while not self._stop_event.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"Process sampling failed: {e}")
+            next_tick += self.interval
+            self._stop_event.wait(max(0, next_tick - time.monotonic()))
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="process-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+process_monitor = ProcessMonitor()
+
+def get_top_processes(limit=5, sort='cpu'):
+    return process_monitor.top(sort=sort, limit=limit)
+
+def kill_process(pid, started=None):
+    """Terminates pid; `started` (create time, whole seconds) guards against a reused PID"""
     try:
         p = psutil.Process(pid)
+        if started is not None and int(p.create_time()) != started:
+            return False, "Process not found (PID reused)"
         p.terminate()
         return True, f"Terminated PID {pid}"
     except psutil.NoSuchProcess:
@@ -0,0 +1,85 @@
+import pytest
+import alerts
+
+def feed(engine, metric, values, start=0, step=10):
+    for i, value in enumerate(values):
+        engine.feed({'timestamp': start + i * step, metric: value})
+
+def test_sliding_window_stats():
+    w = alerts.SlidingWindow(30)
+    for ts, value in [(0, 5), (10, 9), (20, 1), (30, 3)]:
+        w.push(ts, value)
+    assert (w.max, w.min, w.last) == (9, 1, 3)
+    assert w.avg == pytest.approx(4.5)
+    w.push(45, 2) # 0 and 10 expire
+    assert len(w) == 3
+    assert w.max == 3
+    assert w.avg == pytest.approx(2.0)
+
+def test_sustained_condition():
+    sent = []
+    rule = alerts.AlertRule("Hot", 'temp', 80, stat='last', window=60, sustain=30)
+    engine = alerts.AlertEngine([rule], notify=sent.append)
+    feed(engine, 'temp', [85, 85, 85])   # t=0..20: not yet sustained 30s
+    assert sent == []
+    feed(engine, 'temp', [85], start=30)
+    assert len(sent) == 1 and "Hot" in sent[0]
+
+def test_spike_does_not_fire():
+    sent = []
+    rule = alerts.AlertRule("Hot", 'temp', 80, stat='last', window=60, sustain=30)
+    engine = alerts.AlertEngine([rule], notify=sent.append)
+    feed(engine, 'temp', [85, 70, 85, 70, 85])
+    assert sent == []
+
+def test_hysteresis():
+    sent = []
+    rule = alerts.AlertRule("CPU", 'cpu', 90, stat='last', hysteresis=10)
+    engine = alerts.AlertEngine([rule], notify=sent.append)
+    feed(engine, 'cpu', [95, 85, 92, 85])  # stays inside the band: no flapping
+    assert len(sent) == 1
+    feed(engine, 'cpu', [75], start=100)
+    assert len(sent) == 2 and "resolved" in sent[1]
+    assert engine.active() == []
+
+def test_cooldown_suppresses_repeat():
+    sent = []
+    rule = alerts.AlertRule("CPU", 'cpu', 90, stat='last', cooldown=600)
+    engine = alerts.AlertEngine([rule], notify=sent.append)
+    feed(engine, 'cpu', [95, 50, 95, 50])  # fire, resolve, fire again within cooldown
+    assert len(sent) == 2                  # first alert + its resolution only
+    assert rule.suppressed == 1
+    feed(engine, 'cpu', [50, 95], start=1000)
+    assert len(sent) == 3
+
+def test_sustained_breach_notifies_after_cooldown():
+    sent = []
+    rule = alerts.AlertRule("CPU", 'cpu', 90, stat='last', cooldown=600)
+    engine = alerts.AlertEngine([rule], notify=sent.append)
+    feed(engine, 'cpu', [95, 50, 95])       # fire, resolve, re-breach within cooldown
+    assert len(sent) == 2 and rule.firing and not rule.notified
+    feed(engine, 'cpu', [95, 95], start=300) # still inside the cooldown
+    assert len(sent) == 2
+    feed(engine, 'cpu', [95], start=600)     # held past it
+    assert len(sent) == 3 and sent[-1].startswith("🚨")
+    assert rule.notified and rule.last_notified == 600
+    feed(engine, 'cpu', [95, 50], start=700)
+    assert sent[-1].startswith("✅")         # and its resolution is reported
+
+def test_window_average():
+    sent = []
+    rule = alerts.AlertRule("CPU", 'cpu', 90, stat='avg', window=30)
+    engine = alerts.AlertEngine([rule], notify=sent.append)
+    feed(engine, 'cpu', [70, 100])  # avg 85
+    assert sent == []
+    feed(engine, 'cpu', [100], start=20) # avg 90
+    assert len(sent) == 1
+
+def test_missing_metric_is_ignored():
+    engine = alerts.AlertEngine(alerts.default_rules())
+    engine.feed({'timestamp': 0, 'cpu': 10, 'throttled': None})
+    assert engine.active() == []
+
+def test_invalid_stat():
+    with pytest.raises(ValueError):
+        alerts.AlertRule("x", 'cpu', 1, stat='median')
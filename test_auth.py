@@ -0,0 +1,56 @@
+import time
+import auth
+
+def make(**kwargs):
+    options = dict(admins=[1], operators=[2], viewers=[3, 2], rate=0.001, burst=5)
+    options.update(kwargs)
+    return auth.Authorizer(**options)
+
+def test_roles():
+    authorizer = make()
+    assert authorizer.role(1) == 'admin'
+    assert authorizer.role(2) == 'operator' # the highest role wins
+    assert authorizer.role(3) == 'viewer'
+    assert authorizer.role(4) is None
+
+def test_permissions():
+    authorizer = make()
+    assert authorizer.allowed(1, 'reboot') and authorizer.allowed(1, 'audit')
+    assert authorizer.allowed(2, 'kill') and authorizer.allowed(2, 'wol')
+    assert not authorizer.allowed(2, 'reboot')
+    assert authorizer.allowed(3, 'report') and authorizer.allowed(3, 'cancel')
+    assert not authorizer.allowed(3, 'kill')
+    assert not authorizer.allowed(4, 'help')
+
+def test_check_statuses():
+    authorizer = make()
+    assert authorizer.check(1, 'reboot') == (auth.OK, True)
+    assert authorizer.check(3, 'gpio') == (auth.DENIED, True)
+    assert authorizer.check(99, 'start') == (auth.DENIED, True)
+
+def test_open_mode():
+    authorizer = make(admins=[], operators=[], viewers=[])
+    assert authorizer.open_mode
+    assert authorizer.check(12345, 'reboot') == (auth.OK, True)
+
+def test_rate_limit_audits_first_drop_only():
+    authorizer = make(burst=2)
+    assert authorizer.check(99, 'start')[0] == auth.DENIED # strangers are limited too
+    assert authorizer.check(99, 'start')[0] == auth.DENIED
+    assert authorizer.check(99, 'start') == (auth.RATE_LIMITED, True)
+    assert authorizer.check(99, 'start') == (auth.RATE_LIMITED, False)
+    assert authorizer.check(1, 'start') == (auth.OK, True) # other users unaffected
+
+def test_rate_limit_refills():
+    authorizer = make(rate=100, burst=1)
+    assert authorizer.check(1, 'report')[0] == auth.OK
+    assert authorizer.check(1, 'report')[0] == auth.RATE_LIMITED
+    time.sleep(0.02)
+    assert authorizer.check(1, 'report') == (auth.OK, True)
+
+def test_tracked_users_bounded():
+    authorizer = make(max_tracked=10)
+    for uid in range(1000, 1100):
+        authorizer.check(uid, 'start')
+    assert len(authorizer._buckets) == 10
+    assert 1099 in authorizer._buckets and 1000 not in authorizer._buckets
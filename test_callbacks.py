@@ -0,0 +1,97 @@
+import time
+from types import SimpleNamespace
+import pytest
+import callbacks
+
+def make_call(data, chat_id=42, user_id=1):
+    return SimpleNamespace(id='q1', data=data, from_user=SimpleNamespace(id=user_id, username='u'),
+                           message=SimpleNamespace(chat=SimpleNamespace(id=chat_id), message_id=7))
+
+class Harness:
+    def __init__(self, allow=True, ttl=3600):
+        self.allow = allow
+        self.checks = []
+        self.toasts = []
+        self.calls = []
+        self.router = callbacks.CallbackRouter(self.authorize, lambda call_id, text: self.toasts.append(text),
+                                               secret='test-secret', ttl=ttl)
+        self.router.route('x', 'cancel')(lambda call: self.calls.append(('x',)))
+        self.router.route('tp', 'top')(lambda call, sort, page: self.calls.append(('tp', sort, page)))
+        self.router.route('k', 'kill', signed=True)(lambda call, pid, started: self.calls.append(('k', pid, started)))
+
+    def authorize(self, user, permission, text):
+        self.checks.append((user.id, permission, text))
+        return self.allow
+
+def test_unsigned_route():
+    h = Harness()
+    data = h.router.data('tp', 'mem', 2)
+    assert data == 'tp:mem:2'
+    assert h.router.dispatch(make_call(data)) == callbacks.OK
+    assert h.calls == [('tp', 'mem', '2')]
+    assert h.checks == [(1, 'top', 'callback:tp:mem:2')]
+
+def test_signed_route_roundtrip():
+    h = Harness()
+    data = h.router.data('k', 1234, 1700000000, chat_id=42)
+    assert data.startswith('k:1234:1700000000:') and len(data) <= callbacks.MAX_DATA
+    assert h.router.dispatch(make_call(data)) == callbacks.OK
+    assert h.calls == [('k', '1234', '1700000000')]
+
+@pytest.mark.parametrize("tamper", [
+    lambda d: d.replace('k:1234', 'k:1235'),  # edited pid
+    lambda d: d[:-1] + ('A' if d[-1] != 'A' else 'B'),  # edited signature
+    lambda d: 'k:1234:1700000000',  # signature stripped
+    lambda d: d[:-2] + 'é',  # non-ascii
+])
+def test_forged_buttons_rejected(tamper):
+    h = Harness()
+    data = tamper(h.router.data('k', 1234, 1700000000, chat_id=42))
+    assert h.router.dispatch(make_call(data)) == callbacks.FORGED
+    assert h.calls == [] and h.checks == []
+    assert h.toasts
+
+def test_signature_bound_to_chat():
+    h = Harness()
+    data = h.router.data('k', 1234, 1700000000, chat_id=42)
+    assert h.router.dispatch(make_call(data, chat_id=43)) == callbacks.FORGED
+
+def test_signature_bound_to_secret():
+    h = Harness()
+    other = callbacks.CallbackRouter(h.authorize, None, secret=b'another-secret')
+    other.route('k', 'kill', signed=True)(lambda call, pid, started: None)
+    data = other.data('k', 1234, 1700000000, chat_id=42)
+    assert h.router.dispatch(make_call(data)) == callbacks.FORGED
+
+def test_expired_button(monkeypatch):
+    h = Harness(ttl=60)
+    data = h.router.data('k', 1234, 1700000000, chat_id=42)
+    now = time.time()
+    monkeypatch.setattr(callbacks.time, 'time', lambda: now + 120)
+    assert h.router.dispatch(make_call(data)) == callbacks.EXPIRED
+    assert h.calls == []
+
+def test_denied_and_unknown():
+    h = Harness(allow=False)
+    assert h.router.dispatch(make_call('x')) == callbacks.DENIED
+    assert h.router.dispatch(make_call('kill_1234')) == callbacks.UNKNOWN # v3.0 button
+    assert h.calls == [] and h.router.rejected == 2
+
+def test_handler_failure_is_contained():
+    h = Harness()
+    assert h.router.dispatch(make_call('tp:cpu')) == callbacks.FAILED # missing argument
+    assert h.toasts == ["❌ Something went wrong, try again"] # the button stops spinning
+    assert h.router.rejected == 0
+
+def test_data_limits():
+    h = Harness()
+    with pytest.raises(ValueError):
+        h.router.data('tp', 'a:b', 0)
+    with pytest.raises(ValueError):
+        h.router.data('tp', 'x' * 64, 0)
+    with pytest.raises(ValueError):
+        h.router.route('x', 'cancel')(lambda call: None)
+
+def test_base36():
+    assert callbacks.to_base36(0) == '0'
+    assert int(callbacks.to_base36(1700000000), 36) == 1700000000
@@ -0,0 +1,74 @@
+import math
+import time
+import pytest
+import charts
+import database
+
+@pytest.fixture
+def db(tmp_path):
+    original_db = database.config.DB_FILE
+    database.config.DB_FILE = str(tmp_path / "charts.db")
+    db = database.DatabaseManager()
+    yield db
+    db.close()
+    database.config.DB_FILE = original_db
+
+def _fill(db, seconds, step=60):
+    now = int(time.time())
+    with db._lock:
+        for ts in range(now - seconds, now, step):
+            cpu = 50 + 40 * math.sin(ts / 600)
+            db._metric_buffer.append(database.pack_metric(ts, cpu, 40.0, 60.0, 45.0 + cpu / 10))
+    db.flush()
+
+def test_parse_range():
+    assert charts.parse_range(None) == 86400
+    assert charts.parse_range('6h') == 6 * 3600
+    assert charts.parse_range('90m') == 5400
+    assert charts.parse_range('7D') == 7 * 86400
+    assert charts.parse_range('10s') is None
+    assert charts.parse_range('999d') is None
+    assert charts.format_range(5400) == '90m'
+    assert charts.format_range(172800) == '2d'
+
+def test_lttb_keeps_endpoints_and_peaks():
+    xs = list(range(1000))
+    ys = [0.0] * 1000
+    ys[537] = 100.0 # single spike
+    out_x, out_y = charts.lttb(xs, ys, 50)
+    assert len(out_x) == 50
+    assert out_x[0] == 0 and out_x[-1] == 999
+    assert 100.0 in out_y
+    assert out_x == sorted(out_x)
+
+def test_lttb_passthrough_when_small():
+    assert charts.lttb([1, 2, 3], [4, 5, 6], 10) == ([1, 2, 3], [4, 5, 6])
+
+def test_render_png_and_cache(db):
+    _fill(db, 6 * 3600)
+    renderer = charts.ChartRenderer(db, width_px=400, height_px=240)
+    key, png = renderer.render(6 * 3600)
+    assert png.startswith(b'\x89PNG')
+    assert renderer.renders == 1
+    # Nothing new recorded: served from cache
+    key2, png2 = renderer.render(6 * 3600)
+    assert key2 == key and png2 is png
+    assert renderer.renders == 1
+    # A new sample changes the newest bucket
+    db.insert_metric(10.0, 20.0, 30.0, 40.0)
+    key3, _ = renderer.render(6 * 3600)
+    assert key3 != key
+    assert renderer.renders == 2
+
+def test_file_id_reuse_and_eviction(db):
+    _fill(db, 3600)
+    renderer = charts.ChartRenderer(db, width_px=400, height_px=240, cache_size=1)
+    key, _ = renderer.render(3600)
+    renderer.remember_file_id(key, 'photo-1')
+    assert renderer.file_id(key) == 'photo-1'
+    renderer.render(1800) # evicts the 1h chart and its file_id
+    assert renderer.file_id(key) is None
+
+def test_render_without_data(db):
+    renderer = charts.ChartRenderer(db, width_px=400, height_px=240)
+    assert renderer.render(3600) == (None, None)
@@ -19,6 +19,7 @@ def db_manager(tmp_path):
     
     db = database.DatabaseManager()
     yield db
+    db.close()
     
     # Teardown - Restore config, let pytest handle file cleanup
     database.config.DB_FILE = original_db
@@ -43,9 +44,228 @@ def test_insert_and_get_metrics(db_manager):
 
 def test_audit_log(db_manager):
     db_manager.log_command(123, "/test", "SUCCESS")
+    # Audit rows are buffered until flushed
+    db_manager.flush()
     with sqlite3.connect(db_manager.db_file) as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT user_id, command FROM audit_log")
         row = cursor.fetchone()
         assert row[0] == 123
         assert row[1] == "/test"
+
+def test_writes_are_buffered_until_flush(db_manager):
+    db_manager.insert_metric(10.0, 20.0, 30.0, 45.0)
+    db_manager.log_command(1, "/report")
+    assert db_manager.pending() == 2
+    db_manager.flush()
+    assert db_manager.pending() == 0
+    with sqlite3.connect(db_manager.db_file) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM audit_log").fetchone()[0] == 1
+
+def test_flush_on_size_threshold(db_manager):
+    db_manager.flush_size = 3
+    for i in range(3):
+        db_manager.log_command(i, "/top")
+    # Audit rows are written by the flusher thread, woken early by the threshold
+    deadline = time.monotonic() + 2
+    while db_manager.pending() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert db_manager.pending() == 0
+
+def test_failed_flush_keeps_rows(db_manager, monkeypatch):
+    db_manager.insert_metric(10.0, 20.0, 30.0, 45.0)
+    db_manager.log_command(1, "/first")
+    monkeypatch.setattr(database, 'INSERT_AUDIT_SQL', "INSERT INTO missing_table VALUES (?, ?, ?, ?)")
+    assert db_manager.flush() is False
+    db_manager.log_command(2, "/second") # arrived while the write was failing
+    assert db_manager.pending() == 3
+    monkeypatch.undo()
+    assert db_manager.flush() is True
+    with sqlite3.connect(db_manager.db_file) as conn:
+        assert [r[0] for r in conn.execute("SELECT command FROM audit_log ORDER BY id")] == ["/first", "/second"]
+        assert conn.execute("SELECT COUNT(*) FROM metrics").fetchone()[0] == 1
+
+def test_failed_flush_is_capped(db_manager, monkeypatch):
+    db_manager.max_pending = 5
+    db_manager.flush_size = 100
+    for i in range(8):
+        db_manager.log_command(i, "/top")
+    monkeypatch.setattr(database, 'INSERT_AUDIT_SQL', "INSERT INTO missing_table VALUES (?, ?, ?, ?)")
+    assert db_manager.flush() is False
+    assert [row[1] for row in db_manager._audit_buffer] == [3, 4, 5, 6, 7] # oldest dropped
+
+def test_close_flushes_pending(db_manager):
+    db_manager.log_command(7, "/reboot")
+    db_manager.close()
+    with sqlite3.connect(db_manager.db_file) as conn:
+        assert conn.execute("SELECT user_id FROM audit_log").fetchone()[0] == 7
+
+def test_wal_mode(db_manager):
+    with sqlite3.connect(db_manager.db_file) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+def _insert_raw(db, ts, cpu, ram=50.0, disk=60.0, temp=45.0):
+    with db._lock:
+        db._metric_buffer.append(database.pack_metric(ts, cpu, ram, disk, temp))
+
+def test_retention_rolls_up_before_pruning(db_manager):
+    now = 1_000_000_000 - (1_000_000_000 % 3600) + 3600 * 50
+    old = now - 3600 * 49  # beyond the 48h raw window
+    _insert_raw(db_manager, old, 10.0)
+    _insert_raw(db_manager, old + 10, 30.0)
+    _insert_raw(db_manager, now - 30, 50.0)
+
+    db_manager.run_retention(now=now)
+
+    with sqlite3.connect(db_manager.db_file) as conn:
+        # Old raw rows pruned, recent one kept
+        assert conn.execute("SELECT COUNT(*) FROM metrics").fetchone()[0] == 1
+        row = conn.execute("SELECT samples, cpu_min, cpu_max, cpu_avg FROM metrics_1m WHERE bucket = ?",
+                           (old - old % 60,)).fetchone()
+        assert row == (2, 10.0, 30.0, pytest.approx(20.0))
+        # Cascaded into the coarser tiers as well
+        hourly = conn.execute("SELECT samples, cpu_avg FROM metrics_1h WHERE bucket = ?",
+                              (old - old % 3600,)).fetchone()
+        assert hourly == (2, pytest.approx(20.0))
+
+def test_retention_is_incremental(db_manager):
+    now = 1_000_000_000 - (1_000_000_000 % 60)
+    _insert_raw(db_manager, now - 120, 10.0)
+    db_manager.run_retention(now=now)
+    # A second run must not double count already aggregated buckets
+    _insert_raw(db_manager, now + 5, 90.0)
+    db_manager.run_retention(now=now + 60)
+
+    with sqlite3.connect(db_manager.db_file) as conn:
+        rows = conn.execute("SELECT bucket, samples FROM metrics_1m ORDER BY bucket").fetchall()
+    assert rows == [(now - 120, 1), (now, 1)]
+
+def test_long_range_history_uses_rollups(db_manager):
+    assert db_manager._history_table(3600) == 'metrics'
+    assert db_manager._history_table(3600 * 24 * 5) == 'metrics_1m'
+    assert db_manager._history_table(3600 * 24 * 400) == 'metrics_1h'
+
+def test_same_second_samples_do_not_collide(db_manager):
+    db_manager.insert_metric(10.0, 20.0, 30.0, 45.0)
+    db_manager.insert_metric(11.0, 21.0, 31.0, 46.0)
+    db_manager.flush()
+    with sqlite3.connect(db_manager.db_file) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM metrics").fetchone()[0] == 2
+
+def test_values_stored_in_tenths(db_manager):
+    db_manager.insert_metric(12.34, 20.0, 30.0, 45.67)
+    db_manager.flush()
+    with sqlite3.connect(db_manager.db_file) as conn:
+        assert conn.execute("SELECT cpu, temp FROM metrics").fetchone() == (123, 457)
+
+def test_migrates_legacy_schema(tmp_path):
+    legacy_file = str(tmp_path / "legacy.db")
+    now = int(time.time())
+    with sqlite3.connect(legacy_file) as conn:
+        conn.execute("CREATE TABLE metrics (timestamp INTEGER PRIMARY KEY, cpu_percent REAL, "
+                     "ram_percent REAL, disk_percent REAL, temp REAL)")
+        conn.execute("INSERT INTO metrics VALUES (?, 15.5, 40.0, 60.0, 50.2)", (now - 10,))
+
+    original_db = database.config.DB_FILE
+    database.config.DB_FILE = legacy_file
+    try:
+        db = database.DatabaseManager()
+        hist = db.get_history(hours=1)
+        db.close()
+    finally:
+        database.config.DB_FILE = original_db
+
+    assert hist == [(now - 10, pytest.approx(15.5), pytest.approx(40.0))]
+    with sqlite3.connect(legacy_file) as conn:
+        tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    assert 'metrics_legacy' not in tables
+
+def test_adds_fan_columns_to_existing_files(tmp_path):
+    db_file = str(tmp_path / "v31.db")
+    with sqlite3.connect(db_file) as conn:
+        conn.execute("CREATE TABLE metrics (ts_ms INTEGER PRIMARY KEY, cpu INTEGER, ram INTEGER, "
+                     "disk INTEGER, temp INTEGER) WITHOUT ROWID")
+        conn.execute("CREATE TABLE metrics_1m (bucket INTEGER PRIMARY KEY, samples INTEGER, cpu_avg REAL)")
+
+    original_db = database.config.DB_FILE
+    database.config.DB_FILE = db_file
+    try:
+        db = database.DatabaseManager()
+        db.insert_metric(10.0, 20.0, 30.0, 45.0, fan=55.0)
+        start = int(time.time()) - 60
+        bucket = list(db.get_history_buckets(start, max_points=1, metrics=['fan'], aggregates=('avg',)))[0]
+        db.close()
+    finally:
+        database.config.DB_FILE = original_db
+
+    assert bucket['fan_avg'] == pytest.approx(55.0)
+    with sqlite3.connect(db_file) as conn:
+        assert 'fan_max' in [r[1] for r in conn.execute("PRAGMA table_info(metrics_1m)")]
+
+def test_history_buckets_aggregate_in_sql(db_manager):
+    start = 1_000_000_000 - (1_000_000_000 % 60)
+    for i, cpu in enumerate([10.0, 20.0, 30.0, 40.0]):
+        _insert_raw(db_manager, start + i * 15, cpu, temp=40.0 + i)
+    db_manager.flush()
+
+    buckets = list(db_manager.get_history_buckets(start, start + 60, max_points=2,
+                                                  metrics=['cpu', 'temp']))
+    assert [b['timestamp'] for b in buckets] == [start, start + 30]
+    first = buckets[0]
+    assert first['samples'] == 2
+    assert first['cpu_avg'] == pytest.approx(15.0)
+    assert first['cpu_min'] == pytest.approx(10.0)
+    assert first['cpu_max'] == pytest.approx(20.0)
+    assert first['cpu_last'] == pytest.approx(20.0)
+    assert buckets[1]['temp_last'] == pytest.approx(43.0)
+    assert 'ram_avg' not in first
+
+def test_history_buckets_is_bounded_and_lazy(db_manager):
+    start = int(time.time()) - 3600
+    for i in range(0, 3600, 5):
+        _insert_raw(db_manager, start + i, 50.0)
+    gen = db_manager.get_history_buckets(start, max_points=10)
+    assert not isinstance(gen, list)
+    assert len(list(gen)) <= 10
+
+def test_history_buckets_uses_rollup_tier(db_manager):
+    now = int(time.time())
+    start = now - 3600 * 24 * 3
+    start -= start % 3600
+    _insert_raw(db_manager, start + 10, 10.0)
+    _insert_raw(db_manager, start + 3700, 30.0)
+    _insert_raw(db_manager, now - 5, 70.0)
+    db_manager.run_retention(now=now)
+
+    buckets = list(db_manager.get_history_buckets(start, now + 1, max_points=100, metrics=["cpu"]))
+    # Old rows come from a rollup tier (raw copies are past retention), the tail from raw rows
+    assert buckets[0]['cpu_avg'] == pytest.approx(10.0)
+    assert buckets[-1]['cpu_last'] == pytest.approx(70.0)
+    assert sum(b['samples'] for b in buckets) == 3
+
+def test_history_buckets_rejects_unknown_metric(db_manager):
+    with pytest.raises(ValueError):
+        list(db_manager.get_history_buckets(0, 10, metrics=['cpu; DROP TABLE metrics']))
+
+def test_audit_query(db_manager):
+    now = int(time.time())
+    with db_manager._lock:
+        db_manager._audit_buffer.extend([
+            (now - 300, 1, "/report", "OK"),
+            (now - 200, 2, "/reboot", "DENIED"),
+            (now - 100, 1, "/top", "OK"),
+            (now, 1, "/update", "RATE_LIMITED"),
+        ])
+    rows = db_manager.get_audit(user_id=1, limit=2)
+    assert [r['command'] for r in rows] == ["/update", "/top"]
+    rows = db_manager.get_audit(since=now - 250)
+    assert [r['user_id'] for r in rows] == [1, 1, 2]
+    assert db_manager.get_audit(user_id=2, since=now - 100) == []
+
+def test_audit_queries_use_indexes(db_manager):
+    with sqlite3.connect(db_manager.db_file) as conn:
+        for where in ("", "WHERE user_id = 1", "WHERE timestamp >= 5", "WHERE user_id = 1 AND timestamp >= 5"):
+            plan = " ".join(row[3] for row in conn.execute(
+                f"EXPLAIN QUERY PLAN SELECT * FROM audit_log {where} ORDER BY timestamp DESC, id DESC LIMIT 20"))
+            assert "USING INDEX idx_audit_" in plan
+            assert "TEMP B-TREE" not in plan
@@ -0,0 +1,87 @@
+import os
+import sys
+import pytest
+from unittest.mock import patch
+import diagnostics
+
+SHIM = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mock_vcgencmd.py')
+
+@pytest.fixture
+def shim(tmp_path):
+    # Wrapper script so the collector can call it like the real binary
+    path = tmp_path / 'vcgencmd'
+    path.write_text(f"#!/bin/sh\nexec {sys.executable} {SHIM} \"$@\"\n")
+    path.chmod(0o755)
+    return str(path)
+
+def test_decode_throttled():
+    flags = diagnostics.decode_throttled(0x50005)
+    assert flags['under_voltage'] is True
+    assert flags['throttled'] is True
+    assert flags['freq_capped'] is False
+    assert flags['under_voltage_occurred'] is True
+    assert flags['throttled_occurred'] is True
+
+def test_collects_all_fields_in_one_spawn(shim, tmp_path, monkeypatch):
+    monkeypatch.setenv('MOCK_VCGENCMD_THROTTLED', '0x50000')
+    d = diagnostics.PiDiagnostics(fields=['throttled', 'clocks', 'volts', 'mem'], ttl=60, binary=shim,
+                                  sysfs_root=str(tmp_path / 'nosys'))
+    data = d.get()
+    assert d.spawns == 1
+    assert data['throttled'] == '0x50000'
+    assert data['throttle_flags']['under_voltage_occurred'] is True
+    assert data['clocks']['arm'] == 1500000000
+    assert set(data['clocks']) == set(diagnostics.CLOCK_DOMAINS)
+    assert data['volts']['sdram_c'] == pytest.approx(1.1)
+    assert data['mem'] == {'arm': 948, 'gpu': 76}
+    # Keys /report relies on
+    assert data['volt_core'] == '0.8563V'
+    assert data['clock_arm'] == '1500000000'
+
+def test_default_fields_are_minimal(shim, tmp_path):
+    d = diagnostics.PiDiagnostics(ttl=60, binary=shim, sysfs_root=str(tmp_path / 'nosys'))
+    assert d.fields == ['throttled', 'volts']
+    data = d.get()
+    assert data['volt_core'] == '0.8563V' and data['throttled']
+    assert not data['clocks'] and not data['mem']
+
+def test_results_are_cached(shim, tmp_path):
+    d = diagnostics.PiDiagnostics(ttl=60, binary=shim, sysfs_root=str(tmp_path))
+    d.get()
+    d.get()
+    assert d.spawns == 1
+    d.get(max_age=0)
+    assert d.spawns == 2
+
+def test_sysfs_fast_path_avoids_spawn(tmp_path):
+    throttled = tmp_path / diagnostics.SYSFS_THROTTLED
+    throttled.parent.mkdir(parents=True)
+    throttled.write_text("4\n")
+    freq = tmp_path / diagnostics.SYSFS_ARM_FREQ
+    freq.parent.mkdir(parents=True)
+    freq.write_text("1200000\n")
+
+    d = diagnostics.PiDiagnostics(fields=['throttled'], ttl=60, binary='/nonexistent', sysfs_root=str(tmp_path))
+    data = d.get()
+    assert d.spawns == 0
+    assert data['throttled'] == '0x4'
+    assert data['throttle_flags']['throttled'] is True
+
+def test_missing_binary_reports_error(tmp_path):
+    d = diagnostics.PiDiagnostics(fields=['volts'], binary='/nonexistent/vcgencmd', sysfs_root=str(tmp_path))
+    # The shell reports "not found" without key=value lines: nothing parsed, no crash
+    assert d.get()['volts'] == {}
+
+def test_mailbox_gencmd_buffer_layout():
+    def fake_ioctl(fd, request, buf, mutate):
+        assert request == diagnostics.IOCTL_MBOX_PROPERTY
+        assert buf[0] == len(buf) * 4
+        assert buf[2] == diagnostics.MAILBOX_TAG_GENCMD
+        assert buf[6:10].tobytes().startswith(b'get_throttled\0')
+        # Firmware writes the response over the command string
+        reply = b'throttled=0x4\0'.ljust(16, b'\0')
+        buf[6:10] = type(buf)('I', reply)
+        return 0
+
+    with patch('fcntl.ioctl', side_effect=fake_ioctl):
+        assert diagnostics.mailbox_gencmd(3, 'get_throttled') == 'throttled=0x4'
@@ -0,0 +1,112 @@
+import pytest
+import time
+import threading
+import telebot
+import dispatcher
+from mock_telegram import FakeTelegramServer
+
+@pytest.fixture
+def telegram():
+    server = FakeTelegramServer().start()
+    original = telebot.apihelper.API_URL
+    telebot.apihelper.API_URL = server.api_url
+    yield server
+    telebot.apihelper.API_URL = original
+    server.stop()
+
+@pytest.fixture
+def running_bot(telegram):
+    d = dispatcher.CommandDispatcher(workers=4, limits={'slow': 1}, default_limit=2)
+    bot = dispatcher.DispatchingBot("123:TEST", d)
+    thread = threading.Thread(target=d.run, args=(bot,), kwargs={'timeout': 1}, daemon=True)
+    yield d, bot, thread
+    d.stop()
+    thread.join(timeout=5)
+
+def wait_for(predicate, timeout=3):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+def test_parse_limits():
+    assert dispatcher.parse_limits("speedtest:1, /update:2,bad") == {'speedtest': 1, 'update': 2}
+
+def test_slow_command_does_not_block_others(telegram, running_bot):
+    d, bot, thread = running_bot
+
+    @bot.message_handler(commands=['slow'])
+    def slow(message):
+        time.sleep(0.8)
+        bot.send_message(message.chat.id, "slow done")
+
+    @bot.message_handler(commands=['fast'])
+    def fast(message):
+        bot.send_message(message.chat.id, "fast done")
+
+    thread.start()
+    assert d.wait_ready(2)
+    telegram.push_message("/slow")
+    telegram.push_message("/fast")
+
+    assert wait_for(lambda: len(telegram.sent('sendMessage')) == 2)
+    texts = [p['text'] for _, p in telegram.sent('sendMessage')]
+    assert texts == ["fast done", "slow done"]
+
+def test_per_command_limit_queues_excess(telegram, running_bot):
+    d, bot, thread = running_bot
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    @bot.message_handler(commands=['slow'])
+    def slow(message):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.1)
+        with lock:
+            active[0] -= 1
+
+    thread.start()
+    assert d.wait_ready(2)
+    for _ in range(3):
+        telegram.push_message("/slow")
+
+    assert wait_for(lambda: d.stats().get('slow', {}).get('done') == 3)
+    stats = d.stats()['slow']
+    assert peak[0] == 1            # limit of 1 respected
+    assert stats['max_queued'] >= 2
+    assert stats['queued'] == 0 and stats['running'] == 0
+    assert d.queue_depth() == 0
+
+def test_handler_errors_are_counted(telegram, running_bot):
+    d, bot, thread = running_bot
+
+    @bot.message_handler(commands=['boom'])
+    def boom(message):
+        raise RuntimeError("boom")
+
+    thread.start()
+    assert d.wait_ready(2)
+    telegram.push_message("/boom")
+    assert wait_for(lambda: d.stats().get('boom', {}).get('failed') == 1)
+
+def test_failed_polls_still_count_as_progress():
+    d = dispatcher.CommandDispatcher(workers=1)
+    bot = dispatcher.DispatchingBot("123:TEST", d)
+    attempts = []
+    def offline(**kwargs):
+        attempts.append(time.monotonic())
+        raise ConnectionError("network is unreachable")
+    bot.get_updates = offline
+    thread = threading.Thread(target=d.run, args=(bot,), daemon=True)
+    thread.start()
+    try:
+        assert wait_for(lambda: attempts)
+        assert wait_for(lambda: d.last_poll is not None)
+        assert d.last_poll >= attempts[0]
+    finally:
+        d.stop()
+        thread.join(timeout=5)
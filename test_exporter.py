@@ -0,0 +1,74 @@
+import gzip
+import urllib.request
+import pytest
+import exporter
+
+def test_render_text_format():
+    body = exporter.render([
+        ('cpu_percent', 'gauge', "CPU utilisation", [({}, 12.5)]),
+        ('throttle_flag', 'gauge', "bits", [({'flag': 'under_voltage'}, True), ({'flag': 'x"y'}, False)]),
+        ('missing', 'gauge', "skipped", [({}, None)]),
+    ]).decode()
+    assert body == (
+        '# HELP raspibot_cpu_percent CPU utilisation\n'
+        '# TYPE raspibot_cpu_percent gauge\n'
+        'raspibot_cpu_percent 12.5\n'
+        '# HELP raspibot_throttle_flag bits\n'
+        '# TYPE raspibot_throttle_flag gauge\n'
+        'raspibot_throttle_flag{flag="under_voltage"} 1\n'
+        'raspibot_throttle_flag{flag="x\\"y"} 0\n'
+    )
+
+def test_family_builders():
+    sample = {'timestamp': 100.0, 'cpu': 1.0, 'ram': 2.0, 'disk': 3.0, 'temp': 45.0}
+    assert len(exporter.sample_families(sample)) == 6
+    assert 'fan_duty_percent' not in exporter.render(exporter.sample_families(sample)).decode() # no fan control
+    sample['fan'] = 40.0
+    assert 'raspibot_fan_duty_percent 40.0' in exporter.render(exporter.sample_families(sample)).decode()
+    assert exporter.sample_families(None) == []
+    diag = {'throttle_flags': {'under_voltage': True}, 'volts': {'core': 1.2}, 'clocks': {'arm': 1500000000}}
+    body = exporter.render(exporter.throttle_families(diag)).decode()
+    assert 'raspibot_voltage_volts{rail="core"} 1.2' in body
+    assert 'raspibot_clock_hertz{domain="arm"} 1500000000' in body
+    stats = {'report': {'queued': 0, 'running': 0, 'done': 3, 'failed': 1, 'max_queued': 1,
+                        'last_latency': 0.25, 'total_time': 0.9}}
+    body = exporter.render(exporter.command_families(stats)).decode()
+    assert 'raspibot_commands_total{command="report",status="failed"} 1' in body
+    assert 'raspibot_command_last_latency_seconds{command="report"} 0.25' in body
+
+@pytest.fixture
+def server():
+    exp = exporter.MetricsExporter(host='127.0.0.1', port=0)
+    assert exp.start()
+    yield exp
+    exp.stop()
+
+def _get(exp, path='/metrics', headers=None):
+    url = f"http://127.0.0.1:{exp.address[1]}{path}"
+    return urllib.request.urlopen(urllib.request.Request(url, headers=headers or {}), timeout=2)
+
+def test_scrape_serves_prepared_body(server):
+    calls = []
+    server.add_collector(lambda: calls.append(1) or [('cpu_percent', 'gauge', "CPU", [({}, 50.0)])])
+    server.update({'cpu': 50.0})
+    for _ in range(3):
+        response = _get(server)
+        assert response.headers['Content-Type'] == exporter.CONTENT_TYPE
+        assert b'raspibot_cpu_percent 50.0' in response.read()
+    assert len(calls) == 1 # collectors ran once, not per scrape
+    assert server.scrapes == 3
+
+def test_gzip_and_404(server):
+    server.add_collector(lambda: [('up', 'gauge', "up", [({}, 1)])])
+    server.update()
+    response = _get(server, headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.read()) == server.payload()
+    with pytest.raises(urllib.error.HTTPError):
+        _get(server, '/other')
+
+def test_failing_collector_does_not_break_update(server):
+    server.add_collector(lambda: 1 / 0)
+    server.add_collector(lambda: [('up', 'gauge', "up", [({}, 1)])])
+    server.update()
+    assert b'raspibot_up 1' in server.payload()
@@ -0,0 +1,114 @@
+import time
+from unittest.mock import patch
+import pytest
+import hardware
+import fan
+from mock_hardware import MockPWMOutputDevice, MockThermalModel
+
+CURVE = fan.parse_curve("50:0,60:40,70:70,75:100")
+
+@pytest.fixture
+def hal():
+    with patch('hardware.GPIO_AVAILABLE', False):
+        yield hardware.HardwareManager()
+
+def make(hal, **kwargs):
+    options = dict(pin=18, curve=CURVE, hysteresis=4, interval=2, min_delta=0.05, min_duty=0.25,
+                   read_temperature=lambda: 40.0)
+    options.update(kwargs)
+    return fan.FanController(hal, **options)
+
+def test_parse_curve():
+    assert CURVE == [(50.0, 0.0), (60.0, 0.4), (70.0, 0.7), (75.0, 1.0)]
+    assert fan.parse_curve("70:100,bogus,40:0") == [(40.0, 0.0), (70.0, 1.0)]
+
+@pytest.mark.parametrize("temp,duty", [(30, 0.0), (50, 0.0), (55, 0.2), (60, 0.4), (72.5, 0.85), (90, 1.0)])
+def test_curve_duty(temp, duty):
+    assert fan.curve_duty(CURVE, temp) == pytest.approx(duty)
+
+def test_drives_pwm_pin(hal):
+    controller = make(hal)
+    assert controller.update(65.0) == pytest.approx(0.55)
+    device = hal._devices[fan.DEVICE_NAME]
+    assert isinstance(device, MockPWMOutputDevice)
+    assert device.pin == 18 and device.value == pytest.approx(0.55)
+    assert controller.duty_percent() == 55.0
+
+def test_min_duty_and_off(hal):
+    controller = make(hal)
+    assert controller.update(52.0) == 0.25 # 8% would stall the fan
+    assert controller.update(40.0) == 0.0  # off is always written
+
+def test_hysteresis(hal):
+    controller = make(hal)
+    controller.update(65.0)
+    assert controller.update(62.0) == pytest.approx(0.55) # curve(66) >= 0.55: hold
+    assert controller.update(58.0) == pytest.approx(0.46) # falls to curve(62), not curve(58)
+    assert controller.update(66.0) == pytest.approx(0.58) # rising follows the curve
+
+def test_no_chatter_on_small_changes(hal):
+    controller = make(hal, hysteresis=0)
+    for temp in [65.0, 65.5, 64.6, 65.4, 64.8] * 10:
+        controller.update(temp)
+    assert controller.writes == 1
+    assert controller.updates == 50
+
+def test_closed_loop_with_thermal_model(hal):
+    model = MockThermalModel()
+    controller = make(hal, read_temperature=lambda: model.temperature)
+    duties = []
+    for second in range(1800):
+        if second % controller.interval == 0:
+            controller.update()
+        model.step(1, hal.get_pin_state(fan.DEVICE_NAME) or 0.0)
+        duties.append(controller.duty)
+    # Uncontrolled this load settles near 100°C
+    assert 55 < model.temperature < 65
+    assert max(duties[-300:]) - min(duties[-300:]) < 0.1 # settled, not oscillating
+    assert controller.writes < controller.updates / 10
+
+def test_background_loop(hal):
+    controller = make(hal, interval=0.01, read_temperature=lambda: 80.0)
+    controller.start()
+    try:
+        deadline = time.monotonic() + 2
+        while controller.updates < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        controller.stop()
+    assert controller.updates >= 3
+    assert controller.writes == 1
+    assert hal.get_pin_state(fan.DEVICE_NAME) == 1.0
+
+def test_disabled_without_pin(hal):
+    controller = make(hal, pin=0)
+    controller.start()
+    assert not controller.enabled and controller._thread is None
+
+def test_failed_read_holds_duty_then_goes_full(hal):
+    readings = [80.0, None, 0.0, float('nan')]
+    controller = make(hal, read_temperature=lambda: readings.pop(0))
+    assert controller.update() == 1.0
+    assert controller.update() == 1.0 # None: hold
+    assert controller.update() == 1.0 # 0.0 (old error value): hold, never switch off
+    assert controller.writes == 1 and controller.failed_reads == 2
+    controller.update(66.0)
+    held = controller.duty
+    assert held < 1.0 and controller.failed_reads == 0
+    assert controller.update() == held # NaN: hold
+
+def test_read_errors_never_turn_the_fan_off(hal):
+    def broken():
+        raise OSError("sensor gone")
+    controller = make(hal, read_temperature=broken)
+    assert controller.update() == 1.0 # no good reading yet: full speed
+    readings = iter([80.0])
+    controller.read_temperature = lambda: next(readings)
+    controller.update()
+    controller.update(66.0)
+    held = controller.duty
+    controller.read_temperature = broken
+    assert [controller.update() for _ in range(fan.MAX_FAILED_READS - 1)] == [held] * (fan.MAX_FAILED_READS - 1)
+    assert controller.update() == 1.0 # still failing: fail safe
+    assert hal.get_pin_state(fan.DEVICE_NAME) == 1.0
+    assert controller.update(200.0) == 1.0 # implausible readings are bad readings too
@@ -0,0 +1,168 @@
+import time
+import socket
+import pytest
+import fleet
+
+TOKEN = 's3cret'
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+@pytest.fixture
+def collector():
+    received = []
+    c = fleet.FleetCollector(host='127.0.0.1', port=0, token=TOKEN, timeout=2,
+                             on_sample=lambda host, sample: received.append((host, sample)))
+    assert c.start()
+    c.received = received
+    yield c
+    c.stop()
+
+@pytest.fixture
+def agents(collector):
+    started = []
+
+    def make(name, token=TOKEN, **kw):
+        agent = fleet.FleetAgent(host='127.0.0.1', port=collector.address[1], name=name, token=token,
+                                 batch_interval=0.05, **kw)
+        agent.start()
+        started.append(agent)
+        return agent
+    yield make
+    for agent in started:
+        agent.stop()
+
+def test_channel_roundtrip_compresses_stream():
+    a, b = socket.socketpair()
+    sender, receiver = fleet.Channel(a), fleet.Channel(b)
+    batch = {'type': 'metrics', 'samples': [{'timestamp': 1.0 + i, 'cpu': 12.5, 'ram': 40.1, 'disk': 60.0,
+                                             'temp': 48.3} for i in range(20)]}
+    for _ in range(5):
+        sender.send(batch)
+        assert receiver.recv() == batch
+    assert sender.bytes_sent < sender.raw_sent / 5
+    sender.close()
+    with pytest.raises(ConnectionError):
+        receiver.recv()
+    receiver.close()
+
+def test_agents_push_samples(collector, agents):
+    one, two = agents('pi-one'), agents('pi-two')
+    assert wait_until(lambda: one.connected and two.connected)
+    for i in range(3):
+        one.push({'timestamp': i, 'cpu': 10.0 + i})
+    two.push({'timestamp': 0, 'cpu': 99.0})
+    assert wait_until(lambda: len(collector.received) == 4)
+    hosts = {h['name']: h for h in collector.hosts()}
+    assert hosts['pi-one']['latest']['cpu'] == 12.0
+    assert hosts['pi-one']['samples'] == 3
+    assert hosts['pi-two']['connected']
+    assert [s['cpu'] for h, s in collector.received if h == 'pi-one'] == [10.0, 11.0, 12.0]
+
+def test_fan_out_runs_concurrently_and_merges(collector, agents):
+    for name in ('a', 'b', 'c'):
+        agent = agents(name)
+        agent.add_handler('report', lambda name=name: time.sleep(0.3) or {'host': name})
+    assert wait_until(lambda: sum(h['connected'] for h in collector.hosts()) == 3)
+    start = time.monotonic()
+    results, errors = collector.fan_out('report')
+    assert time.monotonic() - start < 0.8
+    assert results == {'a': {'host': 'a'}, 'b': {'host': 'b'}, 'c': {'host': 'c'}}
+    assert errors == {}
+
+def test_fan_out_reports_errors_and_timeouts(collector, agents):
+    agents('ok').add_handler('top', lambda sort='cpu', limit=5: [{'pid': 1, 'sort': sort, 'limit': limit}])
+    agents('slow').add_handler('top', lambda **kw: time.sleep(1) or [])
+    agents('broken').add_handler('top', lambda **kw: 1 / 0)
+    assert wait_until(lambda: sum(h['connected'] for h in collector.hosts()) == 3)
+    results, errors = collector.fan_out('top', timeout=0.3, sort='mem', limit=3)
+    assert results == {'ok': [{'pid': 1, 'sort': 'mem', 'limit': 3}]}
+    assert errors['slow'] == 'timeout'
+    assert 'division by zero' in errors['broken']
+    _, errors = collector.fan_out('top', hosts=['missing'])
+    assert 'not connected' in errors['missing']
+
+def test_bad_token_rejected(collector, agents):
+    agent = agents('intruder', token='wrong')
+    time.sleep(0.3)
+    assert not agent.connected
+    assert collector.hosts() == []
+
+def test_agent_reconnects_and_keeps_samples(collector, agents):
+    agent = agents('pi', batch_size=1000)
+    assert wait_until(lambda: agent.connected)
+    first = agent.channel
+    # Drop the connection from the collector side
+    collector._hosts['pi'].channel.close()
+    assert wait_until(lambda: agent.channel is not None and agent.channel is not first)
+    agent.push({'timestamp': 1, 'cpu': 5.0})
+    assert wait_until(lambda: collector.hosts()[0]['connected'] and collector.hosts()[0]['samples'] == 1,
+                      timeout=5)
+
+def test_corrupt_frame_closes_connection_quietly(collector, capsys):
+    sock = socket.create_connection(collector.address)
+    sock.settimeout(5)
+    garbage = b'not a zlib stream'
+    sock.sendall(fleet.struct.pack('!I', len(garbage)) + garbage)
+    assert sock.recv(1) == b'' # collector hung up
+    sock.close()
+    assert 'Traceback' not in capsys.readouterr().err
+
+def test_silent_client_dropped_after_handshake_timeout():
+    c = fleet.FleetCollector(host='127.0.0.1', port=0, token=TOKEN, handshake_timeout=0.2)
+    assert c.start()
+    sock = socket.create_connection(c.address)
+    sock.settimeout(5)
+    try:
+        start = time.monotonic()
+        assert sock.recv(1) == b''
+        assert time.monotonic() - start < 2
+        # Connected agents are not held to the handshake timeout
+        agent = fleet.FleetAgent(host='127.0.0.1', port=c.address[1], name='pi-idle', token=TOKEN,
+                                 batch_interval=0.05)
+        agent.start()
+        assert wait_until(lambda: agent.connected)
+        time.sleep(0.5)
+        assert agent.connected and [h['name'] for h in c.hosts()] == ['pi-idle']
+        agent.stop()
+    finally:
+        sock.close()
+        c.stop()
+
+@pytest.mark.parametrize("after_welcome", [False, True])
+def test_non_object_frame_closes_connection_quietly(collector, capsys, after_welcome):
+    sock = socket.create_connection(collector.address)
+    sock.settimeout(5)
+    channel = fleet.Channel(sock)
+    if after_welcome:
+        channel.send({'type': 'hello', 'host': 'pi-list', 'token': TOKEN})
+        assert channel.recv() == {'type': 'welcome'}
+    channel.send([1, 2, 3])
+    assert sock.recv(1) == b''
+    sock.close()
+    assert 'Traceback' not in capsys.readouterr().err
+    if after_welcome:
+        assert wait_until(lambda: not collector.hosts()[0]['connected'])
+
+def test_channel_rejects_non_object_frames():
+    a, b = socket.socketpair()
+    sender, receiver = fleet.Channel(a), fleet.Channel(b)
+    sender.send("just a string")
+    with pytest.raises(ValueError, match="malformed frame"):
+        receiver.recv()
+    sender.close()
+    receiver.close()
+
+def test_agent_answers_request_without_id():
+    a, b = socket.socketpair()
+    agent = fleet.FleetAgent(host='127.0.0.1', port=1, name='pi', token=TOKEN)
+    agent.add_handler('ping', lambda: 'pong')
+    agent._answer(fleet.Channel(a), {'type': 'request', 'query': 'ping'})
+    assert fleet.Channel(b).recv() == {'type': 'response', 'id': None, 'result': 'pong'}
+    a.close()
+    b.close()
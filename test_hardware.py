@@ -1,3 +1,5 @@
+import time
+import threading
 import pytest
 from unittest.mock import MagicMock, patch
 import hardware
@@ -40,6 +42,43 @@ def test_vcgencmd_mock(hal):
         assert '0x0 (Mock)' in data['throttled']
     else:
         # If we are somehow in real mode on a Pi, this calls subprocess
-        with patch('subprocess.check_output', return_value=b'throttled=0x0'):
+        with patch('subprocess.check_output', return_value=b'@throttled\nthrottled=0x0'):
+            hal.diagnostics.fields = ['throttled']
+            hal.diagnostics.sysfs_root = '/nonexistent'
             data = hal.get_pi_diagnostics()
             assert data['throttled'] == '0x0'
+
+def test_cpu_temp_reuses_sensor(hal):
+    hal.get_cpu_temperature()
+    sensor = hal._temp_sensor
+    hal.get_cpu_temperature()
+    assert hal._temp_sensor is sensor
+
+def test_thermal_zones_mock(hal):
+    zones = hal.get_thermal_zones()
+    assert isinstance(zones['cpu-thermal'], float)
+
+def test_cpu_temp_initialised_once_across_threads(hal):
+    created = []
+    original = hal._init_temperature
+    def slow_init():
+        created.append(1)
+        time.sleep(0.05) # widen the race window
+        original()
+    hal._init_temperature = slow_init
+    threads = [threading.Thread(target=hal.get_cpu_temperature) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(created) == 1
+
+def test_cpu_temp_failure_is_none(hal):
+    hal.get_cpu_temperature()
+    class Broken:
+        @property
+        def temperature(self):
+            raise OSError("sensor gone")
+    hal.thermal, hal._temp_sensor = None, Broken()
+    assert hal.get_cpu_temperature() is None
+    assert hal.get_thermal_zones() == {}
@@ -0,0 +1,91 @@
+import sys
+import time
+import threading
+import subprocess
+import pytest
+import health
+import bench_startup
+from mock_systemd import FakeNotifySocket
+from mock_telegram import FakeTelegramServer
+
+@pytest.fixture
+def notify_socket(tmp_path):
+    sock = FakeNotifySocket(tmp_path / "notify").start()
+    yield sock
+    sock.stop()
+
+def test_sd_notify_without_systemd(monkeypatch):
+    monkeypatch.delenv('NOTIFY_SOCKET', raising=False)
+    assert health.sd_notify("READY=1") is False
+
+def test_sd_notify_uses_env_socket(notify_socket, monkeypatch):
+    monkeypatch.setenv('NOTIFY_SOCKET', notify_socket.path)
+    assert health.sd_notify("READY=1")
+    assert notify_socket.wait_for("READY=1")
+
+def test_watchdog_interval_from_systemd(monkeypatch):
+    monkeypatch.setenv('WATCHDOG_USEC', '60000000')
+    assert health.watchdog_interval() == 30
+    monkeypatch.delenv('WATCHDOG_USEC')
+    assert health.watchdog_interval() == health.config.HEALTH_INTERVAL
+
+def test_ping_only_while_all_checks_progress(notify_socket):
+    progress = {'poller': time.monotonic(), 'sampler': time.monotonic()}
+    monitor = health.HealthMonitor(interval=1, notify_socket=notify_socket.path)
+    monitor.register('poller', lambda: progress['poller'], max_age=5)
+    monitor.register('sampler', lambda: progress['sampler'], max_age=5)
+    assert monitor.tick()
+    assert notify_socket.wait_for("WATCHDOG=1")
+
+    progress['sampler'] -= 10 # stalled
+    assert not monitor.tick()
+    status = monitor.status()
+    assert not status['healthy']
+    assert status['checks']['sampler']['ok'] is False
+    assert status['checks']['poller']['ok'] is True
+    assert notify_socket.wait_for("STATUS=Stalled: sampler")
+    assert (monitor.pings, monitor.withheld) == (1, 1)
+
+def test_dead_thread_fails_check():
+    worker = threading.Thread(target=lambda: None)
+    worker.start()
+    worker.join()
+    monitor = health.HealthMonitor(interval=1)
+    monitor.register('db_writer', time.monotonic, max_age=5, thread=lambda: worker)
+    assert monitor.status()['checks']['db_writer'] == pytest.approx(
+        {'age': 0, 'max_age': 5, 'alive': False, 'ok': False}, abs=0.1)
+
+def test_grace_period_before_first_progress():
+    monitor = health.HealthMonitor(interval=1)
+    monitor.register('poller', lambda: None, max_age=5)
+    monitor.gauges['loop_lag'] = lambda: 0.002
+    status = monitor.status()
+    assert status['healthy']
+    assert status['loop_lag'] == 0.002
+
+def test_ready_after_wait_for(notify_socket):
+    ready = threading.Event()
+    monitor = health.HealthMonitor(interval=0.05, notify_socket=notify_socket.path)
+    monitor.start(wait_for=ready.wait)
+    time.sleep(0.1)
+    assert notify_socket.states() == []
+    ready.set()
+    assert notify_socket.wait_for("READY=1")
+    assert notify_socket.wait_for("WATCHDOG=1")
+    monitor.stop()
+    assert notify_socket.wait_for("STOPPING=1")
+
+def test_bot_notifies_systemd(tmp_path, notify_socket):
+    server = FakeTelegramServer(poll_wait=0.2).start()
+    env = bench_startup.bot_env(str(tmp_path))
+    env.update(NOTIFY_SOCKET=notify_socket.path, WATCHDOG_USEC='200000')
+    proc = subprocess.Popen([sys.executable, '-c', bench_startup.LAUNCHER, server.api_url], env=env,
+                            cwd=tmp_path, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        assert notify_socket.wait_for("READY=1", timeout=20)
+        assert notify_socket.wait_for("WATCHDOG=1", timeout=5)
+        assert server.sent('getUpdates')
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+        server.stop()
@@ -0,0 +1,77 @@
+import pytest
+import sys
+import time
+import threading
+import jobs
+import database
+
+@pytest.fixture
+def db(tmp_path):
+    original_db = database.config.DB_FILE
+    database.config.DB_FILE = str(tmp_path / "jobs.db")
+    db = database.DatabaseManager()
+    yield db
+    db.close()
+    database.config.DB_FILE = original_db
+
+def run_and_wait(manager, command, **kwargs):
+    done = threading.Event()
+    job = manager.start("test", command, on_done=lambda j: done.set(), **kwargs)
+    assert done.wait(10)
+    return job
+
+def test_job_output_is_stored_compressed(db):
+    manager = jobs.JobManager(db, update_interval=0)
+    job = run_and_wait(manager, [sys.executable, "-c", "for i in range(200): print('line', i)"])
+    assert job.status == 'DONE'
+    assert job.exit_code == 0
+    assert job.lines == 200
+    assert len(job.tail) == jobs.config.JOB_TAIL_LINES
+    assert job.tail[-1] == "line 199"
+
+    stored = db.get_job(job.id)
+    assert stored['status'] == 'DONE'
+    assert stored['output'].splitlines()[0] == "line 0"
+    assert len(stored['output'].splitlines()) == 200
+
+def test_progress_updates_are_throttled(db):
+    manager = jobs.JobManager(db, update_interval=0.2)
+    updates = []
+    script = "import time\nfor i in range(20):\n    print(i, flush=True)\n    time.sleep(0.03)"
+    done = threading.Event()
+    manager.start("test", [sys.executable, "-c", script],
+                  on_progress=lambda j: updates.append(j.lines), on_done=lambda j: done.set())
+    assert done.wait(10)
+    # ~0.6s of output at one update per 0.2s, instead of one per line
+    assert 2 <= len(updates) <= 5
+
+def test_failed_exit_code(db):
+    job = run_and_wait(jobs.JobManager(db), [sys.executable, "-c", "import sys; print('x'); sys.exit(3)"])
+    assert job.status == 'FAILED'
+    assert job.exit_code == 3
+
+def test_missing_command_fails_cleanly(db):
+    job = run_and_wait(jobs.JobManager(db), ["/nonexistent/command"])
+    assert job.status == 'FAILED'
+    assert "Failed to start" in db.get_job(job.id)['output']
+
+def test_cancel_running_job(db):
+    manager = jobs.JobManager(db)
+    done = threading.Event()
+    job = manager.start("sleep", "echo start; sleep 30", shell=True, on_done=lambda j: done.set())
+    time.sleep(0.2)
+    success, _ = manager.cancel(job.id)
+    assert success
+    assert done.wait(5)
+    assert job.status == 'CANCELLED'
+    assert manager.cancel(job.id)[0] is False
+    assert manager.cancel("nope") == (False, "Job not found")
+
+def test_timeout_kills_job(db):
+    job = run_and_wait(jobs.JobManager(db, timeout=0.3), "sleep 30", shell=True)
+    assert job.status == 'TIMEOUT'
+
+def test_list_jobs(db):
+    manager = jobs.JobManager(db)
+    job = run_and_wait(manager, ["true"])
+    assert manager.list() == [job]
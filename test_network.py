@@ -1,5 +1,8 @@
 import pytest
 from unittest.mock import MagicMock, patch
+import time
+from threading import Thread
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import network
 import config
 
@@ -19,16 +22,81 @@ def test_get_local_ip_failure():
         ip = network.get_local_ip()
         assert ip == "127.0.0.1"
 
-def test_get_public_ip():
-    with patch('requests.get') as mock_get:
-        mock_get.return_value.text = "203.0.113.1"
-        ip = network.get_public_ip()
-        assert ip == "203.0.113.1"
+class _IPHandler(BaseHTTPRequestHandler):
+    # Local stand-in for ipify-style providers
+    responses = {}
 
-def test_get_public_ip_failure():
-    with patch('requests.get', side_effect=Exception("API Error")):
-        ip = network.get_public_ip()
-        assert ip == "Unknown"
+    def do_GET(self):
+        delay, body = self.responses.get(self.path, (0, None))
+        time.sleep(delay)
+        if body is None:
+            self.send_response(500)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def ip_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _IPHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    _IPHandler.responses = {}
+    yield f"http://127.0.0.1:{server.server_address[1]}", _IPHandler.responses
+    server.shutdown()
+    server.server_close()
+
+def test_get_public_ip(ip_server):
+    base, responses = ip_server
+    responses['/ip'] = (0, "203.0.113.1\n")
+    resolver = network.PublicIPResolver(providers=[base + '/ip'], ttl=60)
+    with patch.object(network, 'public_ip', resolver):
+        assert network.get_public_ip() == "203.0.113.1"
+
+def test_get_public_ip_failure(ip_server):
+    base, responses = ip_server
+    resolver = network.PublicIPResolver(providers=[base + '/missing'], ttl=60, timeout=1)
+    with patch.object(network, 'public_ip', resolver):
+        assert network.get_public_ip() == "Unknown"
+
+def test_public_ip_first_valid_provider_wins(ip_server):
+    base, responses = ip_server
+    responses['/slow'] = (1.5, "198.51.100.9")
+    responses['/html'] = (0, "<html>rate limited</html>")
+    responses['/fast'] = (0.05, "203.0.113.7")
+    resolver = network.PublicIPResolver(providers=[base + '/slow', base + '/html', base + '/fast'], ttl=60)
+    start = time.monotonic()
+    assert resolver.get() == "203.0.113.7"
+    assert time.monotonic() - start < 1.0
+
+def test_public_ip_is_cached_within_ttl(ip_server):
+    base, responses = ip_server
+    responses['/ip'] = (0, "203.0.113.1")
+    resolver = network.PublicIPResolver(providers=[base + '/ip'], ttl=60)
+    resolver.get()
+    responses['/ip'] = (0, "203.0.113.2")
+    assert resolver.get() == "203.0.113.1"
+
+def test_public_ip_stale_while_revalidate_and_change_event(ip_server):
+    base, responses = ip_server
+    responses['/ip'] = (0, "203.0.113.1")
+    resolver = network.PublicIPResolver(providers=[base + '/ip'], ttl=0)
+    changes = []
+    resolver.add_listener(lambda old, new: changes.append((old, new)))
+    resolver.get()
+
+    responses['/ip'] = (0, "203.0.113.2")
+    # Stale value is served immediately, refresh happens in the background
+    assert resolver.get() == "203.0.113.1"
+    for _ in range(50):
+        if changes:
+            break
+        time.sleep(0.02)
+    assert changes == [("203.0.113.1", "203.0.113.2")]
+    assert resolver.ip == "203.0.113.2"
 
 def test_speedtest():
     with patch('subprocess.check_output') as mock_sub:
@@ -0,0 +1,122 @@
+import pytest
+import time
+import threading
+from concurrent.futures import Future
+from unittest.mock import MagicMock
+import telebot
+from telebot.apihelper import ApiTelegramException
+import outbox
+from mock_telegram import FakeTelegramServer
+
+@pytest.fixture
+def scheduler():
+    s = outbox.MessageScheduler(chat_rate=20, chat_burst=1, global_rate=100)
+    yield s
+    s.stop()
+
+def flood_error(retry_after=0.1):
+    return ApiTelegramException("sendMessage", MagicMock(), {
+        'error_code': 429, 'description': 'Too Many Requests', 'parameters': {'retry_after': retry_after}})
+
+def test_token_bucket():
+    bucket = outbox.TokenBucket(rate=10, burst=2)
+    now = time.monotonic()
+    assert bucket.wait_time(now) == 0
+    bucket.take()
+    bucket.take()
+    assert bucket.wait_time(now) == pytest.approx(0.1, abs=0.01)
+
+def test_per_chat_pacing(scheduler):
+    sent = []
+    futures = [scheduler.submit(lambda i=i: sent.append((i, time.monotonic())), 1) for i in range(4)]
+    for f in futures:
+        f.result(timeout=2)
+    gaps = [b[1] - a[1] for a, b in zip(sent, sent[1:])]
+    # 20 msg/s per chat with burst 1 -> ~50ms apart, in order
+    assert [i for i, _ in sent] == [0, 1, 2, 3]
+    assert min(gaps) >= 0.04
+
+def test_alerts_jump_the_queue():
+    s = outbox.MessageScheduler(chat_rate=5, chat_burst=1, global_rate=100)
+    order = []
+    gate = threading.Event()
+    s.submit(gate.wait, 1) # occupies the worker
+    routine = [s.submit(order.append, 1, f"routine{i}") for i in range(3)]
+    alert = s.submit(order.append, 1, "ALERT", priority=outbox.ALERT)
+    gate.set()
+    alert.result(timeout=2)
+    for f in routine:
+        f.result(timeout=2)
+    s.stop()
+    assert order[0] == "ALERT"
+
+def test_successive_edits_are_merged(scheduler):
+    sent = []
+    gate = threading.Event()
+    scheduler.submit(gate.wait, 1)
+    futures = [scheduler.submit(sent.append, 1, f"v{i}", merge_key=('edit', 1, 7)) for i in range(5)]
+    gate.set()
+    for f in futures:
+        f.result(timeout=2)
+    assert sent == ["v4"]
+    assert scheduler.stats['merged'] == 4
+
+def test_retry_after_429(scheduler):
+    calls = []
+
+    def flaky():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise flood_error(0.2)
+        return "ok"
+
+    assert scheduler.submit(flaky, 1).result(timeout=3) == "ok"
+    assert calls[1] - calls[0] >= 0.19
+    assert scheduler.stats['retried'] == 1
+
+def test_other_errors_propagate(scheduler):
+    with pytest.raises(ValueError):
+        scheduler.call(MagicMock(side_effect=ValueError("bad")), 1)
+
+def test_mixin_does_not_block_on_flood_wait():
+    class Api(telebot.TeleBot):
+        def send_message(self, chat_id, text, **kwargs):
+            return text
+
+    class Bot(outbox.OutboxMixin, Api):
+        pass
+
+    bot = Bot("123:TEST", threaded=False)
+    bot.outbox = outbox.MessageScheduler(chat_rate=5, chat_burst=1, global_rate=100)
+    bot.outbox._bucket(42).blocked_until = time.monotonic() + 0.5 # as after a 429 retry_after
+    try:
+        start = time.monotonic()
+        future = bot.send_message(42, "alert", priority=outbox.ALERT)
+        assert time.monotonic() - start < 0.1
+        assert not future.done()
+        assert future.result(timeout=2) == "alert"
+    finally:
+        bot.outbox.stop()
+
+def test_bot_mixin_against_fake_api():
+    server = FakeTelegramServer(chat_interval=0.05).start()
+    original = telebot.apihelper.API_URL
+    telebot.apihelper.API_URL = server.api_url
+
+    class Bot(outbox.OutboxMixin, telebot.TeleBot):
+        pass
+
+    bot = Bot("123:TEST", threaded=False)
+    bot.outbox = outbox.MessageScheduler(chat_rate=15, chat_burst=1, global_rate=100)
+    try:
+        queued = [bot.send_message(42, f"hello {i}") for i in range(4)]
+        assert all(isinstance(f, Future) for f in queued) # fire and forget by default
+        msg = bot.send_message(42, "hello 4", wait=True)
+        assert msg.message_id > 0
+        assert bot.edit_message_text("edited", 42, msg.message_id, wait=True).text == "edited"
+        assert len(server.sent('sendMessage')) == 5
+        assert server.flood_errors == 0
+    finally:
+        bot.outbox.stop()
+        telebot.apihelper.API_URL = original
+        server.stop()
@@ -0,0 +1,116 @@
+import time
+from unittest.mock import patch
+import pytest
+import hardware
+import pins
+from mock_hardware import MockPWMOutputDevice
+
+PINS = "relay1=17,fan=18:pwm,bad=x"
+
+@pytest.fixture
+def hal():
+    with patch('hardware.GPIO_AVAILABLE', False):
+        yield hardware.HardwareManager()
+
+@pytest.fixture
+def gpio(hal):
+    controller = pins.GpioController(hal, pins.parse_pins(PINS), ramp_step=0.01)
+    yield controller
+    controller.close()
+
+def wait_idle(controller, timeout=2):
+    deadline = time.monotonic() + timeout
+    while controller.active() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert not controller.active()
+
+def test_parse_pins():
+    registry = pins.parse_pins(PINS)
+    assert set(registry) == {'relay1', 'fan'}
+    assert registry['fan'].number == 18 and registry['fan'].pwm
+    assert not registry['relay1'].pwm
+
+def test_parse_command_groups_steps():
+    registry = pins.parse_pins(PINS)
+    steps, duration = pins.parse_command(registry, ["relay1=on", "fan=40%", "wait=0.5", "relay1=off"])
+    assert [offset for offset, _ in steps] == [0, 0.5]
+    assert [(p.name, v) for p, v in steps[0][1]] == [('relay1', True), ('fan', 0.4)]
+    assert duration == 0.5
+    steps, _ = pins.parse_command(registry, ["18", "on"]) # v3.0 form, by BCM number
+    assert steps == [(0, [(registry['fan'], 1.0)])]
+
+@pytest.mark.parametrize("args", [
+    ["gpio4=on"],            # not whitelisted
+    ["relay1=0.5"],          # duty cycle on a digital pin
+    ["fan=1.5"],
+    ["relay1=on/2"],         # ramp on a digital pin
+    ["wait=-1"],
+    ["relay1"],
+    ["relay1=on", "wait=3601"],
+])
+def test_parse_command_rejects(args):
+    with pytest.raises(ValueError):
+        pins.parse_command(pins.parse_pins(PINS), args)
+
+def test_invalid_command_changes_nothing(gpio, hal):
+    with pytest.raises(ValueError):
+        gpio.run(["relay1=on", "nope=on"])
+    assert gpio.states() == {'relay1': None, 'fan': None}
+    assert hal._devices == {}
+
+def test_immediate_command_applies_together(gpio, hal):
+    assert gpio.run(["relay1=on", "fan=0.4"]) == (None, 0.0)
+    assert gpio.states() == {'relay1': 1, 'fan': 0.4}
+    assert isinstance(hal._devices['fan'], MockPWMOutputDevice)
+    device = hal._devices['relay1']
+    gpio.run(["relay1=off"])
+    assert hal._devices['relay1'] is device # handle reused
+    assert set(hal._devices) == {'relay1', 'fan'}
+
+def test_setup_failure_changes_nothing(gpio, hal):
+    original = hal.setup_pin
+    def setup_pin(number, name, is_pwm=False):
+        return None if name == 'relay1' else original(number, name, is_pwm)
+    hal.setup_pin = setup_pin
+    with pytest.raises(pins.PinSetupError) as raised:
+        gpio.run(["fan=0.4", "relay1=on"])
+    assert raised.value.names == ['relay1']
+    assert str(raised.value) == "Could not set up relay1"
+    assert gpio.states() == {'relay1': None, 'fan': 0.0} # fan was set up (idle at 0) but not written
+    with pytest.raises(pins.PinSetupError):
+        gpio.run(["fan=1", "wait=1", "relay1=on"]) # later steps are checked up front too
+    assert gpio.active() == [] and gpio.states()['fan'] == 0.0
+
+def test_sequence_runs_on_time(gpio):
+    seq_id, duration = gpio.run(["relay1=on", "wait=0.05", "relay1=off"])
+    assert seq_id == 1 and duration == 0.05
+    assert gpio.states()['relay1'] == 1
+    wait_idle(gpio)
+    assert gpio.states()['relay1'] == 0
+    assert gpio.max_jitter < 0.01
+
+def test_ramp(gpio):
+    gpio.run(["fan=0.2"])
+    gpio.run(["fan=1/0.1"])
+    wait_idle(gpio)
+    assert gpio.states()['fan'] == pytest.approx(1.0)
+    assert gpio.steps_run == 1 + 10
+
+def test_new_command_supersedes_sequence(gpio):
+    gpio.run(["relay1=on", "wait=0.05", "relay1=off"])
+    gpio.run(["relay1=on"])
+    time.sleep(0.1)
+    assert gpio.states()['relay1'] == 1 # the queued 'off' was dropped
+    assert gpio.active() == []
+
+def test_stop(gpio):
+    gpio.run(["fan=1/5"])
+    assert gpio.stop() == 1
+    assert gpio.active() == []
+
+def test_close_releases_devices(gpio, hal):
+    gpio.run(["relay1=on", "fan=on"])
+    devices = list(hal._devices.values())
+    gpio.close()
+    assert hal._devices == {}
+    assert all(device.closed for device in devices)
@@ -0,0 +1,32 @@
+import pytest
+import time
+import report
+
+def test_collectors_run_concurrently():
+    rc = report.ReportCollector(max_workers=4)
+    for name in ('a', 'b', 'c'):
+        rc.add(name, lambda n=name: time.sleep(0.2) or n, timeout=2)
+    start = time.monotonic()
+    result = rc.collect()
+    assert time.monotonic() - start < 0.5
+    assert result['values'] == {'a': 'a', 'b': 'b', 'c': 'c'}
+    assert result['errors'] == {}
+    assert set(result['timings']) == {'a', 'b', 'c'}
+
+def test_slow_collector_yields_partial_result():
+    rc = report.ReportCollector(max_workers=2)
+    rc.add('fast', lambda: 42, timeout=1)
+    rc.add('slow', lambda: time.sleep(1) or 'late', timeout=0.1)
+    start = time.monotonic()
+    result = rc.collect()
+    assert time.monotonic() - start < 0.5
+    assert result['values'] == {'fast': 42}
+    assert result['errors'] == {'slow': 'timeout'}
+    assert result['timings']['slow'] == pytest.approx(0.1)
+
+def test_failing_collector_is_reported():
+    rc = report.ReportCollector()
+    rc.add('boom', lambda: 1 / 0)
+    result = rc.collect()
+    assert 'boom' in result['errors']
+    assert result['values'] == {}
@@ -0,0 +1,52 @@
+import pytest
+import time
+from unittest.mock import MagicMock, patch
+import sampler
+
+@pytest.fixture
+def metrics_sampler():
+    db = MagicMock()
+    hal = MagicMock()
+    hal.get_cpu_temperature.return_value = 48.5
+    s = sampler.MetricsSampler(db, hal, interval=0.05)
+    yield s
+    s.stop()
+
+def test_sample_once(metrics_sampler):
+    with patch('psutil.cpu_percent', return_value=12.0), \
+         patch('psutil.virtual_memory') as vm, \
+         patch('psutil.disk_usage') as du:
+        vm.return_value.percent = 40.0
+        du.return_value.percent = 55.0
+        sample = metrics_sampler.sample_once()
+
+    assert sample['cpu'] == 12.0
+    assert sample['temp'] == 48.5
+    assert metrics_sampler.latest is sample
+    metrics_sampler.db.insert_metric.assert_called_once_with(12.0, 40.0, 55.0, 48.5, None)
+
+def test_extra_fields_are_stored(metrics_sampler):
+    metrics_sampler.add_field('fan', lambda: 40.0)
+    sample = metrics_sampler.sample_once()
+    assert sample['fan'] == 40.0
+    assert metrics_sampler.db.insert_metric.call_args[0][4] == 40.0
+
+def test_listener_errors_are_isolated(metrics_sampler):
+    seen = []
+    metrics_sampler.add_listener(MagicMock(side_effect=Exception("boom")))
+    metrics_sampler.add_listener(seen.append)
+    metrics_sampler.sample_once()
+    assert len(seen) == 1
+
+def test_collection_failure_returns_none(metrics_sampler):
+    metrics_sampler.hal.get_cpu_temperature.side_effect = Exception("no sensor")
+    assert metrics_sampler.sample_once() is None
+    metrics_sampler.db.insert_metric.assert_not_called()
+
+def test_background_thread_samples_at_fixed_rate(metrics_sampler):
+    metrics_sampler.start()
+    time.sleep(0.32)
+    metrics_sampler.stop()
+    # ~7 ticks in 0.32s at 50ms; allow for scheduler jitter
+    assert 4 <= metrics_sampler.samples_taken <= 8
+    assert not metrics_sampler.is_running()
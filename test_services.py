@@ -0,0 +1,77 @@
+import os
+import sys
+import json
+import pytest
+import services
+import system
+
+SHIM = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mock_systemctl.py')
+
+@pytest.fixture
+def systemctl(tmp_path, monkeypatch):
+    # Wrapper script so the monitor can call it like the real binary
+    path = tmp_path / 'systemctl'
+    path.write_text(f"#!/bin/sh\nexec {sys.executable} {SHIM} \"$@\"\n")
+    path.chmod(0o755)
+    state = tmp_path / 'units.json'
+    state.write_text(json.dumps({'nginx': 'failed', 'ghost': 'not-found'}))
+    monkeypatch.setenv('MOCK_SYSTEMCTL_STATE', str(state))
+    monkeypatch.setenv('MOCK_SYSTEMCTL_LOG', str(tmp_path / 'calls.log'))
+    monkeypatch.setattr(system.config, 'SYSTEMCTL_PATH', str(path))
+    monkeypatch.setattr(system.os, 'geteuid', lambda: 0) # no sudo around the fake
+    return str(path)
+
+def calls(tmp_path):
+    return (tmp_path / 'calls.log').read_text().splitlines()
+
+def test_parse_show():
+    blocks = services.parse_show("Id=a.service\nActiveState=active\n\nId=b.service\nActiveState=failed\n")
+    assert blocks == [{'Id': 'a.service', 'ActiveState': 'active'}, {'Id': 'b.service', 'ActiveState': 'failed'}]
+
+def test_all_units_in_one_spawn(systemctl, tmp_path):
+    units = ['ssh', 'cron', 'nginx', 'ghost'] + [f'svc{i}' for i in range(26)]
+    monitor = services.ServiceMonitor(units, ttl=60, binary=systemctl)
+    states = monitor.get()
+    assert monitor.spawns == 1 and len(calls(tmp_path)) == 1
+    assert list(states) == units
+    assert states['ssh']['active'] == 'active' and states['ssh']['sub'] == 'running'
+    assert states['ssh']['since'] == pytest.approx(3600, abs=60)
+    assert states['nginx']['active'] == 'failed' and states['nginx']['since'] is None
+    assert states['ghost']['loaded'] is False
+
+def test_results_are_cached(systemctl):
+    monitor = services.ServiceMonitor(['ssh'], ttl=60, binary=systemctl)
+    assert monitor.get() is monitor.get()
+    assert monitor.spawns == 1
+    monitor.get(max_age=0)
+    assert monitor.spawns == 2
+
+def test_change_detection(systemctl, tmp_path):
+    monitor = services.ServiceMonitor(['ssh', 'nginx'], ttl=0, binary=systemctl)
+    changes = []
+    monitor.add_listener(lambda unit, old, new: changes.append((unit, old, new)))
+    monitor.get()
+    assert changes == [] # first query only sets the baseline
+    (tmp_path / 'units.json').write_text(json.dumps({'ssh': 'inactive', 'nginx': 'failed'}))
+    monitor.get()
+    assert changes == [('ssh', 'active', 'inactive')]
+
+def test_restart(systemctl, tmp_path):
+    monitor = services.ServiceMonitor(['nginx', 'ghost'], ttl=60, binary=systemctl)
+    assert monitor.get()['nginx']['active'] == 'failed'
+    success, msg = monitor.restart('nginx')
+    assert success, msg
+    state = monitor.get()['nginx']
+    assert state['active'] == 'active' and state['restarts'] == 1
+    assert monitor.restart('ghost')[0] is False
+    assert monitor.restart('sshd') == (False, "'sshd' is not in SERVICES")
+
+def test_systemctl_failure(tmp_path):
+    monitor = services.ServiceMonitor(['ssh'], binary=str(tmp_path / 'missing'))
+    assert monitor.get() is None
+    assert services.ServiceMonitor([], binary='unused').get() == {}
+
+def test_format_uptime():
+    assert services.format_uptime(42) == "0m"
+    assert services.format_uptime(3725) == "1h 2m"
+    assert services.format_uptime(200000) == "2d 7h"
@@ -0,0 +1,26 @@
+import sys
+import json
+import subprocess
+import bench_startup
+
+# Time from process spawn to the first getUpdates, measured ~0.4s on a dev
+# machine (1.0s before lazy imports). Generous to absorb CI noise.
+FIRST_POLL_TARGET = 2.0
+
+HEAVY_MODULES = ('matplotlib', 'gpiozero', 'numpy')
+
+def test_entry_point_defers_heavy_imports(tmp_path):
+    code = bench_startup.LAUNCHER + f"print(__import__('json').dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    result = subprocess.run([sys.executable, '-c', code], env=bench_startup.bot_env(str(tmp_path)),
+                            cwd=tmp_path, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == []
+
+def test_import_times_are_parsed(tmp_path):
+    times = bench_startup.import_times(str(tmp_path))
+    names = [name for _, name in times]
+    assert 'dispatcher' in names
+    assert 'charts' in names
+
+def test_time_to_first_poll(tmp_path):
+    assert bench_startup.time_to_first_poll(str(tmp_path)) < FIRST_POLL_TARGET
@@ -1,5 +1,9 @@
 import pytest
 from unittest.mock import MagicMock, patch
+import os
+import time
+import threading
+import subprocess
 import system
 import psutil
 
@@ -42,4 +46,84 @@ def test_kill_process():
         assert success is False
         assert "not found" in msg
 
+def test_kill_process_rejects_reused_pid():
+    with patch('psutil.Process') as mock_proc_cls:
+        mock_proc = mock_proc_cls.return_value
+        mock_proc.create_time.return_value = 1700000100.5
+        success, msg = system.kill_process(1234, started=1700000000)
+        assert success is False
+        mock_proc.terminate.assert_not_called()
+        assert system.kill_process(1234, started=1700000100)[0] is True
+
 import subprocess
+
+def test_process_monitor_measures_cpu_deltas():
+    monitor = system.ProcessMonitor(interval=1, top_n=5)
+    monitor.sample()
+    # Burn some CPU in this process between ticks
+    end = time.monotonic() + 0.3
+    while time.monotonic() < end:
+        pass
+    monitor.sample()
+    top = monitor.top(sort='cpu', limit=5)
+    assert len(top) <= 5
+    assert os.getpid() in [p['pid'] for p in top]
+    assert top == sorted(top, key=lambda p: p['cpu'], reverse=True)
+
+def test_process_monitor_sort_keys():
+    monitor = system.ProcessMonitor(top_n=3)
+    monitor.sample()
+    mem = monitor.top(sort='mem', limit=3)
+    assert mem == sorted(mem, key=lambda p: p['mem'], reverse=True)
+    assert set(mem[0]) == {'pid', 'name', 'cpu', 'mem', 'io', 'started'}
+    with pytest.raises(ValueError):
+        monitor.top(sort='bogus')
+
+def test_process_monitor_drops_exited_processes():
+    monitor = system.ProcessMonitor()
+    monitor._procs[999999] = [MagicMock(), None, 0]
+    with patch('psutil.pids', return_value=[os.getpid()]):
+        monitor.sample()
+    assert list(monitor._procs) == [os.getpid()]
+
+def test_first_top_waits_for_the_monitor_thread():
+    monitor = system.ProcessMonitor(interval=60, top_n=5)
+    samplers = []
+    original = monitor._collect
+    def collect():
+        samplers.append(threading.current_thread())
+        return original()
+    monitor._collect = collect
+    try:
+        top = monitor.top(sort='mem', limit=5)
+        assert top and monitor.updated_at is not None
+        assert threading.current_thread() not in samplers # never sampled on the request thread
+        assert monitor.top(sort='cpu') is not None and len(samplers) == 2 # prime + first tick only
+    finally:
+        monitor.stop()
+
+def test_samples_never_overlap():
+    monitor = system.ProcessMonitor(top_n=3)
+    active, overlaps = [0], []
+    original = monitor._collect
+    def collect():
+        active[0] += 1
+        overlaps.append(active[0] > 1)
+        time.sleep(0.05)
+        try:
+            return original()
+        finally:
+            active[0] -= 1
+    monitor._collect = collect
+    threads = [threading.Thread(target=monitor.sample) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert overlaps == [False] * 4
+
+def test_get_top_processes_serves_cache():
+    with patch.object(system, 'process_monitor') as monitor:
+        monitor.top.return_value = [{'pid': 1}]
+        assert system.get_top_processes(limit=1) == [{'pid': 1}]
+        monitor.top.assert_called_once_with(sort='cpu', limit=1)
@@ -0,0 +1,53 @@
+import pytest
+import time
+import thermal
+
+@pytest.fixture
+def sysfs(tmp_path):
+    def make_zone(index, zone_type, millideg):
+        zone = tmp_path / f"thermal_zone{index}"
+        zone.mkdir()
+        (zone / "type").write_text(zone_type + "\n")
+        (zone / "temp").write_text(f"{millideg}\n")
+        return zone / "temp"
+    return tmp_path, make_zone
+
+def test_reads_all_zones(sysfs):
+    root, make_zone = sysfs
+    make_zone(0, "cpu-thermal", 47236)
+    make_zone(1, "gpu-thermal", 51000)
+    zones = thermal.ThermalZones(root=str(root))
+    assert zones.cpu_zone == "cpu-thermal"
+    assert zones.read() == pytest.approx(47.236)
+    assert zones.read_all() == {"cpu-thermal": pytest.approx(47.236), "gpu-thermal": pytest.approx(51.0)}
+    zones.close()
+
+def test_reads_reuse_open_descriptor(sysfs):
+    root, make_zone = sysfs
+    temp_file = make_zone(0, "cpu-thermal", 40000)
+    zones = thermal.ThermalZones(root=str(root))
+    fd = zones.zones["cpu-thermal"]
+    # sysfs rewrites in place; pread at offset 0 sees the new value
+    temp_file.write_text("55500\n")
+    assert zones.read() == pytest.approx(55.5)
+    assert zones.zones["cpu-thermal"] == fd
+    zones.close()
+
+def test_no_zones_is_unavailable(tmp_path):
+    zones = thermal.ThermalZones(root=str(tmp_path))
+    assert not zones.available
+    assert zones.read_all() == {}
+
+def test_background_sampling_smooths(sysfs):
+    root, make_zone = sysfs
+    temp_file = make_zone(0, "cpu-thermal", 40000)
+    zones = thermal.ThermalZones(root=str(root), alpha=0.5)
+    zones.start_sampling(rate_hz=200)
+    time.sleep(0.05)
+    assert zones.smoothed == pytest.approx(40.0)
+    temp_file.write_text("60000\n")
+    time.sleep(0.05)
+    zones.stop_sampling()
+    # Moved towards the new value without jumping straight to it (EMA)
+    assert 40.0 < zones.smoothed <= 60.0
+    zones.close()
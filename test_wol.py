@@ -0,0 +1,79 @@
+import socket
+import time
+import pytest
+import wol
+
+def test_magic_packet():
+    packet = wol.magic_packet("AA:BB:CC:DD:EE:FF")
+    assert len(packet) == 102
+    assert packet[:6] == b'\xff' * 6
+    assert packet[6:12] == bytes.fromhex("aabbccddeeff")
+    assert packet == wol.magic_packet("aa-bb-cc-dd-ee-ff") == wol.magic_packet("aabb.ccdd.eeff")
+
+@pytest.mark.parametrize("mac", ["INVALID", "AA:BB:CC:DD:EE", "AA:BB:CC:DD:EE:FF:00", "GG:BB:CC:DD:EE:FF"])
+def test_magic_packet_rejects_bad_mac(mac):
+    with pytest.raises(ValueError):
+        wol.magic_packet(mac)
+
+def test_resolve_target():
+    assert wol.resolve_target("192.168.1.0/24") == ["192.168.1.255"]
+    assert wol.resolve_target("10.0.0.7/8") == ["10.255.255.255"]
+    assert wol.resolve_target("192.168.1.42") == ["192.168.1.42"]
+    assert wol.resolve_target("auto") # every interface, or the limited broadcast
+    with pytest.raises(ValueError):
+        wol.resolve_target("no-such-iface0")
+
+def test_registry_parsing():
+    devices = wol.parse_devices("NAS=AA:BB:CC:DD:EE:FF@eth0, pc=11-22-33-44-55-66, bad=xyz")
+    assert set(devices) == {'nas', 'pc'}
+    assert devices['nas'].target == 'eth0'
+    assert devices['pc'].target is None
+    assert wol.parse_groups("lab=nas+pc, empty=") == {'lab': ['nas', 'pc'], 'empty': []}
+
+@pytest.fixture
+def sink():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    sock.settimeout(2)
+    yield sock
+    sock.close()
+
+def make_waker(sink, stagger=0.0):
+    devices = wol.parse_devices("a=AA:BB:CC:DD:EE:01@127.0.0.1,b=AA:BB:CC:DD:EE:02@127.0.0.1,"
+                                "c=AA:BB:CC:DD:EE:03@127.0.0.1")
+    return wol.WakeOnLan(devices=devices, groups=wol.parse_groups("all=a+b+c,broken=a+zzz"),
+                         port=sink.getsockname()[1], stagger=stagger, repeat=2)
+
+def test_send_reuses_socket(sink):
+    waker = make_waker(sink)
+    assert waker.send("AA:BB:CC:DD:EE:FF", "127.0.0.1")
+    first = waker._sock
+    assert waker.send("AA:BB:CC:DD:EE:FF", "127.0.0.1")
+    assert waker._sock is first
+    assert waker.packets_sent == 4
+    assert sink.recv(200) == wol.magic_packet("AA:BB:CC:DD:EE:FF")
+    assert not waker.send("nope", "127.0.0.1")
+    waker.close_socket()
+
+def test_resolve_names_groups_and_macs(sink):
+    waker = make_waker(sink)
+    assert [d.name for d in waker.resolve("ALL")] == ['a', 'b', 'c']
+    assert [d.mac for d in waker.resolve("b")] == ['AA:BB:CC:DD:EE:02']
+    assert waker.resolve("11:22:33:44:55:66")[0].mac == "11:22:33:44:55:66"
+    with pytest.raises(KeyError):
+        waker.resolve("broken")
+    with pytest.raises(KeyError):
+        waker.resolve("unknown")
+
+def test_group_wake_is_staggered(sink):
+    waker = make_waker(sink, stagger=0.1)
+    progress, done = [], []
+    start = time.monotonic()
+    waker.wake_many(waker.resolve("all"), on_progress=lambda d, ok: progress.append((d.name, time.monotonic())),
+                    on_done=done.append).join(timeout=5)
+    assert [name for name, _ in progress] == ['a', 'b', 'c']
+    assert progress[2][1] - start >= 0.2
+    assert done == [{'a': True, 'b': True, 'c': True}]
+    received = {sink.recv(200)[6:12] for _ in range(6)}
+    assert received == {bytes.fromhex(f"aabbccddee0{i}") for i in (1, 2, 3)}
+    waker.close_socket()
@@ -0,0 +1,110 @@
+import os
+import glob
+import time
+import logging
+import threading
+import config
+
+logger = logging.getLogger(__name__)
+
+class ThermalZones:
+    """
+    Reads /sys/class/thermal/thermal_zone*/temp through file descriptors
+    opened once at startup. Each read is a single os.pread() at offset 0 -
+    no open/close or object construction per sample.
+    Optional background sampling keeps an exponentially smoothed value.
+    """
+    def __init__(self, root=None, alpha=None):
+        self.root = root or config.THERMAL_ROOT
+        self.alpha = alpha if alpha is not None else config.THERMAL_SMOOTHING
+        self.zones = {} # name -> fd
+        self.smoothed = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._open_zones()
+
+    def _open_zones(self):
+        for zone_dir in sorted(glob.glob(os.path.join(self.root, 'thermal_zone*'))):
+            try:
+                fd = os.open(os.path.join(zone_dir, 'temp'), os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                with open(os.path.join(zone_dir, 'type')) as f:
+                    name = f.read().strip() or os.path.basename(zone_dir)
+            except OSError:
+                name = os.path.basename(zone_dir)
+            if name in self.zones:
+                name = f"{name}_{os.path.basename(zone_dir)}"
+            self.zones[name] = fd
+        if self.zones:
+            logger.info(f"THERMAL: Monitoring zones {', '.join(self.zones)}")
+
+    @property
+    def available(self):
+        return bool(self.zones)
+
+    @property
+    def cpu_zone(self):
+        """Zone used for CPU temperature: first one whose type mentions 'cpu'"""
+        for name in self.zones:
+            if 'cpu' in name.lower():
+                return name
+        return next(iter(self.zones), None)
+
+    @staticmethod
+    def _read_fd(fd):
+        # Values are millidegrees Celsius, e.g. "47236\n"
+        return int(os.pread(fd, 16, 0)) / 1000.0
+
+    def read(self, zone=None):
+        """Celsius reading of one zone (CPU zone by default)"""
+        return self._read_fd(self.zones[zone or self.cpu_zone])
+
+    def read_all(self):
+        """{zone_name: celsius} for every readable zone"""
+        temps = {}
+        for name, fd in self.zones.items():
+            try:
+                temps[name] = self._read_fd(fd)
+            except (OSError, ValueError) as e:
+                logger.debug(f"THERMAL: Failed to read {name}: {e}")
+        return temps
+
+    def _sample_loop(self, interval):
+        next_tick = time.monotonic()
+        while not self._stop_event.is_set():
+            try:
+                value = self.read()
+                # Exponential moving average filters sensor jitter
+                self.smoothed = value if self.smoothed is None else \
+                    self.alpha * value + (1 - self.alpha) * self.smoothed
+            except (OSError, ValueError, KeyError) as e:
+                logger.debug(f"THERMAL: Sample failed: {e}")
+            next_tick += interval
+            self._stop_event.wait(max(0, next_tick - time.monotonic()))
+
+    def start_sampling(self, rate_hz=None):
+        """Starts high-frequency background sampling feeding `smoothed`"""
+        rate_hz = rate_hz or config.THERMAL_SAMPLE_HZ
+        if not self.available or rate_hz <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._sample_loop, args=(1.0 / rate_hz,),
+                                        name="thermal-sampler", daemon=True)
+        self._thread.start()
+
+    def stop_sampling(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def close(self):
+        self.stop_sampling()
+        for fd in self.zones.values():
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self.zones = {}
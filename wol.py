@@ -0,0 +1,186 @@
+import re
+import time
+import socket
+import logging
+import ipaddress
+import threading
+from functools import lru_cache
+import psutil
+import config
+
+logger = logging.getLogger(__name__)
+
+_MAC_SEPARATORS = re.compile(r'[:\-.\s]')
+
+@lru_cache(maxsize=256)
+def magic_packet(mac_address):
+    """6 x 0xFF followed by the MAC 16 times (102 bytes). Raises ValueError on a bad MAC."""
+    mac = bytes.fromhex(_MAC_SEPARATORS.sub('', mac_address))
+    if len(mac) != 6:
+        raise ValueError(f"Invalid MAC Address '{mac_address}'")
+    return b'\xff' * 6 + mac * 16
+
+def is_mac(text):
+    try:
+        magic_packet(text)
+        return True
+    except ValueError:
+        return False
+
+def interface_broadcasts():
+    """{interface: directed broadcast address} for every IPv4 interface except loopback"""
+    result = {}
+    for name, addrs in psutil.net_if_addrs().items():
+        for addr in addrs:
+            if addr.family != socket.AF_INET or addr.address.startswith('127.'):
+                continue
+            if addr.broadcast:
+                result[name] = addr.broadcast
+            elif addr.netmask:
+                network = ipaddress.ip_network(f"{addr.address}/{addr.netmask}", strict=False)
+                result[name] = str(network.broadcast_address)
+    return result
+
+def resolve_target(target):
+    """
+    Broadcast addresses for a target: 'auto' (every interface), an interface
+    name, a subnet in CIDR form (its directed broadcast) or a plain address.
+    """
+    target = target or 'auto'
+    if target == 'auto':
+        return list(interface_broadcasts().values()) or ['255.255.255.255']
+    if '/' in target:
+        return [str(ipaddress.ip_network(target, strict=False).broadcast_address)]
+    try:
+        return [str(ipaddress.ip_address(target))]
+    except ValueError:
+        pass
+    broadcasts = interface_broadcasts()
+    if target in broadcasts:
+        return [broadcasts[target]]
+    raise ValueError(f"Unknown interface or address '{target}'")
+
+class Device:
+    def __init__(self, name, mac, target=None):
+        self.name = name
+        self.mac = mac
+        self.target = target
+
+    def __repr__(self):
+        return f"Device({self.name!r}, {self.mac!r}, {self.target!r})"
+
+def parse_devices(spec):
+    """'nas=AA:BB:CC:DD:EE:FF@eth0,desktop=11-22-33-44-55-66' -> {name: Device}"""
+    devices = {}
+    for entry in filter(None, (part.strip() for part in (spec or '').split(','))):
+        name, _, rest = entry.partition('=')
+        mac, _, target = rest.partition('@')
+        if not is_mac(mac.strip()):
+            logger.error(f"WOL: Ignoring device '{name}' with invalid MAC '{mac}'")
+            continue
+        devices[name.strip().lower()] = Device(name.strip(), mac.strip(), target.strip() or None)
+    return devices
+
+def parse_groups(spec):
+    """'lab=nas+desktop,racks=r1+r2+r3' -> {group: [names]}"""
+    groups = {}
+    for entry in filter(None, (part.strip() for part in (spec or '').split(','))):
+        name, _, members = entry.partition('=')
+        groups[name.strip().lower()] = [m.strip().lower() for m in members.split('+') if m.strip()]
+    return groups
+
+class WakeOnLan:
+    """
+    Sends magic packets through one broadcast UDP socket kept open for the
+    life of the bot. Groups are woken one machine at a time, `stagger`
+    seconds apart, so a rack of PCs doesn't power on at once.
+    """
+    def __init__(self, devices=None, groups=None, port=None, stagger=None, repeat=None):
+        self.devices = devices if devices is not None else parse_devices(config.WOL_DEVICES)
+        self.groups = groups if groups is not None else parse_groups(config.WOL_GROUPS)
+        self.port = port or config.WOL_PORT
+        self.stagger = stagger if stagger is not None else config.WOL_STAGGER
+        self.repeat = repeat or config.WOL_REPEAT # packets per address, UDP may drop one
+        self.packets_sent = 0
+        self._sock = None
+        self._lock = threading.Lock()
+
+    def _socket(self):
+        if self._sock is None:
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        return self._sock
+
+    def resolve(self, name):
+        """Devices for a group name, device name or raw MAC. Raises KeyError if unknown."""
+        key = name.lower()
+        if key in self.groups:
+            missing = [m for m in self.groups[key] if m not in self.devices]
+            if missing:
+                raise KeyError(f"Group '{name}' refers to unknown devices: {', '.join(missing)}")
+            return [self.devices[m] for m in self.groups[key]]
+        if key in self.devices:
+            return [self.devices[key]]
+        if is_mac(name):
+            return [Device(name, name)]
+        raise KeyError(f"Unknown device or group '{name}'")
+
+    def send(self, mac, target=None, port=None):
+        """Sends the magic packet to every broadcast address of `target`. Returns success."""
+        try:
+            packet = magic_packet(mac)
+            addresses = resolve_target(target or config.WOL_BROADCAST)
+        except ValueError as e:
+            logger.error(f"WOL failed for {mac}: {e}")
+            return False
+        sent = False
+        with self._lock:
+            for address in addresses:
+                for _ in range(self.repeat):
+                    try:
+                        self._socket().sendto(packet, (address, port or self.port))
+                        self.packets_sent += 1
+                        sent = True
+                    except OSError as e:
+                        logger.error(f"WOL: Send to {address} for {mac} failed: {e}")
+                        self.close_socket() # recreated on the next send
+        return sent
+
+    def wake(self, device):
+        ok = self.send(device.mac, device.target)
+        logger.info(f"WOL: Woke {device.name} ({device.mac}) via {device.target or config.WOL_BROADCAST}: {ok}")
+        return ok
+
+    def wake_many(self, devices, on_progress=None, on_done=None):
+        """
+        Wakes devices in order, `stagger` seconds apart, on a background
+        thread. on_progress(device, ok) after each, on_done({name: ok}).
+        """
+        def run():
+            results = {}
+            for i, device in enumerate(devices):
+                if i:
+                    time.sleep(self.stagger)
+                results[device.name] = self.wake(device)
+                if on_progress is not None:
+                    on_progress(device, results[device.name])
+            if on_done is not None:
+                on_done(results)
+
+        thread = threading.Thread(target=run, name="wol-group", daemon=True)
+        thread.start()
+        return thread
+
+    def close_socket(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+_default = None
+
+def default():
+    """Process-wide WakeOnLan built from the WOL_* settings"""
+    global _default
+    if _default is None:
+        _default = WakeOnLan()
+    return _default